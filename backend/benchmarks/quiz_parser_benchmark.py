@@ -0,0 +1,177 @@
+"""
+Benchmark: single-pass quiz parser (services/quiz_parser.py) against the
+regex parser it replaced (kept below as legacy_split_quiz).
+
+Reports are read from recorded *_response.json files ("raw_response") or .md
+files under the given directories; without any, synthetic reports in the
+QUIZ_GENERATION format and its common variations (CRLF, ### heading, bold or
+lowercase answers, lowercase options) are used. Both parsers must agree on
+every report; tests/test_quiz_parser.py checks the same on the variations.
+
+services/quiz_parser.py is loaded by file path: importing it through the
+services package would build the global services (and need OPENAI_API_KEY).
+
+    cd backend
+    python -m benchmarks.quiz_parser_benchmark [DIR ...] [--repeat N]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+def _load_quiz_parser():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services", "quiz_parser.py")
+    spec = importlib.util.spec_from_file_location("quiz_parser", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+split_quiz = _load_quiz_parser().split_quiz
+
+def legacy_parse_quiz(content: str) -> Optional[Dict[str, Any]]:
+    """The former AIService._parse_quiz_from_markdown, unchanged"""
+    try:
+        quiz_section_match = re.search(r"##\s*Interactive Quiz:\s*Test Your Understanding([\s\S]+)$", content, re.IGNORECASE)
+        if not quiz_section_match:
+            return None
+        quiz_block = quiz_section_match.group(1)
+
+        why_matters_match = re.search(r"\*\*Why This Matters:\*\*\s*(.+)", quiz_block, re.IGNORECASE)
+        why_matters = why_matters_match.group(1).strip() if why_matters_match else ""
+
+        question_blocks = re.findall(r"\*\*Question (\d+):\*\*([\s\S]*?)(?=\*\*Question \d+:\*\*|\*\*Why This Matters:\*\*|$)", quiz_block, re.IGNORECASE)
+        if not question_blocks:
+            return None
+
+        questions = []
+        for question_num, block in question_blocks:
+            def extract_from_block(pattern: str) -> Optional[str]:
+                m = re.search(pattern, block, re.IGNORECASE | re.MULTILINE)
+                return m.group(1).strip() if m else None
+
+            question_text_match = re.search(r"^\s*(.+)", block.strip(), re.MULTILINE)
+            question_text = question_text_match.group(1).strip() if question_text_match else None
+            correct_answer = extract_from_block(r"\*\*Correct Answer:\*\*\s*([A-D])\b")
+
+            option_texts: Dict[str, str] = {}
+            for opt in ["A", "B", "C", "D"]:
+                txt = extract_from_block(rf"^{opt}\)\s+(.+)$")
+                if txt:
+                    option_texts[opt] = txt
+
+            option_explanations: Dict[str, str] = {}
+            for opt in ["A", "B", "C", "D"]:
+                expl = extract_from_block(rf"-\s*\*\*Option {opt}:\*\*\s*(.+)")
+                if expl:
+                    option_explanations[opt] = expl
+
+            if question_text and correct_answer and len(option_texts) == 4 and len(option_explanations) == 4:
+                options = [
+                    {"id": k, "text": option_texts[k], "explanation": option_explanations.get(k, "")}
+                    for k in ["A", "B", "C", "D"]
+                ]
+                questions.append({"question": question_text, "options": options, "correct_answer": correct_answer})
+
+        if not questions:
+            return None
+        return {"questions": questions, "why_it_matters": why_matters}
+    except Exception:
+        return None
+
+def legacy_split_quiz(content: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """Former call sequence in ReportService: parse, then a second regex pass to strip"""
+    quiz = legacy_parse_quiz(content)
+    if not quiz:
+        return None, content
+    return quiz, re.sub(r"\n?##\s*Interactive Quiz:\s*Test Your Understanding[\s\S]+$", "", content, flags=re.IGNORECASE)
+
+def synthetic_report(sections: int = 12, questions: int = 5) -> str:
+    body = "\n\n".join(
+        f"## Section {i}:\n" + " ".join(f"**Term {i}.{j}:** explanation of the concept with an example." for j in range(8))
+        for i in range(sections)
+    )
+    quiz = ["## Interactive Quiz: Test Your Understanding"]
+    for q in range(1, questions + 1):
+        quiz.append(f"**Question {q}:** Which statement about concept {q} is correct?\n\n**Options:**")
+        quiz.extend(f"{letter}) Option {letter} for question {q}" for letter in "ABCD")
+        quiz.append(f"\n**Correct Answer:** {'ABCD'[q % 4]}\n\n**Explanations:**")
+        quiz.extend(f"- **Option {letter}:** Why option {letter} is right or wrong, citing the report." for letter in "ABCD")
+        quiz.append("")
+    quiz.append("**Why This Matters:** These concepts underpin the rest of the plan.")
+    return f"{body}\n\n" + "\n".join(quiz)
+
+def _lowercase_options(report: str) -> str:
+    return re.sub(r"^[A-D](?=\))", lambda m: m.group(0).lower(), report, flags=re.MULTILINE)
+
+def synthetic_reports(sections: int = 12, questions: int = 5) -> Dict[str, str]:
+    """The synthetic report and the formatting variations models produce, by name"""
+    report = synthetic_report(sections, questions)
+    return {
+        "plain": report,
+        "crlf": report.replace("\n", "\r\n"),
+        "h3_heading": report.replace("## Interactive Quiz", "### Interactive Quiz"),
+        "bold_answers": re.sub(r"(\*\*Correct Answer:\*\*) ([A-D])", r"\1 **\2**", report),
+        "answer_on_next_line": report.replace("**Correct Answer:** ", "**Correct Answer:**\n"),
+        "lowercase_answers": re.sub(r"(?<=\*\*Correct Answer:\*\* )[A-D]", lambda m: m.group(0).lower(), report),
+        "lowercase_options": _lowercase_options(report)
+    }
+
+def load_reports(directories: List[str]) -> List[str]:
+    reports = []
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if name.endswith("_response.json"):
+                    with open(path, encoding="utf-8") as f:
+                        data = json.load(f)
+                    if data.get("response_type") == "report" and data.get("raw_response"):
+                        reports.append(data["raw_response"])
+                elif name.endswith(".md"):
+                    with open(path, encoding="utf-8") as f:
+                        reports.append(f.read())
+    return reports
+
+def normalized(result: Tuple[Optional[Dict[str, Any]], str]) -> Tuple[Optional[Dict[str, Any]], str]:
+    quiz, content = result
+    if quiz:
+        # The legacy parser kept a lowercase answer letter as written; the new one upper-cases it
+        quiz = dict(quiz, questions=[dict(q, correct_answer=q["correct_answer"].upper()) for q in quiz["questions"]])
+    return quiz, content
+
+def _time(parser, reports: List[str], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for report in reports:
+            parser(report)
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the markdown quiz parser")
+    parser.add_argument("directories", nargs="*", help="Directories with recorded *_response.json or .md reports")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    reports = load_reports(args.directories)
+    source = f"{len(reports)} recorded report(s)"
+    if not reports:
+        reports = list(synthetic_reports().values())
+        source = f"{len(reports)} synthetic report(s)"
+
+    mismatches = sum(1 for report in reports if normalized(split_quiz(report)) != normalized(legacy_split_quiz(report)))
+    with_quiz = sum(1 for report in reports if split_quiz(report)[0])
+    legacy_seconds = _time(legacy_split_quiz, reports, args.repeat)
+    new_seconds = _time(split_quiz, reports, args.repeat)
+    calls = len(reports) * args.repeat
+
+    print(f"[Benchmark] {source}, {with_quiz} with a quiz, {args.repeat} repeat(s)")
+    print(f"[Benchmark] legacy regex parser: {legacy_seconds / calls * 1e6:.1f} us/report")
+    print(f"[Benchmark] single-pass parser:  {new_seconds / calls * 1e6:.1f} us/report")
+    print(f"[Benchmark] speedup: {legacy_seconds / new_seconds:.2f}x")
+    print(f"[Benchmark] reports where the parsers disagree: {mismatches}")
+
+if __name__ == "__main__":
+    main()
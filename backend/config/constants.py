@@ -31,19 +31,107 @@ FEEDBACK_CONFIG = {
 AI_MODELS = {
     'DEFAULT': 'gpt-4o-mini',
     'TEMPERATURE': 0.7,
-    'TIMEOUT': 120
+    'TIMEOUT': 120,
+    'MAX_CONNECTIONS': 20,  # Shared pool for the async client; caps concurrent completions
+    'SINGLE_CALL_REPORT_SUMMARY': False,  # Opt-in: one JSON completion returns the report and the updated context summary
+    'QUIZ_MODE': 'markdown',  # 'markdown' (quiz parsed from the report) or 'structured' (separate JSON schema completion)
+    'MAX_TOKENS_QUIZ': 2500
 }
 
 # Time delays (in seconds)
 DELAYS = {
     'EMAIL_DEPLOYMENT': 5,  # Reduced from 300 to 5 seconds
+    'EMAIL_URL_POLL': 15,  # Interval between checks that a report URL is live
+    'EMAIL_URL_WAIT_TIMEOUT': 600,  # Send anyway if the URL is still not live after this long
+}
+
+# Scheduler configuration
+SCHEDULER_CONFIG = {
+    'MAX_WORKERS': 4,  # Users processed concurrently per scheduler run
+    'MAX_WORKERS_CAP': 32,  # Upper bound on any requested pool size (each worker holds GitHub and OpenAI connections)
+    'RUN_HISTORY': 20,  # Finished runs kept in memory for /scheduler-runs/{id}
+    'EXECUTION_MODE': 'realtime'  # 'realtime' (one completion per user) or 'batch' (OpenAI Batch API)
+}
+
+# OpenAI Batch API (scheduler execution mode 'batch')
+OPENAI_BATCH_CONFIG = {
+    'BASE_URL': 'https://api.openai.com/v1',  # Point at a fake server to test without OpenAI
+    'POLL_INTERVAL': 60,  # Seconds between batch status checks
+    'TIMEOUT': 24 * 3600,  # Give up waiting after this many seconds
+    'COMPLETION_WINDOW': '24h'
+}
+
+# User store configuration
+USERS_CONFIG = {
+    'INDEX_TTL': 60,  # Seconds before the in-memory users index is revalidated against GitHub
+    'STORAGE_ENGINE': 'github',  # 'github' (users.json is primary) or 'sqlite' (local DB, GitHub replica)
+    'SQLITE_PATH': 'users.db',
+    'REPLICATION_DELAY': 5,  # Seconds of quiet before local user writes are pushed to GitHub
+    'REMOTE_LAYOUT': 'monolithic',  # 'monolithic' (one users.json) or 'sharded' (one file per user/topic)
+    'SHARD_DIR': 'users',  # Local directory for the sharded layout
+    'SHARD_CACHE_SIZE': 10000  # Shard records kept by blob SHA, so listings only fetch changed shards
+}
+
+# Cross-user cache for context-free topic reports (same topic -> same prompt)
+REPORT_CACHE_CONFIG = {
+    'ENABLED': True,
+    'SIZE': 256,  # Reports kept in memory
+    'TTL': 7 * 24 * 3600,  # Seconds before a cached report is regenerated
+    'VARIANTS': 1  # Distinct generations per prompt; users are spread across them by email
+}
+
+# User learning context (services/context_service.py)
+CONTEXT_CONFIG = {
+    # 'summary' (LLM-merged free text), or opt in to 'structured' (covered topics + key concepts,
+    # updated locally) or 'retrieval' (structured plus the most relevant passages of past reports,
+    # services/report_index.py). Switching keeps each user's existing summary in the structured context.
+    'MODE': 'summary',
+    'MAX_TOKENS': 600,  # Hard cap on the structured context rendering fed to report prompts
+    'CONCEPTS_PER_TOPIC': 5,  # Key concepts kept for each covered topic before compaction
+    'RETRIEVAL_TOP_K': 4,  # Past report passages added to the prompt in 'retrieval' mode
+    'RETRIEVAL_PASSAGE_WORDS': 120,  # Approximate passage size when splitting reports
+    'RETRIEVAL_INDEX_CACHE_SIZE': 256  # Per user/topic indexes kept in memory
+}
+
+# Prompt token accounting (services/token_budget.py)
+TOKEN_BUDGET_CONFIG = {
+    'ENABLED': True,
+    'CONTEXT_WINDOW': 128000,  # Model context window shared by the prompt and the completion
+    'CONTEXT': 1500,  # Max tokens of the user's context summary inserted into a prompt
+    'PLAN': 600,  # Max tokens of the learning plan list inserted into a prompt
+    'SAFETY_MARGIN': 256,  # Window tokens kept free to absorb tokenizer estimate errors
+    'ENCODING': 'o200k_base',  # tiktoken encoding when the model name is unknown to tiktoken
+    'MAX_TOKENS_SUMMARY': 1000,
+    'MAX_TOKENS_INITIAL_SUMMARY': 800
+}
+
+# Learning plans cached by canonical topic, so repeat topics skip plan generation
+PLAN_CACHE_CONFIG = {
+    'ENABLED': True,
+    'FILE': 'plan_cache.json'  # Local to the host; point at a persistent disk to keep it across deploys
+}
+
+# GitHub REST API base URL (overridable to point at a fake server in tests)
+GITHUB_API_URL = 'https://api.github.com'
+
+# Shared GitHub HTTP client configuration
+GITHUB_HTTP_CONFIG = {
+    'POOL_SIZE': 10,  # Keep-alive connections kept open to the GitHub API
+    'TIMEOUT': 30,  # Seconds per request
+    'MAX_RETRIES': 3,  # Retries on 5xx, connection errors and secondary rate limits
+    'BACKOFF': 1.0,  # Base delay in seconds, doubled on each retry
+    'CACHE_SIZE': 256  # Contents API reads kept for If-None-Match revalidation
 }
 
 # GitHub configuration for reports repository
 GITHUB_CONFIG = {
     'REPO_OWNER': 'AkashCiel',
     'REPO_NAME': 'bhai_jaan_academy_reports',
-    'BRANCH': 'main'
+    'BRANCH': 'main',
+    'BATCH_COMMITS': True,  # One Git Data API commit per user instead of one Contents API PUT per file
+    'SCHEDULER_COMMIT_MODE': 'per_user',  # 'per_user' or 'run' (one shared commit batch for the whole run)
+    'SCHEDULER_FLUSH_EVERY': 25,  # In 'run' mode, also flush every K users (0 = only at the end)
+    'INLINE_BLOB_LIMIT': 16 * 1024  # Larger files are uploaded with POST git/blobs instead of inlined in the tree
 }
 
 # GitHub configuration for main repository (for users.json sync)
@@ -135,7 +223,8 @@ The tone should be clear, engaging, and accessible to someone new to the subject
         'REPORT_GENERATOR': "You are an expert educator and science communicator who creates engaging, interactive learning experiences.",
         'CONTEXT_AWARE_GENERATOR': "You are an expert educator and science communicator who creates coherent, progressive learning experiences with interactive assessment.",
         'SUMMARY_GENERATOR': "You are an expert educational content curator who creates coherent learning summaries.",
-        'INITIAL_SUMMARY_GENERATOR': "You are an expert educational content curator who creates foundational learning summaries."
+        'INITIAL_SUMMARY_GENERATOR': "You are an expert educational content curator who creates foundational learning summaries.",
+        'QUIZ_GENERATOR': "You are an expert educator who writes multiple-choice quizzes that check understanding of a report."
     },
     
     # Summary generation prompts
@@ -159,6 +248,14 @@ Focus on:
     
     'SUMMARY_TONE': """
 Write the summary in a clear, educational tone that would help generate future reports that build upon this foundation.
+""",
+    
+    # Single-call mode: report and updated context summary returned together
+    'REPORT_WITH_SUMMARY_OUTPUT': """
+OUTPUT FORMAT: Respond with a single JSON object with exactly two string fields:
+- "report": the complete report in markdown, following every instruction above
+- "updated_summary": an updated learning summary that folds this report into the Previous Learning Summary, as described below
+Do not add any text outside the JSON object.
 """,
     
     'INITIAL_SUMMARY_TASK': """
@@ -368,6 +465,21 @@ QUIZ CONTENT GUIDELINES:
 - Questions should encourage critical thinking about the material
 - Avoid "trick questions" - focus on genuine learning assessment
 - Ensure explanations are educational and help reinforce learning
+""",
+
+    # Quiz as its own JSON completion (QUIZ_MODE 'structured')
+    'STRUCTURED_QUIZ': """
+Write an interactive quiz that tests the reader's understanding of the key concepts in the report you are given.
+
+QUIZ REQUIREMENTS:
+- Create exactly FIVE questions, each about a different key concept from the report
+- Give every question exactly 4 options with ids "A", "B", "C" and "D"
+- For every option, explain why it is correct or incorrect, with specific details from the report
+- Set correct_answer to the id of the correct option
+- Distribute correct answers randomly across A, B, C, D; avoid patterns
+- Set why_it_matters to a brief explanation of why understanding these concepts is important for the reader's learning journey
+
+Respond only with the JSON object described by the response schema.
 """,
 
     'QUIZ_INTEGRATION': """
@@ -2,7 +2,7 @@ import os
 from typing import Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from .constants import AI_MODELS, GITHUB_CONFIG, MAIN_REPO_CONFIG, FILE_EXTENSIONS, EMAIL_TEMPLATES, DELAYS, PAYMENT_CONFIG
+from .constants import AI_MODELS, GITHUB_CONFIG, MAIN_REPO_CONFIG, GITHUB_API_URL, GITHUB_HTTP_CONFIG, FILE_EXTENSIONS, EMAIL_TEMPLATES, DELAYS, PAYMENT_CONFIG, SCHEDULER_CONFIG, USERS_CONFIG, REPORT_CACHE_CONFIG, PLAN_CACHE_CONFIG, OPENAI_BATCH_CONFIG, TOKEN_BUDGET_CONFIG, CONTEXT_CONFIG
 
 class Settings(BaseSettings):
     # OpenAI Configuration
@@ -11,17 +11,55 @@ class Settings(BaseSettings):
     OPENAI_TEMPERATURE: float = Field(default=AI_MODELS['TEMPERATURE'], validation_alias='OPENAI_TEMPERATURE')
     OPENAI_MAX_TOKENS_REPORT: int = Field(default=10000, validation_alias='OPENAI_MAX_TOKENS_REPORT')
     OPENAI_MAX_TOKENS_PLAN: int = Field(default=3000, validation_alias='OPENAI_MAX_TOKENS_PLAN')
+    OPENAI_MAX_TOKENS_SUMMARY: int = Field(default=TOKEN_BUDGET_CONFIG['MAX_TOKENS_SUMMARY'], validation_alias='OPENAI_MAX_TOKENS_SUMMARY')
+    OPENAI_MAX_TOKENS_INITIAL_SUMMARY: int = Field(default=TOKEN_BUDGET_CONFIG['MAX_TOKENS_INITIAL_SUMMARY'], validation_alias='OPENAI_MAX_TOKENS_INITIAL_SUMMARY')
     OPENAI_TIMEOUT: int = Field(default=AI_MODELS['TIMEOUT'], validation_alias='OPENAI_TIMEOUT')
+    OPENAI_MAX_CONNECTIONS: int = Field(default=AI_MODELS['MAX_CONNECTIONS'], validation_alias='OPENAI_MAX_CONNECTIONS')
+    OPENAI_BATCH_BASE_URL: str = Field(default=OPENAI_BATCH_CONFIG['BASE_URL'], validation_alias='OPENAI_BATCH_BASE_URL')
+    OPENAI_BATCH_POLL_SECONDS: float = Field(default=OPENAI_BATCH_CONFIG['POLL_INTERVAL'], validation_alias='OPENAI_BATCH_POLL_SECONDS')
+    OPENAI_BATCH_TIMEOUT_SECONDS: float = Field(default=OPENAI_BATCH_CONFIG['TIMEOUT'], validation_alias='OPENAI_BATCH_TIMEOUT_SECONDS')
+    OPENAI_BATCH_COMPLETION_WINDOW: str = Field(default=OPENAI_BATCH_CONFIG['COMPLETION_WINDOW'], validation_alias='OPENAI_BATCH_COMPLETION_WINDOW')
+    MODEL_CONTEXT_WINDOW: int = Field(default=TOKEN_BUDGET_CONFIG['CONTEXT_WINDOW'], validation_alias='MODEL_CONTEXT_WINDOW')
+    TOKEN_BUDGET_ENABLED: bool = Field(default=TOKEN_BUDGET_CONFIG['ENABLED'], validation_alias='TOKEN_BUDGET_ENABLED')
+    TOKEN_BUDGET_CONTEXT: int = Field(default=TOKEN_BUDGET_CONFIG['CONTEXT'], validation_alias='TOKEN_BUDGET_CONTEXT')
+    TOKEN_BUDGET_PLAN: int = Field(default=TOKEN_BUDGET_CONFIG['PLAN'], validation_alias='TOKEN_BUDGET_PLAN')
+    TOKEN_BUDGET_SAFETY_MARGIN: int = Field(default=TOKEN_BUDGET_CONFIG['SAFETY_MARGIN'], validation_alias='TOKEN_BUDGET_SAFETY_MARGIN')
+    TOKEN_BUDGET_ENCODING: str = Field(default=TOKEN_BUDGET_CONFIG['ENCODING'], validation_alias='TOKEN_BUDGET_ENCODING')
+    CONTEXT_MODE: str = Field(default=CONTEXT_CONFIG['MODE'], validation_alias='CONTEXT_MODE')
+    CONTEXT_MAX_TOKENS: int = Field(default=CONTEXT_CONFIG['MAX_TOKENS'], validation_alias='CONTEXT_MAX_TOKENS')
+    CONTEXT_CONCEPTS_PER_TOPIC: int = Field(default=CONTEXT_CONFIG['CONCEPTS_PER_TOPIC'], validation_alias='CONTEXT_CONCEPTS_PER_TOPIC')
+    RETRIEVAL_TOP_K: int = Field(default=CONTEXT_CONFIG['RETRIEVAL_TOP_K'], validation_alias='RETRIEVAL_TOP_K')
+    RETRIEVAL_PASSAGE_WORDS: int = Field(default=CONTEXT_CONFIG['RETRIEVAL_PASSAGE_WORDS'], validation_alias='RETRIEVAL_PASSAGE_WORDS')
+    RETRIEVAL_INDEX_CACHE_SIZE: int = Field(default=CONTEXT_CONFIG['RETRIEVAL_INDEX_CACHE_SIZE'], validation_alias='RETRIEVAL_INDEX_CACHE_SIZE')
+    SINGLE_CALL_REPORT_SUMMARY: bool = Field(default=AI_MODELS['SINGLE_CALL_REPORT_SUMMARY'], validation_alias='SINGLE_CALL_REPORT_SUMMARY')
+    QUIZ_MODE: str = Field(default=AI_MODELS['QUIZ_MODE'], validation_alias='QUIZ_MODE')
+    OPENAI_MAX_TOKENS_QUIZ: int = Field(default=AI_MODELS['MAX_TOKENS_QUIZ'], validation_alias='OPENAI_MAX_TOKENS_QUIZ')
+    REPORT_CACHE_ENABLED: bool = Field(default=REPORT_CACHE_CONFIG['ENABLED'], validation_alias='REPORT_CACHE_ENABLED')
+    REPORT_CACHE_SIZE: int = Field(default=REPORT_CACHE_CONFIG['SIZE'], validation_alias='REPORT_CACHE_SIZE')
+    REPORT_CACHE_TTL_SECONDS: int = Field(default=REPORT_CACHE_CONFIG['TTL'], validation_alias='REPORT_CACHE_TTL_SECONDS')
+    REPORT_CACHE_VARIANTS: int = Field(default=REPORT_CACHE_CONFIG['VARIANTS'], validation_alias='REPORT_CACHE_VARIANTS')
+    PLAN_CACHE_ENABLED: bool = Field(default=PLAN_CACHE_CONFIG['ENABLED'], validation_alias='PLAN_CACHE_ENABLED')
+    PLAN_CACHE_FILE: str = Field(default=PLAN_CACHE_CONFIG['FILE'], validation_alias='PLAN_CACHE_FILE')
     
     # Email Configuration
     MAILGUN_API_KEY: Optional[str] = Field(default=None, validation_alias='MAILGUN_API_KEY')
     MAILGUN_DOMAIN: Optional[str] = Field(default=None, validation_alias='MAILGUN_DOMAIN')
     
     # GitHub Configuration for Reports Repository
+    GITHUB_API_URL: str = Field(default=GITHUB_API_URL, validation_alias='GITHUB_API_URL')
+    GITHUB_POOL_SIZE: int = Field(default=GITHUB_HTTP_CONFIG['POOL_SIZE'], validation_alias='GITHUB_POOL_SIZE')
+    GITHUB_TIMEOUT: float = Field(default=GITHUB_HTTP_CONFIG['TIMEOUT'], validation_alias='GITHUB_TIMEOUT')
+    GITHUB_MAX_RETRIES: int = Field(default=GITHUB_HTTP_CONFIG['MAX_RETRIES'], validation_alias='GITHUB_MAX_RETRIES')
+    GITHUB_BACKOFF_SECONDS: float = Field(default=GITHUB_HTTP_CONFIG['BACKOFF'], validation_alias='GITHUB_BACKOFF_SECONDS')
+    GITHUB_CACHE_SIZE: int = Field(default=GITHUB_HTTP_CONFIG['CACHE_SIZE'], validation_alias='GITHUB_CACHE_SIZE')
     REPORTS_GITHUB_TOKEN: Optional[str] = Field(default=None, validation_alias='REPORTS_GITHUB_TOKEN')
     GITHUB_REPO_OWNER: str = Field(default=GITHUB_CONFIG['REPO_OWNER'], validation_alias='GITHUB_REPO_OWNER')
     GITHUB_REPO_NAME: str = Field(default=GITHUB_CONFIG['REPO_NAME'], validation_alias='GITHUB_REPO_NAME')
     GITHUB_BRANCH: str = Field(default=GITHUB_CONFIG['BRANCH'], validation_alias='GITHUB_BRANCH')
+    GITHUB_BATCH_COMMITS: bool = Field(default=GITHUB_CONFIG['BATCH_COMMITS'], validation_alias='GITHUB_BATCH_COMMITS')
+    SCHEDULER_COMMIT_MODE: str = Field(default=GITHUB_CONFIG['SCHEDULER_COMMIT_MODE'], validation_alias='SCHEDULER_COMMIT_MODE')
+    SCHEDULER_FLUSH_EVERY: int = Field(default=GITHUB_CONFIG['SCHEDULER_FLUSH_EVERY'], validation_alias='SCHEDULER_FLUSH_EVERY')
+    GITHUB_INLINE_BLOB_LIMIT: int = Field(default=GITHUB_CONFIG['INLINE_BLOB_LIMIT'], validation_alias='GITHUB_INLINE_BLOB_LIMIT')
     
     # GitHub Configuration for Main Repository (users.json sync)
     MAIN_GITHUB_TOKEN: Optional[str] = Field(default=None, validation_alias='MAIN_GITHUB_TOKEN')
@@ -31,12 +69,30 @@ class Settings(BaseSettings):
     
     # File Configuration
     USERS_FILE: str = Field(default=FILE_EXTENSIONS['USERS_FILE'], validation_alias='USERS_FILE')
+    USERS_INDEX_TTL_SECONDS: int = Field(default=USERS_CONFIG['INDEX_TTL'], validation_alias='USERS_INDEX_TTL_SECONDS')
+    USERS_STORAGE_ENGINE: str = Field(default=USERS_CONFIG['STORAGE_ENGINE'], validation_alias='USERS_STORAGE_ENGINE')
+    USERS_SQLITE_PATH: str = Field(default=USERS_CONFIG['SQLITE_PATH'], validation_alias='USERS_SQLITE_PATH')
+    USERS_REPLICATION_DELAY_SECONDS: float = Field(default=USERS_CONFIG['REPLICATION_DELAY'], validation_alias='USERS_REPLICATION_DELAY_SECONDS')
+    USERS_REMOTE_LAYOUT: str = Field(default=USERS_CONFIG['REMOTE_LAYOUT'], validation_alias='USERS_REMOTE_LAYOUT')
+    USERS_SHARD_DIR: str = Field(default=USERS_CONFIG['SHARD_DIR'], validation_alias='USERS_SHARD_DIR')
+    USERS_SHARD_CACHE_SIZE: int = Field(default=USERS_CONFIG['SHARD_CACHE_SIZE'], validation_alias='USERS_SHARD_CACHE_SIZE')
     REPORT_DELAY_SECONDS: int = Field(default=DELAYS['EMAIL_DEPLOYMENT'], validation_alias='REPORT_DELAY_SECONDS')
+    EMAIL_URL_POLL_SECONDS: int = Field(default=DELAYS['EMAIL_URL_POLL'], validation_alias='EMAIL_URL_POLL_SECONDS')
+    EMAIL_URL_WAIT_TIMEOUT_SECONDS: int = Field(default=DELAYS['EMAIL_URL_WAIT_TIMEOUT'], validation_alias='EMAIL_URL_WAIT_TIMEOUT_SECONDS')
+    
+    # Scheduler Configuration
+    SCHEDULER_MAX_WORKERS: int = Field(default=SCHEDULER_CONFIG['MAX_WORKERS'], validation_alias='SCHEDULER_MAX_WORKERS')
+    SCHEDULER_MAX_WORKERS_CAP: int = Field(default=SCHEDULER_CONFIG['MAX_WORKERS_CAP'], validation_alias='SCHEDULER_MAX_WORKERS_CAP')
+    SCHEDULER_RUN_HISTORY: int = Field(default=SCHEDULER_CONFIG['RUN_HISTORY'], validation_alias='SCHEDULER_RUN_HISTORY')
+    SCHEDULER_EXECUTION_MODE: str = Field(default=SCHEDULER_CONFIG['EXECUTION_MODE'], validation_alias='SCHEDULER_EXECUTION_MODE')
     
     # Email Templates
     WELCOME_EMAIL_TEMPLATE: str = Field(default=EMAIL_TEMPLATES['WELCOME'], validation_alias='WELCOME_EMAIL_TEMPLATE')
     REPORT_EMAIL_TEMPLATE: str = Field(default=EMAIL_TEMPLATES['REPORT'], validation_alias='REPORT_EMAIL_TEMPLATE')
     
+    # Admin endpoints (disabled unless a token is set; sent as the X-Admin-Token header)
+    ADMIN_API_TOKEN: Optional[str] = Field(default=None, validation_alias='ADMIN_API_TOKEN')
+    
     # Discord Configuration
     DISCORD_WEBHOOK_URL: Optional[str] = Field(default=None, validation_alias='DISCORD_WEBHOOK_URL')
     
@@ -2,11 +2,13 @@ from .user_repository import UserRepository
 from .response_repository import ResponseRepository
 from .report_repository import ReportRepository
 from .context_repository import ContextRepository
+from .plan_cache_repository import PlanCacheRepository
 
 # Global repository instances
 user_repository = UserRepository()
 response_repository = ResponseRepository()
 report_repository = ReportRepository()
 context_repository = ContextRepository()
+plan_cache_repository = PlanCacheRepository()
 
-__all__ = ['user_repository', 'response_repository', 'report_repository', 'context_repository'] 
\ No newline at end of file
+__all__ = ['user_repository', 'response_repository', 'report_repository', 'context_repository', 'plan_cache_repository'] 
\ No newline at end of file
@@ -1,38 +1,138 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
 import json
 import os
+import threading
 
-class BaseRepository(ABC):
-    """Base repository class providing common data access patterns"""
-    
-    def __init__(self, file_path: str):
+RecordKey = Tuple[Any, ...]
+
+class StorageEngine(ABC):
+    """Record store behind a repository: a collection of dicts identified by a key tuple"""
+
+    @abstractmethod
+    def load_all(self) -> List[Dict[str, Any]]:
+        """Return every record, in insertion order"""
+        pass
+
+    def iter_all(self) -> Iterator[Dict[str, Any]]:
+        """Yield every record in insertion order; engines override this to avoid loading them all at once"""
+        yield from self.load_all()
+
+    @abstractmethod
+    def get(self, key: RecordKey) -> Optional[Dict[str, Any]]:
+        """Return the record stored under key, if any"""
+        pass
+
+    @abstractmethod
+    def upsert(self, key: RecordKey, record: Dict[str, Any]) -> None:
+        """Insert record under key, or replace the record already there"""
+        pass
+
+    @abstractmethod
+    def delete(self, key: RecordKey) -> bool:
+        """Remove the record under key; returns False if there was none"""
+        pass
+
+    @abstractmethod
+    def replace_all(self, records: List[Dict[str, Any]]) -> None:
+        """Replace the whole collection"""
+        pass
+
+    def count(self) -> int:
+        """Number of records; engines override this to avoid loading them all"""
+        return len(self.load_all())
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Group several writes so they apply together (no-op unless the engine supports it)"""
+        yield
+
+class JsonFileEngine(StorageEngine):
+    """Stores the collection as one JSON array in a local file (the original repository format)"""
+
+    def __init__(self, file_path: str, key_fn: Callable[[Dict[str, Any]], RecordKey],
+                 default_factory: Callable[[], Any]):
         self.file_path = file_path
-    
+        self.key_fn = key_fn
+        self.default_factory = default_factory
+        self._lock = threading.RLock()
+
     def _ensure_file_exists(self) -> None:
         """Ensure the data file exists with proper structure"""
         if not os.path.exists(self.file_path):
             self._create_initial_file()
-    
+
     def _create_initial_file(self) -> None:
         """Create initial file with default structure"""
         os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
         with open(self.file_path, 'w') as f:
-            json.dump(self._get_default_data(), f, indent=2)
-    
+            json.dump(self.default_factory(), f, indent=2)
+
+    def load_all(self) -> Any:
+        with self._lock:
+            self._ensure_file_exists()
+            with open(self.file_path, 'r') as f:
+                return json.load(f)
+
+    def get(self, key: RecordKey) -> Optional[Dict[str, Any]]:
+        for record in self.load_all():
+            if self.key_fn(record) == key:
+                return record
+        return None
+
+    def upsert(self, key: RecordKey, record: Dict[str, Any]) -> None:
+        with self._lock:
+            records = self.load_all()
+            for i, existing in enumerate(records):
+                if self.key_fn(existing) == key:
+                    records[i] = record
+                    break
+            else:
+                records.append(record)
+            self.replace_all(records)
+
+    def delete(self, key: RecordKey) -> bool:
+        with self._lock:
+            records = self.load_all()
+            remaining = [record for record in records if self.key_fn(record) != key]
+            if len(remaining) == len(records):
+                return False
+            self.replace_all(remaining)
+            return True
+
+    def replace_all(self, records: Any) -> None:
+        with self._lock:
+            self._ensure_file_exists()
+            with open(self.file_path, 'w') as f:
+                json.dump(records, f, indent=2)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self._lock:
+            yield
+
+class BaseRepository(ABC):
+    """Base repository class providing common data access patterns"""
+
+    def __init__(self, file_path: str, engine: Optional[StorageEngine] = None):
+        self.file_path = file_path
+        self.engine = engine or JsonFileEngine(file_path, self._record_key, self._get_default_data)
+
     @abstractmethod
     def _get_default_data(self) -> Any:
         """Return default data structure for the repository"""
         pass
-    
+
+    @abstractmethod
+    def _record_key(self, record: Dict[str, Any]) -> RecordKey:
+        """Key identifying a record; used by the engine's row-level operations"""
+        pass
+
     def _load_data(self) -> Any:
-        """Load data from file"""
-        self._ensure_file_exists()
-        with open(self.file_path, 'r') as f:
-            return json.load(f)
-    
+        """Load data from the storage engine"""
+        return self.engine.load_all()
+
     def _save_data(self, data: Any) -> None:
-        """Save data to file"""
-        self._ensure_file_exists()
-        with open(self.file_path, 'w') as f:
-            json.dump(data, f, indent=2) 
\ No newline at end of file
+        """Save data to the storage engine"""
+        self.engine.replace_all(data)
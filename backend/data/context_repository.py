@@ -1,26 +1,22 @@
 from typing import Dict, Any, Optional
-import requests
-import base64
 import json
 import re
 from urllib.parse import quote
 from datetime import datetime
 from config import settings
+from .github_client import github_client
+from .report_repository import ReportRepository
 
 class ContextRepository:
     """Repository for user context summaries stored on GitHub"""
     
     def __init__(self):
-        self.github_api_url = "https://api.github.com"
+        self.github_api_url = settings.GITHUB_API_URL
         self.repo_owner = settings.GITHUB_REPO_OWNER
         self.repo_name = settings.GITHUB_REPO_NAME
         self.token = settings.REPORTS_GITHUB_TOKEN
-    
-    def _get_headers(self) -> Dict[str, str]:
-        return {
-            "Authorization": f"token {self.token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
+        self.client = github_client
+        self.report_repo = ReportRepository()
     
     def save_context_summary(self, user_email: str, main_topic: str, summary_data: Dict[str, Any], 
                            token_count: Optional[int] = None) -> str:
@@ -35,6 +31,8 @@ class ContextRepository:
             "report_count": summary_data.get("report_count", 0),
             "metadata": summary_data.get("metadata", {})
         }
+        if summary_data.get("structured") is not None:
+            context_data["structured"] = summary_data["structured"]
         
         # Add token count if provided
         if token_count:
@@ -44,9 +42,7 @@ class ContextRepository:
         json_content = json.dumps(context_data, indent=2, ensure_ascii=False)
         
         # Upload to GitHub using report repository
-        from .report_repository import ReportRepository
-        report_repo = ReportRepository()
-        github_url = report_repo.upload_report(user_email, main_topic, json_content, "context_summary", "json")
+        github_url = self.report_repo.upload_report(user_email, main_topic, json_content, "context_summary", "json")
         print(f"[Context Repository] Uploaded context summary to GitHub: {github_url}")
         return github_url
     
@@ -60,17 +56,15 @@ class ContextRepository:
             
             url = f"{self.github_api_url}/repos/{self.repo_owner}/{self.repo_name}/contents/{quote(file_path)}"
             print(f"[Context Repository] Attempting to load from URL: {url}")
-            response = requests.get(url, headers=self._get_headers())
+            status, file = self.client.get_file(url)
             
-            print(f"[Context Repository] Response status: {response.status_code}")
-            if response.status_code != 200:
-                print(f"[Context Repository] Context summary not found on GitHub: {response.status_code}")
+            print(f"[Context Repository] Response status: {status}")
+            if file is None:
+                print(f"[Context Repository] Context summary not found on GitHub: {status}")
                 return None
             
-            # Decode content from GitHub
-            content_b64 = response.json()['content']
-            content = base64.b64decode(content_b64).decode('utf-8')
-            context_data = json.loads(content)
+            # Decoded (or revalidated from cache) by the client
+            context_data = json.loads(file.text)
             
             print(f"[Context Repository] Loaded context summary from GitHub: {file_path}")
             return context_data
@@ -79,6 +73,24 @@ class ContextRepository:
             print(f"[Context Repository] Error loading context summary from GitHub: {e}")
             return None
     
+    def save_report_index(self, user_email: str, main_topic: str, index_data: Dict[str, Any]) -> str:
+        """Save a retrieval index (services/report_index.py) next to the context summary."""
+        json_content = json.dumps(index_data, ensure_ascii=False)
+        return self.report_repo.upload_report(user_email, main_topic, json_content, "report_index", "json")
+    
+    def load_report_index(self, user_email: str, main_topic: str) -> Optional[Dict[str, Any]]:
+        """Load a stored retrieval index; None if there is none yet."""
+        try:
+            file_path = f"reports/{self._user_dir_from_email(user_email)}/{self._slugify_topic(main_topic)}/report_index.json"
+            url = f"{self.github_api_url}/repos/{self.repo_owner}/{self.repo_name}/contents/{quote(file_path)}"
+            _, file = self.client.get_file(url)
+            if file is None:
+                return None
+            return json.loads(file.text)
+        except Exception as e:
+            print(f"[Context Repository] Error loading report index from GitHub: {e}")
+            return None
+    
     def update_context_summary(self, user_email: str, main_topic: str, new_report_content: str, 
                              new_topic: str, learning_plan: list) -> str:
         """Update context summary with new report content."""
@@ -93,7 +105,8 @@ class ContextRepository:
                 "new_topic": new_topic,
                 "learning_plan": learning_plan,
                 "current_topics_covered": existing_context.get("topics_covered", []) if existing_context else [],
-                "current_report_count": existing_context.get("report_count", 0) if existing_context else 0
+                "current_report_count": existing_context.get("report_count", 0) if existing_context else 0,
+                "existing_structured": existing_context.get("structured") if existing_context else None
             }
             
             # Generate new summary using AI service
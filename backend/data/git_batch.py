@@ -0,0 +1,273 @@
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Set, Union
+import base64
+import threading
+import time
+import requests
+from config import settings
+from config.constants import GITHUB_API_URL
+from .github_client import GitHubClient, github_client
+from .sha_index import get_sha_index, git_blob_sha
+
+# Content may be given as a callable so it is rendered at commit time
+# (used for users.json, which must reflect the latest in-process state).
+# None stages a deletion.
+StagedContent = Union[str, Callable[[], str], None]
+
+_active_batch: ContextVar[Optional["GitCommitBatch"]] = ContextVar("active_commit_batch", default=None)
+
+def get_active_batch() -> Optional["GitCommitBatch"]:
+    """Return the commit batch active in the current context, if any"""
+    return _active_batch.get()
+
+def set_active_batch(batch: Optional["GitCommitBatch"]):
+    """Make batch the active one in the current context; returns a token for reset_active_batch"""
+    return _active_batch.set(batch)
+
+def reset_active_batch(token) -> None:
+    _active_batch.reset(token)
+
+class GitCommitBatch:
+    """
+    Stages file writes and commits them as a single tree and commit through
+    the Git Data API (commits -> trees -> commits -> refs: four requests)
+    instead of a Contents API GET + PUT per file. Files above
+    inline_blob_limit bytes are uploaded as blobs first, so a large batch
+    does not become one oversized trees request.
+    """
+
+    MAX_REF_RETRIES = 3
+
+    def __init__(self, message: str, repo_owner: str, repo_name: str, branch: str,
+                 token: Optional[str], github_api_url: str = GITHUB_API_URL,
+                 client: Optional[GitHubClient] = None, inline_blob_limit: Optional[int] = None):
+        self.message = message
+        self.repo_owner = repo_owner
+        self.repo_name = repo_name
+        self.branch = branch
+        self.token = token
+        self.github_api_url = github_api_url
+        self.client = client or github_client
+        self.inline_blob_limit = settings.GITHUB_INLINE_BLOB_LIMIT if inline_blob_limit is None else inline_blob_limit
+        # Blob SHAs already uploaded by this batch, so a retried commit does not upload them again
+        self._uploaded_blobs: Set[str] = set()
+        self._files: Dict[str, StagedContent] = {}
+        self._commit_callbacks: List[Callable[[], None]] = []
+        self._failure_callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        # Flush metrics, exposed so runs can report what a batch cost
+        self.stats: Dict[str, float] = {"flushes": 0, "files_committed": 0, "files_skipped": 0,
+                                        "blobs_uploaded": 0, "api_requests": 0, "flush_seconds": 0.0}
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        with self._lock:
+            self.stats["api_requests"] += 1
+        return self.client.request(method, url, **kwargs)
+
+    def _repo_url(self) -> str:
+        return f"{self.github_api_url}/repos/{self.repo_owner}/{self.repo_name}"
+
+    def targets(self, repo_owner: str, repo_name: str, branch: str) -> bool:
+        """Whether writes to this repo/branch can be staged in this batch"""
+        return (self.repo_owner, self.repo_name, self.branch) == (repo_owner, repo_name, branch)
+
+    def stage(self, path: str, content: StagedContent) -> None:
+        """Stage a file; a later write to the same path replaces the earlier one"""
+        with self._lock:
+            self._files[path] = content
+
+    def stage_delete(self, path: str) -> None:
+        """Stage removal of a file"""
+        self.stage(path, None)
+
+    def add_commit_callback(self, callback: Callable[[], None]) -> None:
+        """Run callback once the staged files are on the branch"""
+        with self._lock:
+            self._commit_callbacks.append(callback)
+
+    def add_failure_callback(self, callback: Callable[[], None]) -> None:
+        """Run callback if the batch is abandoned before the staged files land (see abandon)"""
+        with self._lock:
+            self._failure_callbacks.append(callback)
+
+    def staged_paths(self) -> List[str]:
+        with self._lock:
+            return list(self._files)
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return not self._files
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.stats)
+
+    def commit(self) -> Optional[str]:
+        """
+        Write all staged files as one commit on the branch. Files whose content
+        already matches the branch (same git blob SHA) are left out, and no
+        commit is made when nothing changed.
+
+        Returns:
+            The new commit SHA, or None if nothing needed writing
+        """
+        with self._lock:
+            files = dict(self._files)
+            callbacks = list(self._commit_callbacks)
+            failure_callbacks = list(self._failure_callbacks)
+        if not files:
+            return None
+
+        started = time.monotonic()
+        commit_sha: Optional[str] = None
+        for attempt in range(self.MAX_REF_RETRIES + 1):
+            # Rendered per attempt so callable content reflects the latest state
+            changed = self._changed_files(files)
+            if not changed:
+                break
+            commit_sha = self._try_commit(changed)
+            if commit_sha:
+                break
+            print(f"[Git Batch] Branch {self.branch} moved during commit, retrying ({attempt + 1}/{self.MAX_REF_RETRIES})")
+        else:
+            raise Exception(f"Failed to commit {len(files)} file(s) to {self.branch}: branch kept moving")
+
+        with self._lock:
+            # Drop only what was committed; entries restaged meanwhile stay for the next commit
+            for path, content in files.items():
+                if path in self._files and self._files[path] is content:
+                    del self._files[path]
+            self._commit_callbacks = [cb for cb in self._commit_callbacks if cb not in callbacks]
+            self._failure_callbacks = [cb for cb in self._failure_callbacks if cb not in failure_callbacks]
+            written = len(changed)
+            if commit_sha:
+                self.stats["flushes"] += 1
+            self.stats["files_committed"] += written
+            self.stats["files_skipped"] += len(files) - written
+            self.stats["flush_seconds"] = round(self.stats["flush_seconds"] + time.monotonic() - started, 3)
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[Git Batch] Commit callback failed: {e}")
+
+        if commit_sha:
+            print(f"[Git Batch] Committed {written} file(s) to {self.repo_name}@{self.branch}: {commit_sha[:7]}"
+                  f" ({len(files) - written} unchanged skipped)")
+        else:
+            print(f"[Git Batch] All {len(files)} staged file(s) unchanged, skipped commit")
+        return commit_sha
+
+    def finish(self) -> Optional[str]:
+        """
+        Final commit of the batch. A failed commit is not retried later, so
+        everything staged is abandoned before the error is raised.
+        """
+        try:
+            return self.commit()
+        except Exception as e:
+            self.abandon(e)
+            raise
+
+    def abandon(self, error: Optional[Exception] = None) -> None:
+        """
+        Drop the staged files and commit callbacks, and run the failure callbacks,
+        so state waiting on this batch (pending overlays, queued emails) is released.
+        """
+        with self._lock:
+            files = len(self._files)
+            dropped = len(self._commit_callbacks)
+            failure_callbacks = list(self._failure_callbacks)
+            self._files.clear()
+            self._commit_callbacks.clear()
+            self._failure_callbacks.clear()
+        if files or dropped:
+            print(f"[Git Batch] Abandoned {files} staged file(s) and {dropped} commit callback(s)"
+                  f" for {self.repo_name}@{self.branch}: {error}")
+        for callback in failure_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[Git Batch] Failure callback failed: {e}")
+
+    def _render(self, content: StagedContent) -> Optional[str]:
+        return content() if callable(content) else content
+
+    def _changed_files(self, files: Dict[str, StagedContent]) -> Dict[str, Optional[str]]:
+        """Render staged files and keep those whose blob SHA differs from the branch"""
+        sha_index = self._sha_index()
+        changed = {}
+        for path, content in files.items():
+            text = self._render(content)
+            known, remote_sha = sha_index.lookup(path)
+            if known and remote_sha == (git_blob_sha(text) if text is not None else None):
+                continue
+            changed[path] = text
+        return changed
+
+    def _sha_index(self):
+        return get_sha_index(self.repo_owner, self.repo_name, self.branch, self.token, self.github_api_url)
+
+    def _tree_entry(self, path: str, text: Optional[str]) -> Dict[str, Optional[str]]:
+        if text is None:
+            # A null sha removes the path from the base tree
+            return {"path": path, "mode": "100644", "type": "blob", "sha": None}
+        if len(text.encode("utf-8")) > self.inline_blob_limit:
+            return {"path": path, "mode": "100644", "type": "blob", "sha": self._upload_blob(text)}
+        return {"path": path, "mode": "100644", "type": "blob", "content": text}
+
+    def _upload_blob(self, text: str) -> str:
+        """Create a blob for large content and return its SHA"""
+        sha = git_blob_sha(text)
+        with self._lock:
+            if sha in self._uploaded_blobs:
+                return sha
+        r = self._request("POST", f"{self._repo_url()}/git/blobs",
+                          json={"content": base64.b64encode(text.encode("utf-8")).decode("ascii"), "encoding": "base64"})
+        if r.status_code != 201:
+            raise Exception(f"Failed to create blob: {r.status_code} {r.text}")
+        sha = r.json()["sha"]
+        with self._lock:
+            self._uploaded_blobs.add(sha)
+            self.stats["blobs_uploaded"] += 1
+        return sha
+
+    def _try_commit(self, rendered: Dict[str, Optional[str]]) -> Optional[str]:
+        """One attempt at tree + commit + ref update. Returns None if the ref moved underneath us."""
+        # 1. Current head commit and its tree
+        r = self._request("GET", f"{self._repo_url()}/commits/{self.branch}")
+        if r.status_code != 200:
+            raise Exception(f"Failed to read head of {self.branch}: {r.status_code} {r.text}")
+        head = r.json()
+        head_sha = head["sha"]
+        base_tree_sha = head["commit"]["tree"]["sha"]
+
+        # 2. New tree on top of it, small blobs inlined as content
+        tree_entries = [self._tree_entry(path, text) for path, text in rendered.items()]
+        r = self._request("POST", f"{self._repo_url()}/git/trees",
+                          json={"base_tree": base_tree_sha, "tree": tree_entries})
+        if r.status_code != 201:
+            raise Exception(f"Failed to create tree: {r.status_code} {r.text}")
+        tree_sha = r.json()["sha"]
+
+        # 3. Commit pointing at the new tree
+        r = self._request("POST", f"{self._repo_url()}/git/commits",
+                          json={"message": self.message, "tree": tree_sha, "parents": [head_sha]})
+        if r.status_code != 201:
+            raise Exception(f"Failed to create commit: {r.status_code} {r.text}")
+        commit_sha = r.json()["sha"]
+
+        # 4. Fast-forward the branch; 422 means someone else committed first
+        r = self._request("PATCH", f"{self._repo_url()}/git/refs/heads/{self.branch}",
+                          json={"sha": commit_sha, "force": False})
+        if r.status_code == 422:
+            return None
+        if r.status_code != 200:
+            raise Exception(f"Failed to update {self.branch}: {r.status_code} {r.text}")
+
+        # Keep the shared SHA index current so later Contents API writes skip their lookup
+        sha_index = self._sha_index()
+        for path, text in rendered.items():
+            sha_index.set(path, git_blob_sha(text) if text is not None else None)
+        return commit_sha
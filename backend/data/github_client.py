@@ -0,0 +1,223 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import base64
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from config import settings
+
+class FileContent:
+    """A decoded Contents API file and the ETag it was served with"""
+
+    def __init__(self, text: str, sha: Optional[str], etag: Optional[str]):
+        self.text = text
+        self.sha = sha
+        self.etag = etag
+
+class ContentsCache:
+    """
+    Bounded LRU of Contents API reads keyed by URL and query parameters.
+    Entries are revalidated with If-None-Match, never served blind.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, FileContent]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[FileContent]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: FileContent) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def record(self, hit: bool) -> None:
+        with self._lock:
+            self.stats["hits" if hit else "misses"] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, size=len(self._entries))
+
+class GitHubClient:
+    """
+    Shared GitHub REST client.
+
+    One keep-alive session (and connection pool) for every data-layer class, so
+    calls to api.github.com reuse TCP/TLS connections instead of handshaking
+    each time. Retries 5xx responses, connection errors and secondary rate
+    limits with exponential backoff. File reads go through a conditional-GET
+    cache: a 304 costs no rate limit and skips the base64 decode.
+    """
+
+    RETRY_STATUSES = (500, 502, 503, 504)
+    # Longer waits (e.g. an exhausted hourly quota) are returned to the caller instead
+    MAX_RETRY_DELAY = 60
+
+    def __init__(self, token: Optional[str], github_api_url: str, pool_size: int,
+                 timeout: float, max_retries: int, backoff_seconds: float, cache_size: int = 0):
+        self.token = token
+        self.github_api_url = github_api_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self._get_headers())
+
+        self.stats: Dict[str, int] = {"requests": 0, "retries": 0}
+        self._stats_lock = threading.Lock()
+        self.contents_cache = ContentsCache(cache_size)
+
+    def _get_headers(self) -> Dict[str, str]:
+        headers = {"Accept": "application/vnd.github.v3+json"}
+        if self.token:
+            headers["Authorization"] = f"token {self.token}"
+        return headers
+
+    def repo_url(self, repo_owner: str, repo_name: str) -> str:
+        return f"{self.github_api_url}/repos/{repo_owner}/{repo_name}"
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request through the pooled session. url may be absolute or a
+        path relative to the API root. Returns the final response; raises the
+        last connection error if every attempt failed to connect.
+        """
+        if url.startswith("/"):
+            url = f"{self.github_api_url}{url}"
+        kwargs.setdefault("timeout", self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            self._count("requests")
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"[GitHub Client] {method} {url} failed ({e}), retrying in {delay:.1f}s")
+            else:
+                retry_delay = self._retry_delay(response, attempt)
+                if retry_delay is None or retry_delay > self.MAX_RETRY_DELAY or attempt >= self.max_retries:
+                    return response
+                delay = retry_delay
+                print(f"[GitHub Client] {method} {url} returned {response.status_code}, retrying in {delay:.1f}s")
+            self._count("retries")
+            time.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", url, **kwargs)
+
+    def get_file(self, url: str, params: Optional[Dict[str, Any]] = None) -> Tuple[int, Optional[FileContent]]:
+        """
+        Read a file through the Contents API, revalidating any cached copy
+        with If-None-Match.
+
+        Returns:
+            Tuple of (status_code, file). file is None unless the status is
+            200 (fresh read) or 304 (cached copy still current).
+        """
+        key = self._cache_key(url, params)
+        cached = self.contents_cache.get(key)
+        headers = {"If-None-Match": cached.etag} if cached is not None and cached.etag else {}
+
+        response = self.get(url, params=params, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            self.contents_cache.record(hit=True)
+            return 304, cached
+
+        self.contents_cache.record(hit=False)
+        if response.status_code != 200:
+            if response.status_code == 404:
+                self.contents_cache.pop(key)
+            return response.status_code, None
+
+        data = response.json()
+        file = FileContent(
+            base64.b64decode(data["content"]).decode("utf-8"),
+            data.get("sha"),
+            response.headers.get("ETag")
+        )
+        self.contents_cache.put(key, file)
+        return 200, file
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats: Dict[str, Any] = dict(self.stats)
+        stats["contents_cache"] = self.contents_cache.get_stats()
+        return stats
+
+    def _cache_key(self, url: str, params: Optional[Dict[str, Any]]) -> str:
+        if url.startswith("/"):
+            url = f"{self.github_api_url}{url}"
+        if not params:
+            return url
+        return url + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_seconds * (2 ** attempt)
+
+    def _retry_delay(self, response: requests.Response, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying response, or None if it should not be retried"""
+        if response.status_code in self.RETRY_STATUSES:
+            return self._backoff(attempt)
+
+        if response.status_code in (403, 429):
+            # Secondary rate limits come with Retry-After; primary ones with remaining == 0
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                reset = response.headers.get("X-RateLimit-Reset")
+                if reset and reset.isdigit():
+                    return max(0.0, float(reset) - time.time()) + 1
+                return self._backoff(attempt)
+            if response.status_code == 429 or "secondary rate limit" in response.text.lower():
+                return self._backoff(attempt)
+        return None
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+# Global client shared by all repositories and the GitHub sync service
+github_client = GitHubClient(
+    token=settings.REPORTS_GITHUB_TOKEN,
+    github_api_url=settings.GITHUB_API_URL,
+    pool_size=settings.GITHUB_POOL_SIZE,
+    timeout=settings.GITHUB_TIMEOUT,
+    max_retries=settings.GITHUB_MAX_RETRIES,
+    backoff_seconds=settings.GITHUB_BACKOFF_SECONDS,
+    cache_size=settings.GITHUB_CACHE_SIZE
+)
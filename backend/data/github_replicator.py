@@ -0,0 +1,81 @@
+from typing import Any, Callable, Optional
+import threading
+import time
+import traceback
+
+class GitHubReplicator:
+    """
+    Background replica writer. Writes mark the replica dirty; a worker thread
+    waits for the burst to settle, takes one snapshot and pushes it, so many
+    local writes cost a single GitHub commit.
+    """
+
+    def __init__(self, name: str, snapshot_fn: Callable[[], Any], push_fn: Callable[[Any], bool],
+                 delay_seconds: float):
+        self.name = name
+        self.snapshot_fn = snapshot_fn
+        self.push_fn = push_fn
+        self.delay_seconds = delay_seconds
+        self._condition = threading.Condition()
+        self._dirty = False
+        self._in_flight = False
+        self._last_marked = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def mark_dirty(self) -> None:
+        """Schedule a push of the current state"""
+        with self._condition:
+            self._dirty = True
+            self._last_marked = time.monotonic()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-replicator", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Push pending changes now and wait for them to land.
+        Used by short-lived processes (scheduler.py) before they exit.
+
+        Returns:
+            True if nothing is left to replicate, False on timeout
+        """
+        end = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            # Skip the debounce wait
+            self._last_marked = 0.0
+            self._condition.notify_all()
+            while self._dirty or self._in_flight:
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._dirty:
+                    self._condition.wait()
+                # Debounce: wait until no write has arrived for delay_seconds
+                while time.monotonic() - self._last_marked < self.delay_seconds:
+                    self._condition.wait(self.delay_seconds - (time.monotonic() - self._last_marked))
+                self._dirty = False
+                self._in_flight = True
+
+            pushed = False
+            try:
+                pushed = self.push_fn(self.snapshot_fn())
+                if not pushed:
+                    print(f"[{self.name} Replicator] Push failed, will retry")
+            except Exception as e:
+                print(f"[{self.name} Replicator] Error replicating to GitHub: {e}")
+                traceback.print_exc()
+            finally:
+                with self._condition:
+                    self._in_flight = False
+                    if not pushed:
+                        # Retry after the usual delay rather than spinning
+                        self._dirty = True
+                        self._last_marked = time.monotonic()
+                    self._condition.notify_all()
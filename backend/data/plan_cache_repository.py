@@ -0,0 +1,131 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import re
+import threading
+import unicodedata
+from .base_repository import BaseRepository
+from config import settings
+
+def canonical_topic(topic: str) -> str:
+    """Cache key for a topic: case, whitespace and punctuation folded ("Machine  Learning!" -> "machine learning")"""
+    value = unicodedata.normalize("NFKC", topic).casefold()
+    value = re.sub(r'[^\w\s]', ' ', value)
+    return re.sub(r'\s+', ' ', value).strip()
+
+class PlanCacheRepository(BaseRepository):
+    """
+    Learning plans already generated, keyed by canonical topic. Stores the raw
+    plan and the extracted topic titles, so a hit skips the plan completion.
+    Plans generated by another OPENAI_MODEL are treated as misses.
+
+    The cache is a local file (PLAN_CACHE_FILE), so it only lasts as long as
+    the host's disk: on Render it starts empty after every restart or deploy
+    unless PLAN_CACHE_FILE points at a persistent disk. Losing it only costs
+    one plan completion per topic.
+    """
+
+    def __init__(self):
+        file_path = os.path.join(os.path.dirname(__file__), "..", settings.PLAN_CACHE_FILE)
+        super().__init__(file_path)
+        self.enabled = settings.PLAN_CACHE_ENABLED
+        self._lock = threading.RLock()
+        self._plans: Optional[Dict[str, Dict[str, Any]]] = None
+        self._entry_hits: Dict[str, int] = {}
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+    def _get_default_data(self) -> List[Dict[str, Any]]:
+        return []
+
+    def _record_key(self, record: Dict[str, Any]) -> Tuple[str]:
+        return (record["topic_key"],)
+
+    def _ensure_loaded(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if self._plans is None:
+                try:
+                    self._plans = {record["topic_key"]: record for record in self._load_data()}
+                except Exception as e:
+                    print(f"[Plan Cache] Could not load {self.file_path}, starting empty: {e}")
+                    self._plans = {}
+            return self._plans
+
+    def find(self, topic: str) -> Optional[Dict[str, Any]]:
+        """Cached plan for topic, or None; counts towards the hit rate"""
+        if not self.enabled:
+            return None
+        key = canonical_topic(topic)
+        with self._lock:
+            record = self._ensure_loaded().get(key)
+            # A plan from a different model is regenerated (and replaced on save)
+            if record is None or record.get("model") != settings.OPENAI_MODEL:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self._entry_hits[key] = self._entry_hits.get(key, 0) + 1
+            return dict(record, topics=list(record["topics"]))
+
+    def save(self, topic: str, raw_plan: str, topics: List[str]) -> None:
+        """Remember a generated plan; plans without topics (errors) are never cached"""
+        if not self.enabled or not topics:
+            return
+        record: Dict[str, Any] = {
+            "topic_key": canonical_topic(topic),
+            "topic": topic,
+            "raw_plan": raw_plan,
+            "topics": list(topics),
+            "model": settings.OPENAI_MODEL,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        with self._lock:
+            self._ensure_loaded()[record["topic_key"]] = record
+            self.stats["stores"] += 1
+            try:
+                self.engine.upsert(self._record_key(record), record)
+            except Exception as e:
+                print(f"[Plan Cache] Failed to persist plan for {topic}: {e}")
+
+    def invalidate(self, topic: str) -> bool:
+        """Drop the cached plan for topic; returns False if there was none"""
+        key = canonical_topic(topic)
+        with self._lock:
+            if self._ensure_loaded().pop(key, None) is None:
+                return False
+            self._entry_hits.pop(key, None)
+            self.stats["invalidations"] += 1
+            self.engine.delete((key,))
+            return True
+
+    def clear(self) -> int:
+        """Drop every cached plan; returns how many were removed"""
+        with self._lock:
+            count = len(self._ensure_loaded())
+            self._plans = {}
+            self._entry_hits.clear()
+            self.stats["invalidations"] += count
+            self._save_data([])
+            return count
+
+    def list_entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "topic_key": key,
+                    "topic": record["topic"],
+                    "topics": len(record["topics"]),
+                    "model": record.get("model"),
+                    "created_at": record.get("created_at"),
+                    "hits": self._entry_hits.get(key, 0)
+                }
+                for key, record in self._ensure_loaded().items()
+            ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(
+                self.stats,
+                enabled=self.enabled,
+                size=len(self._ensure_loaded()),
+                hit_rate=round(self.stats["hits"] / lookups, 3) if lookups else 0.0
+            )
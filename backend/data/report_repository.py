@@ -1,25 +1,41 @@
-from typing import Optional, Dict
-import requests
+from typing import Optional, Dict, Iterator, Tuple
+from contextlib import contextmanager
 import base64
 import re
+import threading
 from urllib.parse import quote
 from config import settings
+from .github_client import github_client
+from .sha_index import GitHubShaIndex, get_sha_index, git_blob_sha
+from .git_batch import GitCommitBatch, get_active_batch, set_active_batch, reset_active_batch
+
+class UploadResult:
+    """
+    Outcome of an upload: the public URL and whether anything was written to GitHub.
+    Staged uploads are written (or dropped as unchanged) when their batch commits.
+    """
+    
+    def __init__(self, url: str, path: str, written: bool, staged: bool = False):
+        self.url = url
+        self.path = path
+        self.written = written
+        self.staged = staged
 
 class ReportRepository:
     """Repository for report files stored on GitHub"""
     
+    MAX_CONFLICT_RETRIES = 3
+    
     def __init__(self):
-        self.github_api_url = "https://api.github.com"
+        self.github_api_url = settings.GITHUB_API_URL
         self.repo_owner = settings.GITHUB_REPO_OWNER
         self.repo_name = settings.GITHUB_REPO_NAME
         self.branch = settings.GITHUB_BRANCH
         self.token = settings.REPORTS_GITHUB_TOKEN
-    
-    def _get_headers(self) -> Dict[str, str]:
-        return {
-            "Authorization": f"token {self.token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
+        self.client = github_client
+        # Write counters for this instance (PUTs made vs. skipped because content was unchanged)
+        self.write_stats: Dict[str, int] = {"written": 0, "skipped_unchanged": 0, "staged": 0}
+        self._stats_lock = threading.Lock()
     
     def upload_report(self, email: str, topic: str, content: str, 
                      filename: Optional[str] = None, content_type: str = "html") -> str:
@@ -34,40 +50,125 @@ class ReportRepository:
             filename: Optional filename (without extension)
             content_type: Type of content ("html" or "json")
         """
-        user_dir = self._user_dir_from_email(email)
-        topic_slug = self._slugify_topic(topic)
-        dir_path = f"reports/{user_dir}/{topic_slug}"
-        
-        if filename:
-            file_slug = self._slugify_topic(filename)
-            file_name = f"{file_slug}.{content_type}"
-        else:
-            file_name = f"{topic}.{content_type}"
-        
+        return self.upload_file(email, topic, content, filename, content_type).url
+    
+    def upload_file(self, email: str, topic: str, content: str, 
+                    filename: Optional[str] = None, content_type: str = "html") -> UploadResult:
+        """
+        Same as upload_report, but returns an UploadResult telling whether a write happened.
+        The upload is skipped when the git blob SHA of content matches the file already on GitHub.
+        """
+        dir_path, file_name = self._file_location(email, topic, filename, content_type)
         file_path = f"{dir_path}/{file_name}"
+        public_url = self._public_url(dir_path, file_name)
+        
+        # Inside a batch, stage the file; it is written with the batch's single commit
+        batch = get_active_batch()
+        if batch is not None and batch.targets(self.repo_owner, self.repo_name, self.branch):
+            # Unchanged files are dropped when the batch commits
+            batch.stage(file_path, content)
+            self._count("staged")
+            return UploadResult(public_url, file_path, written=False, staged=True)
         
-        # Check if file exists to get its SHA (for update vs create)
-        sha = self._get_file_sha(file_path)
+        sha_index = self._sha_index()
+        known, remote_sha = sha_index.lookup(file_path)
+        if known and remote_sha == git_blob_sha(content):
+            print(f"[Report Repository] {file_path} unchanged, skipping upload")
+            self._count("skipped_unchanged")
+            return UploadResult(public_url, file_path, written=False)
         
         # Prepare commit payload
         content_b64 = base64.b64encode(content.encode("utf-8")).decode("utf-8")
         commit_msg = f"Add {content_type} file for {email} - {topic}"
-        payload = {
-            "message": commit_msg,
-            "content": content_b64,
-            "branch": self.branch
-        }
-        if sha:
-            payload["sha"] = sha
-        
         url = f"{self.github_api_url}/repos/{self.repo_owner}/{self.repo_name}/contents/{quote(file_path)}"
-        r = requests.put(url, headers=self._get_headers(), json=payload)
+        
+        # Concurrent scheduler workers commit to the same branch, so a PUT can
+        # lose the race (409), or be sent with a stale SHA (422); drop the
+        # indexed SHA, refetch it and retry a few times.
+        for attempt in range(self.MAX_CONFLICT_RETRIES + 1):
+            # Existing file SHA (for update vs create), from the index when possible
+            sha = sha_index.get_sha(file_path, self._get_file_sha)
+            payload = {
+                "message": commit_msg,
+                "content": content_b64,
+                "branch": self.branch
+            }
+            if sha:
+                payload["sha"] = sha
+            
+            r = self.client.put(url, json=payload)
+            if r.status_code not in (409, 422):
+                break
+            sha_index.invalidate(file_path)
+            print(f"[Report Repository] Conflict uploading {file_path}, retrying ({attempt + 1}/{self.MAX_CONFLICT_RETRIES})")
+        
         if r.status_code not in (200, 201):
             raise Exception(f"Failed to upload {content_type} file: {r.status_code} {r.text}")
+        sha_index.set(file_path, r.json().get("content", {}).get("sha"))
+        self._count("written")
         
-        # Construct the public GitHub Pages URL
-        public_url = f"https://{self.repo_owner.lower()}.github.io/{self.repo_name}/{dir_path}/{quote(file_name)}"
-        return public_url
+        return UploadResult(public_url, file_path, written=True)
+    
+    @contextmanager
+    def batch(self, message: str) -> Iterator[Optional[GitCommitBatch]]:
+        """
+        Stage every upload made inside the block (by any repository or the users.json
+        sync) and write them as one commit when the block exits.
+        Nested calls join the batch that is already active.
+        """
+        active = get_active_batch()
+        if active is not None or not settings.GITHUB_BATCH_COMMITS:
+            yield active
+            return
+        
+        batch = GitCommitBatch(message, self.repo_owner, self.repo_name, self.branch,
+                               self.token, self.github_api_url)
+        token = set_active_batch(batch)
+        try:
+            yield batch
+        except BaseException:
+            reset_active_batch(token)
+            # Commit what was staged even if the block failed part-way, matching the
+            # per-file behaviour where earlier uploads stuck; a commit error is only
+            # logged so the block's own exception is the one raised
+            try:
+                batch.finish()
+            except Exception as commit_error:
+                print(f"[Report Repository] Commit after a failed batch block also failed: {commit_error}")
+            raise
+        reset_active_batch(token)
+        batch.finish()
+    
+    def public_url_for(self, email: str, topic: str, filename: Optional[str] = None,
+                       content_type: str = "html") -> str:
+        """Public URL upload_report returns for these arguments, without uploading anything"""
+        return self._public_url(*self._file_location(email, topic, filename, content_type))
+    
+    def public_dir_url(self, email: str, topic: str) -> str:
+        """Public URL of the directory a user's reports on topic are uploaded to"""
+        return self._public_url(*self._file_location(email, topic, None, "html")).rsplit("/", 1)[0]
+    
+    def file_slug(self, filename: str) -> str:
+        """Slug upload_report gives a report file name (without extension)"""
+        return self._slugify_topic(filename)
+    
+    def _file_location(self, email: str, topic: str, filename: Optional[str],
+                       content_type: str) -> Tuple[str, str]:
+        """(directory, file name) of an upload in the reports repository"""
+        user_dir = self._user_dir_from_email(email)
+        topic_slug = self._slugify_topic(topic)
+        dir_path = f"reports/{user_dir}/{topic_slug}"
+        
+        if filename:
+            file_slug = self._slugify_topic(filename)
+            file_name = f"{file_slug}.{content_type}"
+        else:
+            file_name = f"{topic}.{content_type}"
+        return dir_path, file_name
+    
+    def _public_url(self, dir_path: str, file_name: str) -> str:
+        """Construct the public GitHub Pages URL"""
+        return f"https://{self.repo_owner.lower()}.github.io/{self.repo_name}/{dir_path}/{quote(file_name)}"
     
     def _slugify_topic(self, value: str) -> str:
         """
@@ -86,12 +187,19 @@ class ReportRepository:
         username = re.sub(r'[^a-zA-Z0-9]', '', username)
         return username
     
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.write_stats[key] += 1
+    
+    def _sha_index(self) -> GitHubShaIndex:
+        return get_sha_index(self.repo_owner, self.repo_name, self.branch, self.token, self.github_api_url)
+    
     def _get_file_sha(self, path: str) -> Optional[str]:
         """
         Returns the SHA of a file in the repo if it exists, else None.
         """
         url = f"{self.github_api_url}/repos/{self.repo_owner}/{self.repo_name}/contents/{quote(path)}"
-        r = requests.get(url, headers=self._get_headers())
+        r = self.client.get(url)
         if r.status_code == 200:
             return r.json().get('sha')
         return None 
\ No newline at end of file
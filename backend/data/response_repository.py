@@ -1,26 +1,22 @@
 from typing import Dict, Any, Optional
-import requests
-import base64
 import json
 import re
 from urllib.parse import quote
 from datetime import datetime
 from config import settings
+from .github_client import github_client
+from .report_repository import ReportRepository
 
 class ResponseRepository:
     """Repository for AI response data stored on GitHub"""
     
     def __init__(self):
-        self.github_api_url = "https://api.github.com"
+        self.github_api_url = settings.GITHUB_API_URL
         self.repo_owner = settings.GITHUB_REPO_OWNER
         self.repo_name = settings.GITHUB_REPO_NAME
         self.token = settings.REPORTS_GITHUB_TOKEN
-    
-    def _get_headers(self) -> Dict[str, str]:
-        return {
-            "Authorization": f"token {self.token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
+        self.client = github_client
+        self.report_repo = ReportRepository()
     
     def save_response(self, user_email: str, main_topic: str, response_type: str, 
                      response_data: Dict[str, Any], report_topic: Optional[str] = None, 
@@ -65,9 +61,7 @@ class ResponseRepository:
         json_content = json.dumps(response_data, indent=2, ensure_ascii=False)
         
         # Upload to GitHub using report repository
-        from .report_repository import ReportRepository
-        report_repo = ReportRepository()
-        github_url = report_repo.upload_report(user_email, main_topic, json_content, filename, "json")
+        github_url = self.report_repo.upload_report(user_email, main_topic, json_content, filename, "json")
         print(f"[Response Repository] Uploaded {response_type} response to GitHub: {github_url}")
         return github_url
     
@@ -77,30 +71,27 @@ class ResponseRepository:
         try:
             # Generate the expected filename
             if response_type == "learning_plan":
-                filename = "learning_plan_response.json"
+                filename = "learning_plan_response"
             elif response_type == "report":
                 if not report_topic:
                     raise ValueError("report_topic is required for report responses")
-                filename = f"{self._normalize_filename(report_topic)}_response.json"
+                filename = f"{self._normalize_filename(report_topic)}_response"
             else:
                 raise ValueError(f"Invalid response_type: {response_type}")
             
-            # Construct GitHub API URL
-            user_dir = user_email.replace('@', '').replace('.', '')
-            topic_dir = self._normalize_filename(main_topic)
-            file_path = f"reports/{user_dir}/{topic_dir}/{filename}"
+            # Same location save_response uploads to
+            dir_path, file_name = self.report_repo._file_location(user_email, main_topic, filename, "json")
+            file_path = f"{dir_path}/{file_name}"
             
             url = f"{self.github_api_url}/repos/{self.repo_owner}/{self.repo_name}/contents/{quote(file_path)}"
-            response = requests.get(url, headers=self._get_headers())
+            status, file = self.client.get_file(url)
             
-            if response.status_code != 200:
-                print(f"[Response Repository] Response not found on GitHub: {response.status_code}")
+            if file is None:
+                print(f"[Response Repository] Response not found on GitHub: {status}")
                 return None
             
-            # Decode content from GitHub
-            content_b64 = response.json()['content']
-            content = base64.b64decode(content_b64).decode('utf-8')
-            response_data = json.loads(content)
+            # Decoded (or revalidated from cache) by the client
+            response_data = json.loads(file.text)
             
             print(f"[Response Repository] Loaded {response_type} response from GitHub: {file_path}")
             return response_data
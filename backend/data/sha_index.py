@@ -0,0 +1,111 @@
+from typing import Callable, Dict, Optional, Tuple
+import hashlib
+import threading
+from config import settings
+from .github_client import github_client
+
+def git_blob_sha(content: str) -> str:
+    """SHA-1 git assigns to a blob with this content (what the Contents API reports as `sha`)"""
+    data = content.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+class GitHubShaIndex:
+    """
+    In-process path -> blob SHA index for one repository branch.
+
+    Populated from a single recursive tree request and kept current from write
+    responses, so uploads can skip the Contents GET they would otherwise make
+    just to learn the SHA of the file they are replacing.
+    """
+
+    def __init__(self, repo_owner: str, repo_name: str, branch: str, token: Optional[str],
+                 github_api_url: str):
+        self.repo_owner = repo_owner
+        self.repo_name = repo_name
+        self.branch = branch
+        self.token = token
+        self.github_api_url = github_api_url
+        self._shas: Dict[str, str] = {}
+        # Paths whose entry is known to be stale; they fall back to a Contents GET
+        self._invalidated: set = set()
+        self._loaded = False
+        self._load_attempted = False
+        # A truncated tree listing means a missing path is not proof the file does not exist
+        self._complete = False
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        """Populate the index from one recursive tree listing of the branch"""
+        self._load_attempted = True
+        try:
+            url = f"{self.github_api_url}/repos/{self.repo_owner}/{self.repo_name}/git/trees/{self.branch}"
+            r = github_client.get(url, params={"recursive": "1"})
+            if r.status_code != 200:
+                print(f"[SHA Index] Failed to load tree for {self.repo_name}@{self.branch}: {r.status_code}")
+                return False
+            data = r.json()
+            shas = {entry["path"]: entry["sha"] for entry in data.get("tree", []) if entry.get("type") == "blob"}
+            with self._lock:
+                self._shas = shas
+                self._invalidated.clear()
+                self._loaded = True
+                self._complete = not data.get("truncated", False)
+            print(f"[SHA Index] Loaded {len(shas)} path(s) for {self.repo_name}@{self.branch}")
+            return True
+        except Exception as e:
+            print(f"[SHA Index] Exception loading tree: {e}")
+            return False
+
+    def lookup(self, path: str) -> Tuple[bool, Optional[str]]:
+        """
+        Returns (known, sha). known is False when the index cannot answer for
+        this path and the caller must fall back to a Contents GET.
+        """
+        if not self._loaded and not self._load_attempted:
+            self.load()
+        with self._lock:
+            if path in self._invalidated:
+                return False, None
+            if path in self._shas:
+                return True, self._shas[path]
+            if self._loaded and self._complete:
+                return True, None
+            return False, None
+
+    def get_sha(self, path: str, fallback: Callable[[str], Optional[str]]) -> Optional[str]:
+        """SHA of path from the index, or from fallback(path) on a cache miss"""
+        known, sha = self.lookup(path)
+        if known:
+            return sha
+        sha = fallback(path)
+        self.set(path, sha)
+        return sha
+
+    def set(self, path: str, sha: Optional[str]) -> None:
+        """Record the current SHA of path (None if it does not exist)"""
+        with self._lock:
+            self._invalidated.discard(path)
+            if sha:
+                self._shas[path] = sha
+            else:
+                self._shas.pop(path, None)
+
+    def invalidate(self, path: str) -> None:
+        """Forget path after a 409/422 conflict so the next lookup goes to GitHub"""
+        with self._lock:
+            self._shas.pop(path, None)
+            self._invalidated.add(path)
+
+_indexes: Dict[Tuple[str, str, str], GitHubShaIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_sha_index(repo_owner: str, repo_name: str, branch: str, token: Optional[str],
+                  github_api_url: Optional[str] = None) -> GitHubShaIndex:
+    """Shared index for a repository branch, created on first use"""
+    key = (repo_owner, repo_name, branch)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = GitHubShaIndex(repo_owner, repo_name, branch, token, github_api_url or settings.GITHUB_API_URL)
+            _indexes[key] = index
+        return index
@@ -0,0 +1,117 @@
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+from .base_repository import RecordKey, StorageEngine
+
+class SQLiteEngine(StorageEngine):
+    """
+    Stores records as rows of a local SQLite table: one JSON document per row,
+    with the key columns stored alongside it under a unique index. Writes touch
+    only the affected row; reads never leave the machine.
+    """
+
+    def __init__(self, db_path: str, table: str, key_columns: Tuple[str, ...],
+                 key_fn: Callable[[Dict[str, Any]], RecordKey]):
+        self.db_path = db_path
+        self.table = table
+        self.key_columns = key_columns
+        self.key_fn = key_fn
+        self._lock = threading.RLock()
+        self._tx_depth = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One connection shared across threads; access is serialized by _lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        key_defs = ", ".join(f"{column} TEXT NOT NULL" for column in self.key_columns)
+        key_list = ", ".join(self.key_columns)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            f"id INTEGER PRIMARY KEY AUTOINCREMENT, {key_defs}, data TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{self.table}_key ON {self.table} ({key_list})"
+        )
+
+    def _where(self) -> str:
+        return " AND ".join(f"{column} = ?" for column in self.key_columns)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """BEGIN/COMMIT around the block; nested blocks join the outer transaction"""
+        with self._lock:
+            if self._tx_depth == 0:
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._tx_depth += 1
+            try:
+                yield
+            except BaseException:
+                self._tx_depth -= 1
+                if self._tx_depth == 0:
+                    self._conn.execute("ROLLBACK")
+                raise
+            else:
+                self._tx_depth -= 1
+                if self._tx_depth == 0:
+                    self._conn.execute("COMMIT")
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT data FROM {self.table} ORDER BY id").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_all(self, page_size: int = 100) -> Iterator[Dict[str, Any]]:
+        """Yield records a page at a time; the lock is only held while a page is read"""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, data FROM {self.table} WHERE id > ? ORDER BY id LIMIT ?", (last_id, page_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row_id, data in rows:
+                yield json.loads(data)
+            last_id = rows[-1][0]
+
+    def get(self, key: RecordKey) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT data FROM {self.table} WHERE {self._where()}", tuple(key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def upsert(self, key: RecordKey, record: Dict[str, Any]) -> None:
+        columns = ", ".join(self.key_columns)
+        placeholders = ", ".join("?" for _ in self.key_columns)
+        with self.transaction():
+            # ON CONFLICT keeps the row id, so records stay in insertion order
+            self._conn.execute(
+                f"INSERT INTO {self.table} ({columns}, data) VALUES ({placeholders}, ?) "
+                f"ON CONFLICT ({columns}) DO UPDATE SET data = excluded.data",
+                (*key, json.dumps(record, ensure_ascii=False))
+            )
+
+    def delete(self, key: RecordKey) -> bool:
+        with self.transaction():
+            cursor = self._conn.execute(f"DELETE FROM {self.table} WHERE {self._where()}", tuple(key))
+            return cursor.rowcount > 0
+
+    def replace_all(self, records: List[Dict[str, Any]]) -> None:
+        with self.transaction():
+            self._conn.execute(f"DELETE FROM {self.table}")
+            for record in records:
+                self.upsert(self.key_fn(record), record)
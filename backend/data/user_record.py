@@ -0,0 +1,196 @@
+from collections.abc import MutableMapping
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import quote, unquote
+
+# Keys of the user dict shape the rest of the code base reads and writes
+USER_FIELDS = ("email", "main_topic", "paid", "learning_plan", "current_index",
+               "plan_url", "report_links", "last_report_time")
+
+_report_repository = None
+
+def _reports():
+    global _report_repository
+    if _report_repository is None:
+        from .report_repository import ReportRepository
+        _report_repository = ReportRepository()
+    return _report_repository
+
+def _url_for(email: str, topic: str, filename: Optional[str] = None) -> str:
+    """Public URL ReportRepository.upload_report gives the file (plan page when filename is None)"""
+    return _reports().public_url_for(email, topic, filename)
+
+def _report_location(email: str, topic: str, filename: str) -> Tuple[str, str]:
+    """(directory URL, file slug) ReportRepository.upload_report uses for a report"""
+    reports = _reports()
+    return reports.public_dir_url(email, topic), reports.file_slug(filename)
+
+@dataclass(slots=True, eq=False)
+class UserRecord(MutableMapping):
+    """
+    One (user, topic) enrolment.
+
+    Stores only the learning plan, progress, and for each topic with a report
+    (by index) the slug of the file uploaded for it, plus the directory URL
+    those files were uploaded to. report_links is rebuilt from them, so later
+    plan edits or base URL changes do not repoint existing links; plan_url is
+    derived with the same path rules ReportRepository uses when uploading.
+    URLs that do not fit (older uploads) are kept as overrides so nothing is lost.
+
+    Behaves like the legacy user dict (user["plan_url"], user.get(...),
+    {**user}), so existing callers keep working.
+    """
+
+    email: str
+    main_topic: str
+    paid: bool = False
+    learning_plan: List[str] = field(default_factory=list)
+    current_index: int = 0
+    report_slugs: Dict[int, str] = field(default_factory=dict)
+    reports_url: Optional[str] = None
+    last_report_time: Optional[str] = None
+    plan_url_override: Optional[str] = None
+    link_overrides: Dict[int, str] = field(default_factory=dict)
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UserRecord":
+        """Build a record from either the compact stored shape or the legacy dict with full URLs"""
+        known = set(USER_FIELDS) | {"report_slugs", "reports_url", "reported", "link_overrides"}
+        record = cls(
+            email=data["email"],
+            main_topic=data["main_topic"],
+            paid=data.get("paid", False),
+            learning_plan=list(data.get("learning_plan") or []),
+            current_index=data.get("current_index", 0),
+            last_report_time=data.get("last_report_time"),
+            extra={key: value for key, value in data.items() if key not in known}
+        )
+        if "report_slugs" in data:
+            record.report_slugs = {int(idx): slug for idx, slug in sorted(data["report_slugs"].items(), key=lambda item: int(item[0]))}
+            record.reports_url = data.get("reports_url")
+            record.link_overrides = {int(idx): url for idx, url in (data.get("link_overrides") or {}).items()}
+            record.plan_url_override = data.get("plan_url")
+        elif "reported" in data:
+            # Earlier compact shape: indexes only (an int n for 0..n-1), slugs taken from the current plan
+            reported = data["reported"]
+            overrides = {int(idx): url for idx, url in (data.get("link_overrides") or {}).items()}
+            for idx in (range(reported) if isinstance(reported, int) else sorted(int(idx) for idx in reported)):
+                record.mark_reported(idx, overrides.get(idx))
+            record.plan_url_override = data.get("plan_url")
+        else:
+            record.report_links = data.get("report_links") or {}
+            if data.get("plan_url"):
+                record.plan_url = data["plan_url"]
+        return record
+
+    @classmethod
+    def coerce(cls, user: Union["UserRecord", Dict[str, Any]]) -> "UserRecord":
+        return user if isinstance(user, UserRecord) else cls.from_dict(user)
+
+    def to_storage(self) -> Dict[str, Any]:
+        """Compact shape written to users.json / shards / the database"""
+        data: Dict[str, Any] = {
+            "email": self.email,
+            "main_topic": self.main_topic,
+            "paid": self.paid,
+            "learning_plan": self.learning_plan,
+            "current_index": self.current_index,
+            "report_slugs": {str(idx): slug for idx, slug in self.report_slugs.items()},
+            "last_report_time": self.last_report_time
+        }
+        if self.reports_url:
+            data["reports_url"] = self.reports_url
+        if self.plan_url_override:
+            data["plan_url"] = self.plan_url_override
+        if self.link_overrides:
+            data["link_overrides"] = {str(idx): url for idx, url in self.link_overrides.items()}
+        data.update(self.extra)
+        return data
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Legacy shape with plan_url and report_links expanded"""
+        return {key: self[key] for key in self}
+
+    def copy(self) -> "UserRecord":
+        return UserRecord.from_dict(self.to_storage())
+
+    @property
+    def plan_url(self) -> str:
+        return self.plan_url_override or _url_for(self.email, self.main_topic)
+
+    @plan_url.setter
+    def plan_url(self, url: Optional[str]) -> None:
+        self.plan_url_override = url if url and url != _url_for(self.email, self.main_topic) else None
+
+    @property
+    def report_links(self) -> Dict[str, str]:
+        """Report URL per learning plan index (string keys, as after a JSON round trip)"""
+        links = {}
+        for idx in self.report_slugs:
+            url = self.link_overrides.get(idx) or self.report_url(idx)
+            if url:
+                links[str(idx)] = url
+        return links
+
+    @report_links.setter
+    def report_links(self, links: Dict[Any, str]) -> None:
+        self.report_slugs = {}
+        self.link_overrides = {}
+        for idx, url in sorted((int(key), url) for key, url in links.items()):
+            if url:
+                self.mark_reported(idx, url)
+
+    def report_url(self, idx: int) -> Optional[str]:
+        """URL of the report stored for learning plan topic idx, from its recorded slug"""
+        slug = self.report_slugs.get(idx)
+        if slug is None or not self.reports_url:
+            return None
+        return f"{self.reports_url}/{quote(slug)}.html"
+
+    def mark_reported(self, idx: int, url: Optional[str] = None) -> None:
+        """
+        Record that topic idx has a report. The slug comes from url when it points
+        into the reports directory, otherwise from the plan topic; a url that does
+        not match the stored slug is kept as an override.
+        """
+        topic = self.learning_plan[idx] if 0 <= idx < len(self.learning_plan) else str(idx)
+        reports_url, slug = _report_location(self.email, self.main_topic, topic)
+        if self.reports_url is None:
+            self.reports_url = reports_url
+        if url and url.startswith(f"{self.reports_url}/") and url.endswith(".html"):
+            name = url[len(self.reports_url) + 1:-len(".html")]
+            if "/" not in name:
+                slug = unquote(name)
+        self.report_slugs[idx] = slug
+        self.report_slugs = dict(sorted(self.report_slugs.items()))
+        if url and url != self.report_url(idx):
+            self.link_overrides[idx] = url
+        else:
+            self.link_overrides.pop(idx, None)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in USER_FIELDS:
+            return getattr(self, key)
+        return self.extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in USER_FIELDS:
+            setattr(self, key, value)
+        else:
+            self.extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in USER_FIELDS:
+            raise KeyError(f"{key} cannot be removed from a user record")
+        del self.extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from USER_FIELDS
+        yield from self.extra
+
+    def __len__(self) -> int:
+        return len(USER_FIELDS) + len(self.extra)
+
+    def __repr__(self) -> str:
+        return f"UserRecord(email={self.email!r}, main_topic={self.main_topic!r}, current_index={self.current_index})"
@@ -1,27 +1,121 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
+import copy
 import os
 import json
-from .base_repository import BaseRepository
+import threading
+import time
+from .base_repository import BaseRepository, StorageEngine
 from config import settings
 from services.github_sync_service import GitHubSyncService
+from .git_batch import get_active_batch
+from .github_replicator import GitHubReplicator
+from .user_shards import ShardedJsonEngine, UserShardStore
+from .user_record import UserRecord
+
+UserLike = Union[UserRecord, Dict[str, Any]]
+
+def _iter_json_array(text: str) -> Iterator[Any]:
+    """Yield the elements of a JSON array one by one with JSONDecoder.raw_decode"""
+    decoder = json.JSONDecoder()
+    length = len(text)
+    pos = _skip_whitespace(text, 0)
+    if pos >= length or text[pos] != "[":
+        raise ValueError("Expected a JSON array")
+    pos = _skip_whitespace(text, pos + 1)
+    if pos < length and text[pos] == "]":
+        return
+    while pos < length:
+        value, pos = decoder.raw_decode(text, pos)
+        yield value
+        pos = _skip_whitespace(text, pos)
+        if pos < length and text[pos] == ",":
+            pos = _skip_whitespace(text, pos + 1)
+        elif pos < length and text[pos] == "]":
+            return
+        else:
+            raise ValueError(f"Malformed JSON array at position {pos}")
+    raise ValueError("Unterminated JSON array")
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos] in " \t\n\r":
+        pos += 1
+    return pos
 
 class UserRepository(BaseRepository):
     def __init__(self):
         file_path = os.path.join(os.path.dirname(__file__), "..", settings.USERS_FILE)
-        super().__init__(file_path)
+        # With the SQLite engine the local database is the primary copy and
+        # users.json on GitHub is an asynchronously replicated backup
+        self.local_primary = settings.USERS_STORAGE_ENGINE == "sqlite"
+        # Sharded layout: one file per (user, topic) plus users/index.json, locally and on GitHub
+        self.sharded = settings.USERS_REMOTE_LAYOUT == "sharded"
+        super().__init__(file_path, self._create_engine())
         self.github_sync = GitHubSyncService()
+        self.shards: Optional[UserShardStore] = UserShardStore(self.github_sync) if self.sharded else None
+        self._shards_ready = False
+        self._bootstrapped = False
+        self.replicator: Optional[GitHubReplicator] = None
+        if self.local_primary:
+            self.replicator = GitHubReplicator(
+                "Users", self.engine.load_all, self._replicate_to_github, settings.USERS_REPLICATION_DELAY_SECONDS
+            )
+        # Serializes read-modify-write cycles on users.json across scheduler workers
+        self._write_lock = threading.RLock()
+        # Latest user list staged in commit batches that have not landed on GitHub yet.
+        # While any are pending, reads are served from it instead of the stale remote file.
+        self._staged_users: Optional[List[Dict[str, Any]]] = None
+        self._pending_batches = 0
+        # Write-through index of users keyed by (lowercased email, main topic), so
+        # duplicate checks do not download users.json. Rebuilt when the remote ETag changes.
+        self._index: Optional[Dict[Tuple[str, str], Dict[str, Any]]] = None
+        self._index_etag: Optional[str] = None
+        self._index_checked_at = 0.0
+        # Bumped on every local write; a refresh fetched before a write must not overwrite it
+        self._index_version = 0
     
     def _get_default_data(self) -> List[Dict[str, Any]]:
         return []
     
-    def find_all(self) -> List[Dict[str, Any]]:
+    def _record_key(self, user: Dict[str, Any]) -> Tuple[str, str]:
+        return self._index_key(user["email"], user["main_topic"])
+    
+    def _create_engine(self) -> Optional[StorageEngine]:
+        """SQLite or sharded engine when configured; None keeps the default JSON file engine"""
+        if self.local_primary:
+            from .sqlite_engine import SQLiteEngine
+            db_path = os.path.join(os.path.dirname(__file__), "..", settings.USERS_SQLITE_PATH)
+            return SQLiteEngine(db_path, "users", ("email_key", "main_topic"), self._record_key)
+        if self.sharded:
+            return ShardedJsonEngine(os.path.join(os.path.dirname(__file__), "..", settings.USERS_SHARD_DIR))
+        return None
+    
+    def find_all(self) -> List[UserRecord]:
         """Get all users"""
+        return [UserRecord.from_dict(user) for user in self._find_all_raw()]
+    
+    def _find_all_raw(self) -> List[Dict[str, Any]]:
+        """All users in their stored (compact) shape"""
+        if self.local_primary:
+            self._ensure_bootstrapped()
+            return self.engine.load_all()
+        
+        if self.sharded:
+            return list(self._iter_all_raw())
+        
+        with self._write_lock:
+            if self._pending_batches > 0 and self._staged_users is not None:
+                return json.loads(json.dumps(self._staged_users))
+        
         # Try to read from GitHub first, fall back to local file
         try:
             if self.github_sync.is_configured():
-                content = self.github_sync.get_file_content("users.json")
-                if content:
-                    return json.loads(content)
+                version = self._index_version
+                file = self.github_sync.get_file("users.json")
+                if file is not None:
+                    # Older files hold the expanded shape; normalize to the compact one
+                    users = [self._encode(user) for user in json.loads(file.text)]
+                    self._refresh_index(users, file.etag, version)
+                    return users
         except Exception as e:
             print(f"[User Repository] Error reading from GitHub: {e}")
         
@@ -38,63 +132,324 @@ class UserRepository(BaseRepository):
         
         raise Exception("Failed to load users from GitHub repository")
     
-    def find_by_email_and_topic(self, email: str, topic: str) -> Optional[Dict[str, Any]]:
-        """Find user by email and topic"""
-        users = self.find_all()
-        for user in users:
-            if user["email"].lower() == email.lower() and user["main_topic"] == topic:
-                return user
-        return None
+    def iter_all(self) -> Iterator[UserRecord]:
+        """
+        Yield users one at a time; with the sharded layout each shard is fetched as it is reached.
+        
+        Memory stays flat in the user count only with the sharded layout (or the SQLite
+        engine). With the monolithic users.json, the file is still downloaded as one
+        string and kept in the Contents API cache; only the decoding into user dicts
+        is streamed.
+        """
+        for user in self._iter_all_raw():
+            yield UserRecord.from_dict(user)
     
-    def save(self, user: Dict[str, Any]) -> Dict[str, Any]:
+    def _iter_all_raw(self) -> Iterator[Dict[str, Any]]:
+        if self.local_primary:
+            self._ensure_bootstrapped()
+            yield from self.engine.iter_all()
+            return
+        
+        if self.sharded:
+            self._ensure_shards()
+            yield from self._shard_store().iter_all()
+            return
+        
+        with self._write_lock:
+            staged = self._staged_users if self._pending_batches > 0 else None
+        if staged is not None or not self.github_sync.is_configured():
+            yield from self._find_all_raw()
+            return
+        
+        file = self.github_sync.get_file("users.json")
+        if file is None:
+            # Same failure handling (and alert) as a full load
+            yield from self._find_all_raw()
+            return
+        # Decode one user at a time instead of building the whole list
+        # (file.text itself is the whole users.json, see iter_all)
+        for user in _iter_json_array(file.text):
+            yield self._encode(user)
+    
+    def find_by_email_and_topic(self, email: str, topic: str) -> Optional[UserRecord]:
+        """Find user by email and topic, answered from the in-memory index"""
+        user = self._find_raw(email, topic)
+        return UserRecord.from_dict(user) if user is not None else None
+    
+    def _find_raw(self, email: str, topic: str) -> Optional[Dict[str, Any]]:
+        if self.local_primary:
+            self._ensure_bootstrapped()
+            return self.engine.get(self._index_key(email, topic))
+        
+        if self.sharded:
+            # The index answers whether the user exists; only a hit fetches their shard
+            self._ensure_shards()
+            return self._shard_store().get(email, topic)
+        
+        self._ensure_index()
+        with self._write_lock:
+            assert self._index is not None
+            return self._index.get(self._index_key(email, topic))
+    
+    def save(self, user: UserLike) -> UserLike:
         """Save a new user"""
-        users = self.find_all()
-        users.append(user)
-        self._save_data(users)
+        returned, user = user, self._encode(user)
+        if self.local_primary:
+            self._ensure_bootstrapped()
+            self.engine.upsert(self._record_key(user), user)
+            self._replica().mark_dirty()
+            return returned
+        
+        if self.sharded:
+            self._ensure_shards()
+            with self._write_lock:
+                # GitHub holds the primary copy; the local shard follows only once it is written
+                if not self._shard_store().write(user, self._commit_message(f"add {user['email']} / {user['main_topic']}")):
+                    raise Exception(f"Failed to save user {user['email']} to GitHub repository")
+                self.engine.upsert(self._record_key(user), user)
+            return returned
         
-        # Sync to GitHub
-        self._sync_to_github(users)
+        with self._write_lock:
+            users = self._find_all_raw()
+            users.append(user)
+            self._save_data(users)
+            self._index_put(user)
+            
+            # Sync to GitHub
+            self._sync_to_github(users)
         
-        return user
+        return returned
     
-    def update(self, email: str, topic: str, updated_user: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def update(self, email: str, topic: str, updated_user: UserLike) -> Optional[UserLike]:
         """Update existing user"""
-        users = self.find_all()
-        for i, user in enumerate(users):
-            if user["email"] == email and user["main_topic"] == topic:
-                users[i] = updated_user
-                self._save_data(users)
-                
-                # Sync to GitHub
-                self._sync_to_github(users)
-                
-                return updated_user
+        returned, updated_user = updated_user, self._encode(updated_user)
+        if self.local_primary:
+            self._ensure_bootstrapped()
+            key = self._index_key(email, topic)
+            with self.engine.transaction():
+                if self.engine.get(key) is None:
+                    return None
+                new_key = self._record_key(updated_user)
+                if new_key != key:
+                    self.engine.delete(key)
+                self.engine.upsert(new_key, updated_user)
+            self._replica().mark_dirty()
+            return returned
+        
+        if self.sharded:
+            self._ensure_shards()
+            with self._write_lock:
+                if not self._shard_store().contains(email, topic):
+                    return None
+                message = self._commit_message(f"update {email} / {topic}")
+                if not self._shard_store().write(updated_user, message):
+                    raise Exception(f"Failed to update user {email} in GitHub repository")
+                self.engine.upsert(self._record_key(updated_user), updated_user)
+                if self._record_key(updated_user) != self._index_key(email, topic):
+                    # Renamed: the old record goes only after the new one is written
+                    if not self._shard_store().delete(email, topic, message):
+                        raise Exception(f"Updated user {email} but could not remove their old record from GitHub")
+                    self.engine.delete(self._index_key(email, topic))
+            return returned
+        
+        with self._write_lock:
+            users = self._find_all_raw()
+            for i, user in enumerate(users):
+                if user["email"] == email and user["main_topic"] == topic:
+                    users[i] = updated_user
+                    self._save_data(users)
+                    self._index_remove(user)
+                    self._index_put(updated_user)
+                    
+                    # Sync to GitHub
+                    self._sync_to_github(users)
+                    
+                    return returned
         return None
     
-    def save_all(self, users: List[Dict[str, Any]]) -> None:
+    def save_all(self, users: List[UserLike]) -> None:
         """Save all users"""
-        self._save_data(users)
+        records = [self._encode(user) for user in users]
+        if self.local_primary:
+            self._ensure_bootstrapped()
+            self.engine.replace_all(records)
+            self._replica().mark_dirty()
+            return
+        
+        if self.sharded:
+            self._ensure_shards()
+            with self._write_lock:
+                self.engine.replace_all(records)
+                self._shard_store().write_all(records, self._commit_message(f"sync {len(records)} user(s)"))
+            return
         
-        # Sync to GitHub
-        self._sync_to_github(users)
+        with self._write_lock:
+            self._save_data(records)
+            self._index_replace(records)
+            
+            # Sync to GitHub
+            self._sync_to_github(records)
     
     def delete(self, email: str, topic: str) -> bool:
         """Delete user by email and topic"""
-        users = self.find_all()
-        for i, user in enumerate(users):
-            if user["email"] == email and user["main_topic"] == topic:
-                del users[i]
-                self._save_data(users)
-                
-                # Sync to GitHub
-                self._sync_to_github(users)
-                
+        if self.local_primary:
+            self._ensure_bootstrapped()
+            deleted = self.engine.delete(self._index_key(email, topic))
+            if deleted:
+                self._replica().mark_dirty()
+            return deleted
+        
+        if self.sharded:
+            self._ensure_shards()
+            with self._write_lock:
+                if not self._shard_store().delete(email, topic, self._commit_message(f"delete {email} / {topic}")):
+                    return False
+                self.engine.delete(self._index_key(email, topic))
                 return True
+        
+        with self._write_lock:
+            users = self._find_all_raw()
+            for i, user in enumerate(users):
+                if user["email"] == email and user["main_topic"] == topic:
+                    del users[i]
+                    self._save_data(users)
+                    self._index_remove(user)
+                    
+                    # Sync to GitHub
+                    self._sync_to_github(users)
+                    
+                    return True
         return False
     
+    def flush_replication(self, timeout: Optional[float] = None) -> bool:
+        """Wait for pending local writes to reach GitHub (no-op unless the SQLite engine is in use)"""
+        if self.replicator is None:
+            return True
+        return self.replicator.flush(timeout)
+    
+    def _ensure_bootstrapped(self) -> None:
+        """Seed an empty local database from users.json on GitHub before first use"""
+        if self._bootstrapped:
+            return
+        with self._write_lock:
+            if self._bootstrapped:
+                return
+            if self.engine.count() == 0 and self.github_sync.is_configured():
+                users = self._load_remote_users()
+                if users is None:
+                    # Replicating an empty database would wipe users.json, so refuse to start
+                    raise Exception("Failed to bootstrap local user store from GitHub repository")
+                self.engine.replace_all([self._encode(user) for user in users])
+                print(f"[User Repository] Bootstrapped local user store with {len(users)} user(s) from GitHub")
+            self._bootstrapped = True
+    
+    def _load_remote_users(self) -> Optional[List[Dict[str, Any]]]:
+        """Users as stored on GitHub, in whichever layout is configured"""
+        if self.sharded:
+            self._ensure_shards()
+            return list(self._shard_store().iter_all())
+        content = self.github_sync.get_file_content("users.json")
+        return json.loads(content) if content is not None else None
+    
+    def _replicate_to_github(self, users: List[Dict[str, Any]]) -> bool:
+        if not self.github_sync.is_configured():
+            return True
+        if self.sharded:
+            return self._shard_store().write_all(users, self._commit_message(f"sync {len(users)} user(s)"))
+        return self.github_sync.sync_users_json(users)
+    
+    def _ensure_shards(self) -> None:
+        """Create the sharded layout on GitHub the first time it is used, migrating users.json into it"""
+        if self._shards_ready:
+            return
+        with self._write_lock:
+            if self._shards_ready:
+                return
+            if self._shard_store().load_index() is None:
+                content = self.github_sync.get_file_content("users.json")
+                if content is not None:
+                    users = [self._encode(user) for user in json.loads(content)]
+                    self._shard_store().write_all(users, self._commit_message(f"migrate {len(users)} user(s) from users.json"))
+                    print(f"[User Repository] Migrated {len(users)} user(s) to the sharded layout")
+                else:
+                    self._shard_store().initialize()
+            self._shards_ready = True
+    
+    def _shard_store(self) -> UserShardStore:
+        """The remote shard store, on USERS_REMOTE_LAYOUT=sharded code paths"""
+        assert self.shards is not None, "the sharded layout is not configured"
+        return self.shards
+    
+    def _replica(self) -> GitHubReplicator:
+        """The GitHub replicator, on USERS_STORAGE_ENGINE=sqlite code paths"""
+        assert self.replicator is not None, "the SQLite engine is not configured"
+        return self.replicator
+    
+    def _encode(self, user: UserLike) -> Dict[str, Any]:
+        """Compact stored shape of a user record or legacy user dict"""
+        return UserRecord.coerce(user).to_storage()
+    
+    def _commit_message(self, action: str) -> str:
+        return f"Users: {action}"
+    
+    def _index_key(self, email: str, topic: str) -> Tuple[str, str]:
+        return (email.lower(), topic)
+    
+    def _ensure_index(self) -> None:
+        """Load the index on first use and revalidate it once USERS_INDEX_TTL_SECONDS have passed"""
+        if self._index is not None and time.monotonic() - self._index_checked_at < settings.USERS_INDEX_TTL_SECONDS:
+            return
+        try:
+            users = self._find_all_raw()
+        except Exception:
+            if self._index is None:
+                raise
+            print("[User Repository] Could not revalidate users index, serving cached copy")
+            return
+        with self._write_lock:
+            if self._index is None:
+                # Served from staged batch state rather than GitHub
+                self._build_index(copy.deepcopy(users))
+            self._index_checked_at = time.monotonic()
+    
+    def _refresh_index(self, users: List[Dict[str, Any]], etag: Optional[str], version: int) -> None:
+        """Rebuild the index from a users.json read, unless it is unchanged or predates a local write"""
+        with self._write_lock:
+            self._index_checked_at = time.monotonic()
+            if version != self._index_version:
+                return
+            if self._index is not None and etag and etag == self._index_etag:
+                return
+            self._build_index(copy.deepcopy(users))
+            self._index_etag = etag
+    
+    def _build_index(self, users: List[Dict[str, Any]]) -> None:
+        self._index = {self._index_key(user["email"], user["main_topic"]): user for user in users}
+    
+    def _index_put(self, user: Dict[str, Any]) -> None:
+        """Write-through for a saved or updated user (caller holds _write_lock)"""
+        self._index_version += 1
+        if self._index is not None:
+            self._index[self._index_key(user["email"], user["main_topic"])] = copy.deepcopy(user)
+    
+    def _index_remove(self, user: Dict[str, Any]) -> None:
+        self._index_version += 1
+        if self._index is not None:
+            self._index.pop(self._index_key(user["email"], user["main_topic"]), None)
+    
+    def _index_replace(self, users: List[Dict[str, Any]]) -> None:
+        self._index_version += 1
+        self._build_index(copy.deepcopy(users))
+    
     def _sync_to_github(self, users: List[Dict[str, Any]]) -> None:
         """Sync users data to GitHub repository"""
         try:
+            batch = get_active_batch()
+            if (batch is not None and self.github_sync.is_configured()
+                    and batch.targets(self.github_sync.repo_owner, self.github_sync.repo_name, self.github_sync.branch)):
+                self._stage_in_batch(batch, users)
+                return
+            
             if self.github_sync.is_configured():
                 success = self.github_sync.sync_users_json(users)
                 if success:
@@ -105,4 +460,34 @@ class UserRepository(BaseRepository):
                 print("[User Repository] GitHub sync not configured, skipping sync")
         except Exception as e:
             print(f"[User Repository] Error syncing to GitHub: {e}")
-            # Don't fail the main operation if sync fails 
\ No newline at end of file
+            # Don't fail the main operation if sync fails
+    
+    def _stage_in_batch(self, batch, users: List[Dict[str, Any]]) -> None:
+        """Stage users.json in the active commit batch (caller holds _write_lock)"""
+        self._staged_users = users
+        self._pending_batches += 1
+        self.github_sync.stage_users_json(batch, self._latest_staged_users)
+        batch.add_commit_callback(self._on_batch_committed)
+        batch.add_failure_callback(self._on_batch_failed)
+        print("[User Repository] Staged users.json in commit batch")
+    
+    def _latest_staged_users(self) -> List[Dict[str, Any]]:
+        with self._write_lock:
+            return self._staged_users or []
+    
+    def _on_batch_committed(self) -> None:
+        with self._write_lock:
+            self._release_batch()
+    
+    def _on_batch_failed(self) -> None:
+        """The staged users.json never landed: stop serving it and rebuild the index from GitHub"""
+        with self._write_lock:
+            self._release_batch()
+            self._index_etag = None
+            self._index_checked_at = 0.0
+    
+    def _release_batch(self) -> None:
+        """One staged batch is done (caller holds _write_lock); drop the staged copy once none are left"""
+        self._pending_batches = max(0, self._pending_batches - 1)
+        if self._pending_batches == 0:
+            self._staged_users = None
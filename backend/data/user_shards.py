@@ -0,0 +1,408 @@
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from config import settings
+from .base_repository import RecordKey, StorageEngine
+from .sha_index import git_blob_sha
+
+SHARD_ROOT = "users"
+INDEX_FILE = "index.json"
+INDEX_PATH = f"{SHARD_ROOT}/{INDEX_FILE}"
+
+UserKey = Tuple[str, str]
+
+def _slug(value: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', value.lower()).strip('_')[:40] or "x"
+
+def _digest(value: str) -> str:
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()[:8]
+
+def user_key(email: str, topic: str) -> UserKey:
+    return (email.lower(), topic)
+
+def shard_name(email: str, topic: str) -> str:
+    """
+    Relative path of the record for (email, topic): <user>_<hash>/<topic>_<hash>.json.
+    The hashes keep emails or topics that slugify the same apart.
+    """
+    email_key = email.lower()
+    return f"{_slug(email_key.split('@')[0])}_{_digest(email_key)}/{_slug(topic)}_{_digest(topic)}.json"
+
+def _serialize(data: Any) -> str:
+    return json.dumps(data, indent=2, ensure_ascii=False)
+
+def _index_document(entries: "OrderedDict[UserKey, Dict[str, str]]") -> Dict[str, Any]:
+    return {"version": 1, "users": list(entries.values())}
+
+def _index_entry(user: Dict[str, Any], path: str) -> Dict[str, str]:
+    return {"email": user["email"], "main_topic": user["main_topic"], "path": path}
+
+class ShardedJsonEngine(StorageEngine):
+    """Local storage engine with one JSON file per record plus an index.json listing them"""
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self._lock = threading.RLock()
+
+    def _index_file(self) -> str:
+        return os.path.join(self.root_dir, INDEX_FILE)
+
+    def _load_index(self) -> "OrderedDict[UserKey, Dict[str, str]]":
+        if not os.path.exists(self._index_file()):
+            return OrderedDict()
+        with open(self._index_file(), 'r') as f:
+            document = json.load(f)
+        return OrderedDict((user_key(entry["email"], entry["main_topic"]), entry) for entry in document["users"])
+
+    def _write(self, relative_path: str, data: Any) -> None:
+        path = os.path.join(self.root_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(_serialize(data))
+
+    def _remove(self, relative_path: str) -> None:
+        path = os.path.join(self.root_dir, relative_path)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        return list(self.iter_all())
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._load_index())
+
+    def iter_all(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            entries = list(self._load_index().values())
+        for entry in entries:
+            path = os.path.join(self.root_dir, entry["path"])
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    yield json.load(f)
+
+    def get(self, key: RecordKey) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._load_index().get(key)
+            if entry is None:
+                return None
+            with open(os.path.join(self.root_dir, entry["path"]), 'r') as f:
+                return json.load(f)
+
+    def upsert(self, key: RecordKey, record: Dict[str, Any]) -> None:
+        with self._lock:
+            index = self._load_index()
+            path = shard_name(record["email"], record["main_topic"])
+            self._write(path, record)
+            if key not in index:
+                index[key] = _index_entry(record, path)
+                self._write(INDEX_FILE, _index_document(index))
+
+    def delete(self, key: RecordKey) -> bool:
+        with self._lock:
+            index = self._load_index()
+            entry = index.pop(key, None)
+            if entry is None:
+                return False
+            self._remove(entry["path"])
+            self._write(INDEX_FILE, _index_document(index))
+            return True
+
+    def replace_all(self, records: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            old_index = self._load_index()
+            index: "OrderedDict[UserKey, Dict[str, str]]" = OrderedDict()
+            for record in records:
+                path = shard_name(record["email"], record["main_topic"])
+                self._write(path, record)
+                index[user_key(record["email"], record["main_topic"])] = _index_entry(record, path)
+            for key, entry in old_index.items():
+                if key not in index:
+                    self._remove(entry["path"])
+            self._write(INDEX_FILE, _index_document(index))
+
+class UserShardStore:
+    """
+    Remote user records on GitHub: one file per (user, topic) under users/ plus
+    users/index.json listing them. Updating a user rewrites only that user's
+    shard with one Contents API PUT; the index changes only when users are
+    added or removed. Listings read the blob SHAs of every shard with one tree
+    request and fetch only the shards that changed since they were last seen.
+    """
+
+    def __init__(self, github_sync):
+        self.github_sync = github_sync
+        self._lock = threading.RLock()
+        self._index: Optional["OrderedDict[UserKey, Dict[str, str]]"] = None
+        self._index_etag: Optional[str] = None
+        self._index_checked_at = 0.0
+        # Writes staged in commit batches that have not landed yet (None = deleted).
+        # Reads see them on top of what GitHub returns.
+        self._pending: Dict[UserKey, Optional[Dict[str, Any]]] = {}
+        # Shard path -> (blob SHA, record) of shards read or written, least recently used evicted first
+        self._records: "OrderedDict[str, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+        self.stats: Dict[str, int] = {"shard_fetches": 0, "shard_cache_hits": 0}
+
+    def load_index(self, force: bool = False) -> Optional["OrderedDict[UserKey, Dict[str, str]]"]:
+        """
+        The shard index, revalidated at most every USERS_INDEX_TTL_SECONDS.
+        Returns None if the repository has no sharded layout yet.
+        """
+        with self._lock:
+            fresh = time.monotonic() - self._index_checked_at < settings.USERS_INDEX_TTL_SECONDS
+            if self._index is not None and fresh and not force:
+                return self._index
+
+        status, file = self.github_sync.fetch_file(INDEX_PATH)
+        with self._lock:
+            if file is None:
+                if status == 404 and self._index is None:
+                    return None
+                if self._index is None:
+                    raise Exception(f"Failed to load {INDEX_PATH} from GitHub: {status}")
+                # Serve the last known index rather than failing the read
+                print(f"[User Shards] Could not revalidate {INDEX_PATH} ({status}), using cached index")
+                return self._index
+            self._index_checked_at = time.monotonic()
+            if self._index is None or file.etag != self._index_etag:
+                document = json.loads(file.text)
+                remote = OrderedDict(
+                    (user_key(entry["email"], entry["main_topic"]), entry) for entry in document["users"]
+                )
+                # Keep index entries for staged users until their batch commits
+                for key, user in self._pending.items():
+                    if user is None:
+                        remote.pop(key, None)
+                    elif key not in remote:
+                        remote[key] = _index_entry(user, f"{SHARD_ROOT}/{shard_name(user['email'], user['main_topic'])}")
+                self._index = remote
+                self._index_etag = file.etag
+            return self._index
+
+    def initialize(self) -> None:
+        """Start an empty sharded layout"""
+        with self._lock:
+            self._index = OrderedDict()
+            self._index_checked_at = time.monotonic()
+        self._commit_index("Initialize sharded user store")
+
+    def contains(self, email: str, topic: str) -> bool:
+        index = self.load_index()
+        return index is not None and user_key(email, topic) in index
+
+    def get(self, email: str, topic: str) -> Optional[Dict[str, Any]]:
+        """Record for (email, topic); only fetches a shard if the index lists it"""
+        key = user_key(email, topic)
+        with self._lock:
+            if key in self._pending:
+                return self._copy(self._pending[key])
+        index = self.load_index()
+        entry = index.get(key) if index is not None else None
+        if entry is None:
+            return None
+        return self._fetch(entry["path"])
+
+    def iter_all(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every record in index order. Shards whose blob SHA matches a record
+        already seen are served from memory; the rest are fetched concurrently
+        ahead of the consumer.
+        """
+        with self._lock:
+            entries = list((self.load_index() or OrderedDict()).items())
+            pending = dict(self._pending)
+        # One request for the SHAs of every shard; without it each shard is fetched
+        shas = self.github_sync.list_tree(SHARD_ROOT) or {}
+
+        workers = max(1, settings.GITHUB_POOL_SIZE)
+        window = workers * 2
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="user-shards") as executor:
+            # Keep a bounded number of shard fetches ahead of the consumer
+            queued: "deque" = deque()
+            entries_iter = iter(entries)
+            while True:
+                while len(queued) < window:
+                    item = next(entries_iter, None)
+                    if item is None:
+                        break
+                    key, entry = item
+                    cached = self._cached(entry["path"], shas.get(entry["path"]))
+                    if key in pending:
+                        queued.append((pending[key], None))
+                    elif cached is not None:
+                        queued.append((cached, None))
+                    else:
+                        queued.append((None, executor.submit(self._fetch, entry["path"])))
+                if not queued:
+                    return
+                staged, future = queued.popleft()
+                user = future.result() if future is not None else self._copy(staged)
+                if user is not None:
+                    yield user
+
+    def write(self, user: Dict[str, Any], message: str) -> bool:
+        """
+        Write one user's shard, then the index if the user is new (staged in the
+        active commit batch if there is one). A new user's index entry is rolled
+        back if either write fails, so the user does not count as existing.
+        """
+        key = user_key(user["email"], user["main_topic"])
+        path = f"{SHARD_ROOT}/{shard_name(user['email'], user['main_topic'])}"
+        with self._lock:
+            index = self.load_index()
+            if index is None:
+                raise Exception("Sharded user store is not initialized")
+            is_new = key not in index
+            if is_new:
+                # Rendered into index.json when it is written
+                index[key] = _index_entry(user, path)
+            self._track_pending(key, user)
+
+        # The shard lands before the index lists it, so a failure in between leaves
+        # only an unlisted file behind
+        text = _serialize(user)
+        success = self.github_sync.commit_file(path, text, message)
+        if success and is_new:
+            success = self._commit_index(message)
+        if success:
+            self._remember(path, git_blob_sha(text), user)
+        elif is_new:
+            with self._lock:
+                if self._index is not None:
+                    self._index.pop(key, None)
+        return success
+
+    def delete(self, email: str, topic: str, message: str) -> bool:
+        """
+        Remove a user's index entry, then their shard. Returns False if the user
+        is not listed or the index write failed, in which case the entry is restored.
+        """
+        key = user_key(email, topic)
+        with self._lock:
+            index = self.load_index()
+            if index is None or key not in index:
+                return False
+            position = list(index).index(key)
+            entry = index.pop(key)
+            self._track_pending(key, None)
+
+        if not self._commit_index(message):
+            with self._lock:
+                if self._index is not None and key not in self._index:
+                    items = list(self._index.items())
+                    items.insert(position, (key, entry))
+                    self._index = OrderedDict(items)
+            return False
+        # Once the index no longer lists it, a shard left behind is never read
+        if not self.github_sync.delete_file(entry["path"], message):
+            print(f"[User Shards] {entry['path']} is no longer listed but could not be deleted")
+        with self._lock:
+            self._records.pop(entry["path"], None)
+        return True
+
+    def write_all(self, users: List[Dict[str, Any]], message: str) -> bool:
+        """
+        Make the remote store match users: changed shards are rewritten, removed
+        users deleted, and the index written once, all in one commit when batching
+        """
+        new_index: "OrderedDict[UserKey, Dict[str, str]]" = OrderedDict()
+        for user in users:
+            path = f"{SHARD_ROOT}/{shard_name(user['email'], user['main_topic'])}"
+            new_index[user_key(user["email"], user["main_topic"])] = _index_entry(user, path)
+
+        success = True
+        with self.github_sync.batch(message):
+            with self._lock:
+                old_index = self._index or OrderedDict()
+                self._index = new_index
+                for user in users:
+                    self._track_pending(user_key(user["email"], user["main_topic"]), user)
+                for key in old_index:
+                    if key not in new_index:
+                        self._track_pending(key, None)
+
+            for user in users:
+                path = new_index[user_key(user["email"], user["main_topic"])]["path"]
+                text = _serialize(user)
+                # Unchanged shards are recognised by blob SHA and not rewritten
+                if self.github_sync.commit_file(path, text, message):
+                    self._remember(path, git_blob_sha(text), user)
+                else:
+                    success = False
+            for key, entry in old_index.items():
+                if key not in new_index:
+                    success = self.github_sync.delete_file(entry["path"], message) and success
+            success = self._commit_index(message) and success
+        return success
+
+    def _commit_index(self, message: str) -> bool:
+        """Write users/index.json, rendered from the in-memory index when the commit is made"""
+        batch = self.github_sync.active_batch()
+        if batch is not None:
+            batch.stage(INDEX_PATH, self._render_index)
+            return True
+        return self.github_sync.commit_file(INDEX_PATH, self._render_index(), message)
+
+    def _render_index(self) -> str:
+        with self._lock:
+            return _serialize(_index_document(self._index or OrderedDict()))
+
+    def _track_pending(self, key: UserKey, user: Optional[Dict[str, Any]]) -> None:
+        """Overlay a write staged in a batch until the batch commits (caller holds _lock)"""
+        batch = self.github_sync.active_batch()
+        if batch is None:
+            return
+        staged = self._copy(user)
+        self._pending[key] = staged
+        batch.add_commit_callback(lambda: self._on_batch_committed(key, staged))
+        batch.add_failure_callback(lambda: self._on_batch_failed(key, staged))
+
+    def _on_batch_committed(self, key: UserKey, user: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            # A newer staged write to the same key stays until its own batch commits
+            if key in self._pending and self._pending[key] is user:
+                del self._pending[key]
+
+    def _on_batch_failed(self, key: UserKey, user: Optional[Dict[str, Any]]) -> None:
+        """The staged write never landed: drop its overlay and reload the index from GitHub on next use"""
+        self._on_batch_committed(key, user)
+        with self._lock:
+            self._index_etag = None
+            self._index_checked_at = 0.0
+
+    def _fetch(self, path: str) -> Optional[Dict[str, Any]]:
+        file = self.github_sync.get_file(path)
+        if file is None:
+            return None
+        record = json.loads(file.text)
+        with self._lock:
+            self.stats["shard_fetches"] += 1
+        self._remember(path, file.sha or git_blob_sha(file.text), record)
+        return record
+
+    def _remember(self, path: str, sha: str, record: Dict[str, Any]) -> None:
+        """Keep a shard's record under the blob SHA it was read or written with"""
+        with self._lock:
+            self._records[path] = (sha, self._copy(record) or {})
+            self._records.move_to_end(path)
+            while len(self._records) > settings.USERS_SHARD_CACHE_SIZE:
+                self._records.popitem(last=False)
+
+    def _cached(self, path: str, sha: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Record last seen for path, if it is still the blob GitHub has (sha from a tree listing)"""
+        with self._lock:
+            cached = self._records.get(path)
+            if sha is None or cached is None or cached[0] != sha:
+                return None
+            self._records.move_to_end(path)
+            self.stats["shard_cache_hits"] += 1
+            return cached[1]
+
+    def _copy(self, user: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        return json.loads(json.dumps(user)) if user is not None else None
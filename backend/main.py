@@ -2,13 +2,19 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import Depends, FastAPI, Header, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
 import os
+import secrets
 from config import settings
-from services import user_service, report_service, email_service
+from services import user_service, report_service, email_service, scheduler_service
 from services.payment_service import PayPalService
+from data import plan_cache_repository
+from services.prompt_builder import prompt_cache_stats
+from services.report_cache import report_cache
+from services.token_budget import token_usage_stats
+from services.report_index import report_index_store
 
 
 
@@ -121,7 +127,7 @@ async def verify_payment(payment_data: PaymentVerification):
         print(f"[Payment] Payment verified successfully for: email={email}, topic={topic}")
         
         # Generate learning plan using existing service with paid=True
-        result = report_service.generate_initial_learning_plan(email, topic, paid=True)
+        result = await report_service.generate_initial_learning_plan_async(email, topic, paid=True)
         
         # Add payment information to result
         result['payment_id'] = payment_data.payment_id
@@ -156,7 +162,7 @@ async def register_user_without_payment(user_data: UserSubmission):
             }
         
         # Generate learning plan directly with paid=False
-        result = report_service.generate_initial_learning_plan(user_data.email, sanitized_topic, paid=False)
+        result = await report_service.generate_initial_learning_plan_async(user_data.email, sanitized_topic, paid=False)
         
         # Add payment bypass indicator
         if result.get('success'):
@@ -203,68 +209,79 @@ from typing import Optional
 async def run_scheduler(
     request: Request, 
     email: Optional[str] = None, 
-    topic: Optional[str] = None
+    topic: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    commit_mode: Optional[str] = None,
+    mode: Optional[str] = None
 ):
+    """Enqueue a scheduler run in the background and return its id immediately"""
     try:
-        # Use service layer for scheduler operations
-        all_users = user_service.load_users()
+        if commit_mode and commit_mode not in ("per_user", "run"):
+            raise HTTPException(status_code=400, detail="commit_mode must be 'per_user' or 'run'")
+        if mode and mode not in ("realtime", "batch"):
+            raise HTTPException(status_code=400, detail="mode must be 'realtime' or 'batch'")
         
-        # Filter users if email/topic provided
-        if email and topic:
-            users = [user for user in all_users 
-                    if user.get("email") == email and user.get("main_topic") == topic]
-            if not users:
-                return {"status": "error", "message": f"No user found with email={email} and topic={topic}"}
-        else:
-            users = all_users
-        
-        updated_users = []
-        success_count = 0
-        errors = []
+        # A full run triggered during a single-user run is queued behind it, never dropped
+        run, created = scheduler_service.start_run(email, topic, max_workers, commit_mode, mode)
         
-        # Process each user using service
-        for user in users:
-            try:
-                updated_user = report_service.generate_next_report(user)
-                if updated_user:
-                    updated_users.append(updated_user)
-                    success_count += 1
-            except Exception as e:
-                error_msg = f"User {user.get('email', 'Unknown')}: {str(e)}"
-                errors.append(error_msg)
-                print(f"[Scheduler] Error processing user: {error_msg}")
-    
-        # Send daily report notification (only if processing all users)
-        if not (email and topic):
-            try:
-                from services.notification_service import NotificationService
-                notification_service = NotificationService()
-                notification_service.send_daily_report(len(all_users), success_count, errors)
-            except Exception as notification_error:
-                print(f"[Scheduler] Failed to send daily report: {notification_error}")
-        
-        return {
-            "status": "ok", 
-            "message": f"Scheduler run complete. Processed {len(users)} user(s).", 
-            "users_processed": len(users),
-            "success_count": success_count,
-            "errors": errors
-        }
+        return JSONResponse(status_code=202, content={
+            "status": "accepted" if created else "attached",
+            "message": "Scheduler run started." if created else "Attached to the scheduler run already in progress.",
+            "run_id": run.run_id,
+            "status_url": f"/scheduler-runs/{run.run_id}"
+        })
+    except HTTPException:
+        raise
     except Exception as e:
-        # Send error alert notification (only if processing all users)
-        if not (email and topic):
-            try:
-                from services.notification_service import NotificationService
-                notification_service = NotificationService()
-                notification_service.send_error_alert("Scheduler Failure", str(e))
-            except Exception as notification_error:
-                print(f"[Scheduler] Failed to send error alert: {notification_error}")
-        
-        print(f"Error in scheduler: {e}")
+        print(f"Error starting scheduler: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/scheduler-runs/{run_id}")
+async def get_scheduler_run(run_id: str):
+    """Report progress, timings and errors of a scheduler run"""
+    run = scheduler_service.get_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail=f"Scheduler run {run_id} not found")
+    return run.to_dict()
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Admin endpoints are disabled unless ADMIN_API_TOKEN is set, and require it in X-Admin-Token"""
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.get("/admin/plan-cache", dependencies=[Depends(require_admin)])
+async def get_plan_cache():
+    """Hit-rate metrics and cached entries of the learning-plan cache"""
+    return {"stats": plan_cache_repository.get_stats(), "entries": plan_cache_repository.list_entries()}
+
+@app.delete("/admin/plan-cache", dependencies=[Depends(require_admin)])
+async def invalidate_plan_cache(topic: Optional[str] = None):
+    """Invalidate the cached plan for one topic, or every cached plan when no topic is given"""
+    if topic is None:
+        return {"invalidated": plan_cache_repository.clear()}
+    if not plan_cache_repository.invalidate(topic):
+        raise HTTPException(status_code=404, detail=f"No cached plan for topic {topic}")
+    return {"invalidated": 1}
+
+@app.get("/admin/prompt-cache", dependencies=[Depends(require_admin)])
+async def get_prompt_cache_stats():
+    """Cached prompt tokens reported by OpenAI per request kind, plus the cross-user report cache"""
+    return {"prompt_cache": prompt_cache_stats.get_stats(), "report_cache": report_cache.get_stats()}
+
+@app.get("/admin/token-budget", dependencies=[Depends(require_admin)])
+async def get_token_budget_stats():
+    """Locally predicted prompt tokens against the usage OpenAI reported, per request kind"""
+    return token_usage_stats.get_stats()
+
+@app.get("/admin/report-index", dependencies=[Depends(require_admin)])
+async def get_report_index_stats():
+    """Retrieval indexes held in memory (CONTEXT_MODE "retrieval")"""
+    return report_index_store.get_stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -1,10 +1,11 @@
 import os
-import requests
 import warnings
 from urllib.parse import quote
 from config import settings
+from data.sha_index import get_sha_index
+from data.github_client import github_client
 
-GITHUB_API_URL = "https://api.github.com"
+GITHUB_API_URL = settings.GITHUB_API_URL
 REPO_OWNER = settings.GITHUB_REPO_OWNER
 REPO_NAME = settings.GITHUB_REPO_NAME
 BRANCH = settings.GITHUB_BRANCH
@@ -37,12 +38,19 @@ def get_github_headers():
         "Accept": "application/vnd.github.v3+json"
     }
 
+def _sha_index():
+    return get_sha_index(REPO_OWNER, REPO_NAME, BRANCH, GITHUB_TOKEN, GITHUB_API_URL)
+
 def get_file_sha(path: str) -> str:
     """
     Returns the SHA of a file in the repo if it exists, else None.
+    Answered from the shared path -> SHA index, with a Contents GET on a miss.
     """
+    return _sha_index().get_sha(path, _fetch_file_sha)
+
+def _fetch_file_sha(path: str) -> str:
     url = f"{GITHUB_API_URL}/repos/{REPO_OWNER}/{REPO_NAME}/contents/{quote(path)}"
-    r = requests.get(url, headers=get_github_headers())
+    r = github_client.get(url)
     if r.status_code == 200:
         return r.json().get('sha')
     return None
@@ -94,9 +102,12 @@ def upload_report(email: str, topic: str, content: str, filename: str = None, co
         payload["sha"] = sha
     
     url = f"{GITHUB_API_URL}/repos/{REPO_OWNER}/{REPO_NAME}/contents/{quote(file_path)}"
-    r = requests.put(url, headers=get_github_headers(), json=payload)
+    r = github_client.put(url, json=payload)
+    if r.status_code in (409, 422):
+        _sha_index().invalidate(file_path)
     if r.status_code not in (200, 201):
         raise Exception(f"Failed to upload {content_type} file: {r.status_code} {r.text}")
+    _sha_index().set(file_path, r.json().get("content", {}).get("sha"))
     
     # Construct the public GitHub Pages URL
     public_url = f"https://{REPO_OWNER.lower()}.github.io/{REPO_NAME}/{dir_path}/{quote(file_name)}"
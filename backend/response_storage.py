@@ -9,7 +9,6 @@ import warnings
 
 import json
 import re
-import requests
 from datetime import datetime
 from typing import Optional, Dict, Any
 from config import settings
@@ -60,7 +59,8 @@ def load_ai_response(user_email: str, main_topic: str, response_type: str,
             raise ValueError(f"Invalid response_type: {response_type}")
         
         # Construct GitHub API URL
-        from report_uploads.github_report_uploader import GITHUB_API_URL, REPO_OWNER, REPO_NAME, get_github_headers
+        from report_uploads.github_report_uploader import GITHUB_API_URL, REPO_OWNER, REPO_NAME
+        from data.github_client import github_client
         from urllib.parse import quote
         
         user_dir = user_email.replace('@', '').replace('.', '')
@@ -68,7 +68,7 @@ def load_ai_response(user_email: str, main_topic: str, response_type: str,
         file_path = f"reports/{user_dir}/{topic_dir}/{filename}"
         
         url = f"{GITHUB_API_URL}/repos/{REPO_OWNER}/{REPO_NAME}/contents/{quote(file_path)}"
-        response = requests.get(url, headers=get_github_headers())
+        response = github_client.get(url)
         
         if response.status_code != 200:
             print(f"[Response Storage] Response not found on GitHub: {response.status_code}")
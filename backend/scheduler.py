@@ -3,15 +3,21 @@ import openai
 
 from config import settings
 from services import user_service, report_service
+from services.email_dispatcher import email_dispatcher
+from data import user_repository
 
 def main():
-    # Use service layer for scheduler operations
-    users = user_service.load_users()
-    updated_users = []
-    for user in users:
-        updated_user = report_service.generate_next_report(user)
-        updated_users.append(updated_user)
-    user_service.save_users(updated_users)
+    # Users are streamed one at a time; generate_next_report persists each
+    # user's progress as it goes, so a crash loses at most the user in flight
+    processed = 0
+    for user in user_service.iter_users():
+        report_service.generate_next_report(user)
+        processed += 1
+    print(f"[Scheduler] Processed {processed} user(s).")
+    # Emails are sent from the dispatcher thread; let them go out before exiting
+    email_dispatcher.drain()
+    # With the SQLite user store, push the final state to GitHub before exiting
+    user_repository.flush_replication(timeout=120)
     print("[Scheduler] All users processed.")
 
 if __name__ == "__main__":
@@ -3,6 +3,7 @@ from .user_service import UserService
 from .email_service import EmailService
 from .report_service import ReportService
 from .github_sync_service import GitHubSyncService
+from .scheduler_service import SchedulerService
 
 # Global service instances
 ai_service = AIService()
@@ -10,5 +11,6 @@ user_service = UserService()
 email_service = EmailService()
 report_service = ReportService()
 github_sync_service = GitHubSyncService()
+scheduler_service = SchedulerService(report_service)
 
-__all__ = ['ai_service', 'user_service', 'email_service', 'report_service', 'github_sync_service'] 
\ No newline at end of file
+__all__ = ['ai_service', 'user_service', 'email_service', 'report_service', 'github_sync_service', 'scheduler_service'] 
\ No newline at end of file
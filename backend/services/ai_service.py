@@ -1,148 +1,260 @@
+import httpx
+import json
 import openai
 import re
+import threading
 from typing import Optional, Dict, Any, Tuple
 from config import settings
-from config.constants import AI_PROMPTS
-
-class AIService:
-    def __init__(self):
-        self.client = openai.OpenAI(
-            api_key=settings.OPENAI_API_KEY,
-            timeout=settings.OPENAI_TIMEOUT
-        )
-    
-    def _build_report_prompt(self, topic: str) -> str:
-        """Build a complete report prompt from modular components"""
-        return f"""Write a comprehensive educational report on the topic: "{topic}".
-
-{AI_PROMPTS['CONTENT_EXPANSION']}
-
-{AI_PROMPTS['REPORT_STRUCTURE']}
-
-{AI_PROMPTS['ADVANCED_CONTENT']}
-
-{AI_PROMPTS['CONTENT_GUIDELINES']}
-
-{AI_PROMPTS['ENHANCED_CONCEPTS']}
-
-{AI_PROMPTS['ANALOGIES_METAPHORS']}
-
-{AI_PROMPTS['CONCEPT_CONNECTIONS']}
-
-{AI_PROMPTS['INTERACTIVE_ELEMENTS']}
-
-{AI_PROMPTS['QUIZ_GENERATION']}
-{AI_PROMPTS['QUIZ_CONTENT_GUIDELINES']}
-{AI_PROMPTS['QUIZ_INTEGRATION']}
-
-{AI_PROMPTS['FORMATTING_INSTRUCTIONS']}
-
-Example format:
-## Introduction:
-This is the introduction paragraph...
-
-## Key Concepts:
-### Basic Definition:
-**Term:** Definition here...
-
-- Point 1
-- Point 2
-
-## Real-World Applications:
-Examples of how this is used...
-
-## Advanced Applications and Research Frontiers:
-Cutting-edge developments and future implications...
-
-## Think About This:
-[Thought-provoking questions for key concepts]
-
-{AI_PROMPTS['TONE_STYLE']}
-
-{AI_PROMPTS['LINK_FORMATTING']}
-
-{AI_PROMPTS['MATH_FORMATTING']}"""
-    
-    def _build_context_prompt(self, topic: str, context: str, learning_plan: list) -> str:
-        """Build a context-aware report prompt"""
-        return f"""Write a comprehensive, beginner-friendly educational report on the topic: "{topic}".
-
-{AI_PROMPTS['CONTENT_EXPANSION']}
-
-IMPORTANT CONTEXT - Previous Learning Summary:
-{context}
-
-Learning Plan Structure:
-{chr(10).join([f"- {topic}" for topic in learning_plan])}
-
-{AI_PROMPTS['CONTEXT_HANDLING']}
-
-{AI_PROMPTS['LEARNING_JOURNEY_INTEGRATION']}
-
-{AI_PROMPTS['REPORT_STRUCTURE'].replace('introduction to the topic', 'introduction that connects to previous learning')}
+from services import prompt_builder, quiz_parser, token_budget
+from services.prompt_builder import prompt_cache_stats
+from services.report_cache import report_cache
+from services.token_budget import token_usage_stats
+from services.quiz_models import Quiz, quiz_response_format
+from pydantic import ValidationError
+
+_async_client: Optional[openai.AsyncOpenAI] = None
+_async_client_lock = threading.Lock()
+
+def get_async_client() -> openai.AsyncOpenAI:
+    """AsyncOpenAI client shared by every AsyncAIService, so completions reuse one connection pool"""
+    global _async_client
+    with _async_client_lock:
+        if _async_client is None:
+            limits = httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS
+            )
+            _async_client = openai.AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                timeout=settings.OPENAI_TIMEOUT,
+                http_client=httpx.AsyncClient(limits=limits, timeout=settings.OPENAI_TIMEOUT)
+            )
+        return _async_client
 
-{AI_PROMPTS['ADVANCED_CONTENT']}
+class BaseAIService:
+    """
+    Prompts, request builders and response parsers shared by AIService and
+    AsyncAIService. Holds no client; the subclasses send the requests.
+    """
 
-{AI_PROMPTS['CONTENT_GUIDELINES']}
+    def _learning_plan_request(self, topic: str) -> Dict[str, Any]:
+        prompt = f"""Create a comprehensive 30-day learning plan for {topic}. 
 
-{AI_PROMPTS['ENHANCED_CONCEPTS']}
+The plan should include:
+1. A list of 10 topics for each of the three expertise levels:
+   - Beginner (10 topics)
+   - Intermediate (10 topics) 
+   - Advanced (10 topics)
 
-{AI_PROMPTS['ANALOGIES_METAPHORS']}
+If the topic is not suitable for learning or is inappropriate, respond with "ERROR"."""
 
-{AI_PROMPTS['CONCEPT_CONNECTIONS']}
+        return dict(
+            model=settings.OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": "You are an expert educational content creator specializing in creating structured learning plans."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=settings.OPENAI_MAX_TOKENS_PLAN,
+            temperature=settings.OPENAI_TEMPERATURE
+        )
 
-{AI_PROMPTS['INTERACTIVE_ELEMENTS']}
+    def _plan_from_response(self, response) -> str:
+        plan = response.choices[0].message.content.strip()
+        print(f"OpenAI API raw response: {plan}")
+        # Only treat as error if the response is exactly 'ERROR' or starts with 'ERROR'
+        if plan.strip().upper() == "ERROR" or plan.strip().upper().startswith("ERROR"):
+            return "ERROR"
+        return plan
 
-{AI_PROMPTS['QUIZ_GENERATION']}
-{AI_PROMPTS['QUIZ_CONTENT_GUIDELINES']}
-{AI_PROMPTS['QUIZ_INTEGRATION']}
+    def _plan_error(self, e: Exception) -> str:
+        print(f"OpenAI API error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return f"ERROR: {str(e)}"
 
-{AI_PROMPTS['FORMATTING_INSTRUCTIONS']}
+    def strip_quiz_section(self, content: str) -> str:
+        """Remove the quiz section from the markdown content (if present)."""
+        return quiz_parser.strip_quiz(content)
 
-{AI_PROMPTS['CONTEXT_TONE_STYLE']}
+    def extract_quiz_from_report(self, content: str) -> Optional[Dict[str, Any]]:
+        """Public helper to extract a quiz object from report markdown."""
+        return quiz_parser.split_quiz(content)[0]
+
+    def split_quiz_from_report(self, content: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """(quiz, markdown without the quiz) from a single pass; the content is unchanged when there is no quiz."""
+        return quiz_parser.split_quiz(content)
+
+    def _quiz_request(self, topic: str, report_content: str) -> Dict[str, Any]:
+        return self._budgeted_request(
+            prompt_builder.quiz_messages(topic, report_content),
+            settings.OPENAI_MAX_TOKENS_QUIZ,
+            temperature=settings.OPENAI_TEMPERATURE,
+            response_format=quiz_response_format()
+        )
 
-{AI_PROMPTS['LINK_FORMATTING']}
+    def _quiz_from_response(self, response) -> Optional[Dict[str, Any]]:
+        """Validated quiz from a structured-output response; None (no quiz) if it is truncated or invalid"""
+        choice = response.choices[0]
+        if getattr(choice, "finish_reason", None) == "length":
+            print("[AI Service] Quiz response was truncated")
+            return None
+        try:
+            return Quiz.model_validate_json(choice.message.content or "").model_dump()
+        except ValidationError as e:
+            print(f"[AI Service] Quiz response failed validation: {e.error_count()} error(s): {e.errors()[0]['msg']}")
+            return None
 
-{AI_PROMPTS['MATH_FORMATTING']}"""
+    def _budgeted_request(self, messages: list, max_tokens: int, **params) -> Dict[str, Any]:
+        """Chat completion request whose max_tokens is capped by the room the prompt leaves in the context window"""
+        _, max_tokens = token_budget.fit_max_tokens(messages, max_tokens)
+        return dict(model=settings.OPENAI_MODEL, messages=messages, max_tokens=max_tokens, **params)
 
-    def _build_summary_prompt(self, existing_summary: str, new_report_content: str, 
-                             new_topic: str, learning_plan: list) -> str:
-        """Build a summary prompt from modular components"""
-        return f"""Create a concise, coherent summary that combines the existing learning context with new content.
+    def _report_request(self, topic: str) -> Dict[str, Any]:
+        return self._budgeted_request(
+            prompt_builder.report_messages(topic),
+            settings.OPENAI_MAX_TOKENS_REPORT,
+            temperature=settings.OPENAI_TEMPERATURE
+        )
 
-EXISTING LEARNING SUMMARY:
-{existing_summary if existing_summary else "No previous learning context available."}
+    def _context_report_request(self, topic: str, context: str, learning_plan: list) -> Dict[str, Any]:
+        return self._budgeted_request(
+            prompt_builder.context_report_messages(
+                topic, token_budget.fit_context(context), token_budget.fit_learning_plan(learning_plan, topic)
+            ),
+            settings.OPENAI_MAX_TOKENS_REPORT,
+            temperature=settings.OPENAI_TEMPERATURE
+        )
 
-NEW REPORT CONTENT (Topic: {new_topic}):
-{new_report_content}
+    def _report_with_summary_request(self, topic: str, context: str, learning_plan: list) -> Dict[str, Any]:
+        return self._budgeted_request(
+            prompt_builder.report_with_summary_messages(
+                topic, token_budget.fit_context(context), token_budget.fit_learning_plan(learning_plan, topic)
+            ),
+            # Room for the summary on top of the report
+            settings.OPENAI_MAX_TOKENS_REPORT + settings.OPENAI_MAX_TOKENS_SUMMARY,
+            temperature=settings.OPENAI_TEMPERATURE,
+            response_format={"type": "json_object"}
+        )
 
-COMPLETE LEARNING PLAN:
-{chr(10).join([f"- {topic}" for topic in learning_plan])}
+    def _summary_request(self, existing_summary: str, new_report_content: str,
+                         new_topic: str, learning_plan: list) -> Dict[str, Any]:
+        return self._budgeted_request(
+            prompt_builder.summary_messages(
+                token_budget.fit_context(existing_summary), new_report_content, new_topic,
+                token_budget.fit_learning_plan(learning_plan, new_topic)
+            ),
+            settings.OPENAI_MAX_TOKENS_SUMMARY,
+            temperature=0.5  # Lower temperature for more consistent summaries
+        )
 
-{AI_PROMPTS['SUMMARY_TASK']}
+    def _initial_summary_request(self, main_topic: str, learning_plan: list,
+                                 first_report_content: str, first_topic: str) -> Dict[str, Any]:
+        return self._budgeted_request(
+            prompt_builder.initial_summary_messages(
+                main_topic, token_budget.fit_learning_plan(learning_plan, first_topic), first_report_content, first_topic
+            ),
+            settings.OPENAI_MAX_TOKENS_INITIAL_SUMMARY,
+            temperature=0.5
+        )
 
-{AI_PROMPTS['SUMMARY_FOCUS']}
+    def _record_usage(self, kind: str, response, request: Optional[Dict[str, Any]] = None) -> None:
+        """Feed response.usage into the prompt cache stats, and the token budget stats when the request is given"""
+        usage = getattr(response, "usage", None)
+        if request is not None:
+            token_usage_stats.record(kind, request, usage)
+        cached = prompt_cache_stats.record(kind, usage)
+        if cached:
+            print(f"[AI Service] {kind}: {cached} of {getattr(usage, 'prompt_tokens', '?')} prompt tokens served from the prompt cache")
 
-{AI_PROMPTS['SUMMARY_TONE']}"""
-    
-    def _build_initial_summary_prompt(self, main_topic: str, learning_plan: list, 
-                                     first_report_content: str, first_topic: str) -> str:
-        """Build an initial summary prompt from modular components"""
-        return f"""Create an initial learning context summary for a new user starting their learning journey.
+    def _content_with_usage(self, response) -> Tuple[str, int]:
+        content = response.choices[0].message.content.strip()
+        token_usage = response.usage.total_tokens if hasattr(response, 'usage') and response.usage else 0
+        return content, token_usage
 
-MAIN TOPIC: {main_topic}
-FIRST TOPIC COVERED: {first_topic}
-COMPLETE LEARNING PLAN:
-{chr(10).join([f"- {topic}" for topic in learning_plan])}
+    def _cached_report(self, request: Dict[str, Any], user: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        """(cache key, cached content) for a context-free report request; key is None when caching is off"""
+        if not report_cache.enabled:
+            return None, None
+        cache_key = report_cache.key_for(request, user)
+        content = report_cache.get(cache_key)
+        if content is not None:
+            print(f"[AI Service] Report cache hit ({cache_key[:12]}), skipping OpenAI call")
+        return cache_key, content
+
+    def _report_and_summary_from_response(self, response) -> Optional[Tuple[str, str, int]]:
+        choice = response.choices[0]
+        if getattr(choice, "finish_reason", None) == "length":
+            print("[AI Service] Single-call response was truncated, falling back")
+            return None
+        try:
+            data = json.loads(choice.message.content)
+        except (TypeError, ValueError) as e:
+            print(f"[AI Service] Single-call response is not valid JSON, falling back: {e}")
+            return None
+        report = data.get("report") if isinstance(data, dict) else None
+        summary = data.get("updated_summary") if isinstance(data, dict) else None
+        if not isinstance(report, str) or not report.strip() or not isinstance(summary, str) or not summary.strip():
+            print("[AI Service] Single-call response is missing the report or summary, falling back")
+            return None
+        token_usage = response.usage.total_tokens if hasattr(response, 'usage') and response.usage else 0
+        return report.strip(), summary.strip(), token_usage
 
-FIRST REPORT CONTENT:
-{first_report_content}
+    def batch_report_job(self, topic: str, context: Optional[str], learning_plan: list,
+                         user: Optional[str] = None, single_call: bool = False) -> Dict[str, Any]:
+        """
+        Request for a report generated through the Batch API, chosen as in the
+        realtime path. "content" is already set when the report cache answers it.
+        """
+        if context:
+            if single_call:
+                return {"kind": "report_with_summary", "request": self._report_with_summary_request(topic, context, learning_plan)}
+            return {"kind": "context_report", "request": self._context_report_request(topic, context, learning_plan)}
+        request = self._report_request(topic)
+        cache_key, content = self._cached_report(request, user)
+        return {"kind": "report", "request": request, "cache_key": cache_key, "content": content}
+
+    def batch_report_result(self, job: Dict[str, Any], response) -> Optional[Tuple[str, Optional[str], int]]:
+        """(report, summary or None, tokens) from the batch response to a batch_report_job request"""
+        self._record_usage(job["kind"], response, job["request"])
+        if job["kind"] == "report_with_summary":
+            return self._report_and_summary_from_response(response)
+        content, token_usage = self._content_with_usage(response)
+        if job.get("cache_key"):
+            report_cache.put(job["cache_key"], content)
+        return content, None, token_usage
+
+    def batch_summary_request(self, existing_summary: str, new_report_content: str,
+                              new_topic: str, learning_plan: list) -> Dict[str, Any]:
+        return self._summary_request(existing_summary, new_report_content, new_topic, learning_plan)
+
+    def batch_summary_result(self, response, request: Optional[Dict[str, Any]] = None) -> Tuple[str, int]:
+        self._record_usage("summary", response, request)
+        return self._content_with_usage(response)
 
-{AI_PROMPTS['INITIAL_SUMMARY_TASK']}
+    def extract_topics_from_plan(self, plan: str) -> list:
+        """Extract only the topic titles from the OpenAI learning plan response."""
+        topics = []
+        for line in plan.splitlines():
+            # Match lines like '1. **Topic**' or '1. Topic'
+            match = re.match(r'^\s*\d+\.\s+\*?\*?(.+?)\*?\*?\s*$', line)
+            if match:
+                topic = match.group(1).strip()
+                topics.append(topic)
+        return topics
 
-{AI_PROMPTS['INITIAL_SUMMARY_REQUIREMENTS']}
+    def validate_topic(self, topic: str) -> bool:
+        """Validate if a topic is suitable for learning"""
+        # Basic validation - topic should not be empty and should be reasonable length
+        if not topic or len(topic.strip()) < 2 or len(topic.strip()) > 100:
+            return False
+        return True
 
-{AI_PROMPTS['INITIAL_SUMMARY_TONE']}"""
+class AIService(BaseAIService):
+    def __init__(self):
+        self.client = openai.OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            timeout=settings.OPENAI_TIMEOUT
+        )
 
     def generate_learning_plan(self, topic: str) -> str:
         """
@@ -150,203 +262,156 @@ FIRST REPORT CONTENT:
         Returns the plan as a string, or "ERROR" if the topic is invalid
         """
         try:
-            prompt = f"""Create a comprehensive 30-day learning plan for {topic}. 
-
-The plan should include:
-1. A list of 10 topics for each of the three expertise levels:
-   - Beginner (10 topics)
-   - Intermediate (10 topics) 
-   - Advanced (10 topics)
-
-If the topic is not suitable for learning or is inappropriate, respond with "ERROR"."""
-
-            response = self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are an expert educational content creator specializing in creating structured learning plans."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=settings.OPENAI_MAX_TOKENS_PLAN,
-                temperature=settings.OPENAI_TEMPERATURE
-            )
-            plan = response.choices[0].message.content.strip()
-            print(f"OpenAI API raw response: {plan}")
-            # Only treat as error if the response is exactly 'ERROR' or starts with 'ERROR'
-            if plan.strip().upper() == "ERROR" or plan.strip().upper().startswith("ERROR"):
-                return "ERROR"
-            return plan
+            request = self._learning_plan_request(topic)
+            response = self.client.chat.completions.create(**request)
+            self._record_usage("learning_plan", response, request)
+            return self._plan_from_response(response)
         except Exception as e:
-            print(f"OpenAI API error: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return f"ERROR: {str(e)}"
+            return self._plan_error(e)
 
-    def _parse_quiz_from_markdown(self, content: str) -> Optional[Dict[str, Any]]:
-        """Extract structured quiz data from the 'Interactive Quiz' section in markdown."""
+    def generate_quiz(self, topic: str, report_content: str) -> Optional[Dict[str, Any]]:
+        """
+        Quiz for a report from a separate JSON schema completion (QUIZ_MODE
+        "structured"). Returns the validated quiz, or None if the call fails.
+        """
         try:
-            quiz_section_match = re.search(r"##\s*Interactive Quiz:\s*Test Your Understanding([\s\S]+)$", content, re.IGNORECASE)
-            if not quiz_section_match:
-                return None
-            quiz_block = quiz_section_match.group(1)
-
-            # Extract "Why This Matters" first (appears at the end)
-            why_matters_match = re.search(r"\*\*Why This Matters:\*\*\s*(.+)", quiz_block, re.IGNORECASE)
-            why_matters = why_matters_match.group(1).strip() if why_matters_match else ""
-
-            # Find all question blocks (Question 1, Question 2, etc.)
-            question_blocks = re.findall(r"\*\*Question (\d+):\*\*([\s\S]*?)(?=\*\*Question \d+:\*\*|\*\*Why This Matters:\*\*|$)", quiz_block, re.IGNORECASE)
-            
-            if not question_blocks:
-                return None
-
-            questions = []
-            for question_num, block in question_blocks:
-                def extract_from_block(pattern: str) -> Optional[str]:
-                    m = re.search(pattern, block, re.IGNORECASE | re.MULTILINE)
-                    return m.group(1).strip() if m else None
-
-                # Extract question text (first line after "Question N:")
-                question_text_match = re.search(r"^\s*(.+)", block.strip(), re.MULTILINE)
-                question_text = question_text_match.group(1).strip() if question_text_match else None
-
-                # Extract correct answer
-                correct_answer = extract_from_block(r"\*\*Correct Answer:\*\*\s*([A-D])\b")
-
-                # Extract options
-                option_texts: Dict[str, str] = {}
-                for opt in ["A", "B", "C", "D"]:
-                    txt = extract_from_block(rf"^{opt}\)\s+(.+)$")
-                    if txt:
-                        option_texts[opt] = txt
-
-                # Extract explanations
-                option_explanations: Dict[str, str] = {}
-                for opt in ["A", "B", "C", "D"]:
-                    expl = extract_from_block(rf"-\s*\*\*Option {opt}:\*\*\s*(.+)")
-                    if expl:
-                        option_explanations[opt] = expl
-
-                # Only include question if all required parts are present
-                if question_text and correct_answer and len(option_texts) == 4 and len(option_explanations) == 4:
-                    options = [
-                        {"id": k, "text": option_texts[k], "explanation": option_explanations.get(k, "")}
-                        for k in ["A", "B", "C", "D"]
-                    ]
-                    
-                    questions.append({
-                        "question": question_text,
-                        "options": options,
-                        "correct_answer": correct_answer
-                    })
-
-            if not questions:
-                return None
-
-            return {
-                "questions": questions,
-                "why_it_matters": why_matters
-            }
-        except Exception:
+            request = self._quiz_request(topic, report_content)
+            response = self.client.chat.completions.create(**request)
+            self._record_usage("quiz", response, request)
+            return self._quiz_from_response(response)
+        except Exception as e:
+            print(f"[AI Service] Quiz generation failed for {topic}: {e}")
             return None
 
-    def strip_quiz_section(self, content: str) -> str:
-        """Remove the quiz section from the markdown content (if present)."""
-        return re.sub(r"\n?##\s*Interactive Quiz:\s*Test Your Understanding[\s\S]+$", "", content, flags=re.IGNORECASE)
-
-    def extract_quiz_from_report(self, content: str) -> Optional[Dict[str, Any]]:
-        """Public helper to extract a quiz object from report markdown."""
-        return self._parse_quiz_from_markdown(content)
-
-    def generate_report_content(self, topic: str) -> str:
+    def generate_report_content(self, topic: str, user: Optional[str] = None) -> str:
         """
-        Generate educational report content using OpenAI
+        Generate educational report content using OpenAI.
+        The prompt depends only on the topic, so repeats are served from the
+        shared report cache; user selects the cache variant.
         """
-        report_prompt = self._build_report_prompt(topic)
-        
-        response = self.client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": AI_PROMPTS['SYSTEM_MESSAGES']['REPORT_GENERATOR']},
-                {"role": "user", "content": report_prompt}
-            ],
-            max_tokens=settings.OPENAI_MAX_TOKENS_REPORT,
-            temperature=settings.OPENAI_TEMPERATURE
-        )
-        return response.choices[0].message.content.strip()
+        request = self._report_request(topic)
+        cache_key, content = self._cached_report(request, user)
+        if content is not None:
+            return content
+        response = self.client.chat.completions.create(**request)
+        self._record_usage("report", response, request)
+        content = response.choices[0].message.content.strip()
+        if cache_key:
+            report_cache.put(cache_key, content)
+        return content
 
     def generate_report_content_with_context(self, topic: str, context: str, learning_plan: list) -> Tuple[str, int]:
         """
         Generate educational report content using OpenAI with user context
         """
-        context_prompt = self._build_context_prompt(topic, context, learning_plan)
-        
-        response = self.client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": AI_PROMPTS['SYSTEM_MESSAGES']['CONTEXT_AWARE_GENERATOR']},
-                {"role": "user", "content": context_prompt}
-            ],
-            max_tokens=settings.OPENAI_MAX_TOKENS_REPORT,
-            temperature=settings.OPENAI_TEMPERATURE
-        )
-        content = response.choices[0].message.content.strip()
-        token_usage = response.usage.total_tokens if hasattr(response, 'usage') and response.usage else 0
-        return content, token_usage
+        request = self._context_report_request(topic, context, learning_plan)
+        response = self.client.chat.completions.create(**request)
+        self._record_usage("context_report", response, request)
+        return self._content_with_usage(response)
+
+    def generate_report_and_summary(self, topic: str, context: str, learning_plan: list) -> Optional[Tuple[str, str, int]]:
+        """
+        Generate the context-aware report and the updated context summary in one
+        JSON-mode completion. Returns (report, summary, tokens), or None if the
+        call fails or the response is unusable, so the caller can fall back to
+        the two-call path.
+        """
+        try:
+            request = self._report_with_summary_request(topic, context, learning_plan)
+            response = self.client.chat.completions.create(**request)
+            self._record_usage("report_with_summary", response, request)
+            return self._report_and_summary_from_response(response)
+        except Exception as e:
+            print(f"[AI Service] Single-call report/summary failed, falling back: {e}")
+            return None
 
     def summarize_content_for_context(self, existing_summary: str, new_report_content: str, 
                                     new_topic: str, learning_plan: list) -> Tuple[str, int]:
         """
         Generate a concise summary for context storage using OpenAI
         """
-        summary_prompt = self._build_summary_prompt(existing_summary, new_report_content, new_topic, learning_plan)
-        
-        response = self.client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": AI_PROMPTS['SYSTEM_MESSAGES']['SUMMARY_GENERATOR']},
-                {"role": "user", "content": summary_prompt}
-            ],
-            max_tokens=1000,  # Generous token limit for high-quality summary
-            temperature=0.5  # Lower temperature for more consistent summaries
-        )
-        content = response.choices[0].message.content.strip()
-        token_usage = response.usage.total_tokens if hasattr(response, 'usage') and response.usage else 0
-        return content, token_usage
+        request = self._summary_request(existing_summary, new_report_content, new_topic, learning_plan)
+        response = self.client.chat.completions.create(**request)
+        self._record_usage("summary", response, request)
+        return self._content_with_usage(response)
 
     def generate_initial_context_summary(self, main_topic: str, learning_plan: list, 
                                        first_report_content: str, first_topic: str) -> Tuple[str, int]:
         """
         Generate initial context summary for new user
         """
-        initial_prompt = self._build_initial_summary_prompt(main_topic, learning_plan, first_report_content, first_topic)
-        
-        response = self.client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": AI_PROMPTS['SYSTEM_MESSAGES']['INITIAL_SUMMARY_GENERATOR']},
-                {"role": "user", "content": initial_prompt}
-            ],
-            max_tokens=800,
-            temperature=0.5
-        )
+        request = self._initial_summary_request(main_topic, learning_plan, first_report_content, first_topic)
+        response = self.client.chat.completions.create(**request)
+        self._record_usage("initial_summary", response, request)
+        return self._content_with_usage(response)
+
+class AsyncAIService(BaseAIService):
+    """
+    Async sibling of AIService: same prompts and parsing, but completions are awaited
+    on the shared AsyncOpenAI client, so the event loop keeps serving other
+    requests while a completion is in flight.
+    """
+
+    def __init__(self):
+        self.client = get_async_client()
+
+    async def generate_learning_plan(self, topic: str) -> str:
+        try:
+            request = self._learning_plan_request(topic)
+            response = await self.client.chat.completions.create(**request)
+            self._record_usage("learning_plan", response, request)
+            return self._plan_from_response(response)
+        except Exception as e:
+            return self._plan_error(e)
+
+    async def generate_report_content(self, topic: str, user: Optional[str] = None) -> str:
+        request = self._report_request(topic)
+        cache_key, content = self._cached_report(request, user)
+        if content is not None:
+            return content
+        response = await self.client.chat.completions.create(**request)
+        self._record_usage("report", response, request)
         content = response.choices[0].message.content.strip()
-        token_usage = response.usage.total_tokens if hasattr(response, 'usage') and response.usage else 0
-        return content, token_usage
+        if cache_key:
+            report_cache.put(cache_key, content)
+        return content
 
-    def extract_topics_from_plan(self, plan: str) -> list:
-        """Extract only the topic titles from the OpenAI learning plan response."""
-        topics = []
-        for line in plan.splitlines():
-            # Match lines like '1. **Topic**' or '1. Topic'
-            match = re.match(r'^\s*\d+\.\s+\*?\*?(.+?)\*?\*?\s*$', line)
-            if match:
-                topic = match.group(1).strip()
-                topics.append(topic)
-        return topics
+    async def generate_report_content_with_context(self, topic: str, context: str, learning_plan: list) -> Tuple[str, int]:
+        request = self._context_report_request(topic, context, learning_plan)
+        response = await self.client.chat.completions.create(**request)
+        self._record_usage("context_report", response, request)
+        return self._content_with_usage(response)
 
-    def validate_topic(self, topic: str) -> bool:
-        """Validate if a topic is suitable for learning"""
-        # Basic validation - topic should not be empty and should be reasonable length
-        if not topic or len(topic.strip()) < 2 or len(topic.strip()) > 100:
-            return False
-        return True 
\ No newline at end of file
+    async def generate_report_and_summary(self, topic: str, context: str, learning_plan: list) -> Optional[Tuple[str, str, int]]:
+        try:
+            request = self._report_with_summary_request(topic, context, learning_plan)
+            response = await self.client.chat.completions.create(**request)
+            self._record_usage("report_with_summary", response, request)
+            return self._report_and_summary_from_response(response)
+        except Exception as e:
+            print(f"[AI Service] Single-call report/summary failed, falling back: {e}")
+            return None
+
+    async def generate_quiz(self, topic: str, report_content: str) -> Optional[Dict[str, Any]]:
+        try:
+            request = self._quiz_request(topic, report_content)
+            response = await self.client.chat.completions.create(**request)
+            self._record_usage("quiz", response, request)
+            return self._quiz_from_response(response)
+        except Exception as e:
+            print(f"[AI Service] Quiz generation failed for {topic}: {e}")
+            return None
+
+    async def summarize_content_for_context(self, existing_summary: str, new_report_content: str,
+                                            new_topic: str, learning_plan: list) -> Tuple[str, int]:
+        request = self._summary_request(existing_summary, new_report_content, new_topic, learning_plan)
+        response = await self.client.chat.completions.create(**request)
+        self._record_usage("summary", response, request)
+        return self._content_with_usage(response)
+
+    async def generate_initial_context_summary(self, main_topic: str, learning_plan: list,
+                                               first_report_content: str, first_topic: str) -> Tuple[str, int]:
+        request = self._initial_summary_request(main_topic, learning_plan, first_report_content, first_topic)
+        response = await self.client.chat.completions.create(**request)
+        self._record_usage("initial_summary", response, request)
+        return self._content_with_usage(response)
@@ -0,0 +1,147 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import traceback
+from services.openai_batch import OpenAIBatchClient, create_batch_client
+
+def _job_key(user: Dict[str, Any]) -> Tuple[str, str]:
+    return (user["email"].lower(), user["main_topic"])
+
+class BatchReportService:
+    """
+    Scheduler execution mode 'batch': the day's report completions go to the
+    OpenAI Batch API instead of one realtime call per user.
+
+    1. Every due user's report request is built as in the realtime path and
+       submitted as one batch.
+    2. Reports that did not come with an updated context summary get their
+       summary requests in a second batch (CONTEXT_MODE "summary" only; the
+       structured context is updated locally while publishing).
+    3. Each user is then published through ReportService.publish_next_report
+       (render, upload, progress, email). Users whose batch request failed fall
+       back to the realtime generate_next_report.
+    """
+
+    def __init__(self, report_service, client: Optional[OpenAIBatchClient] = None):
+        self.report_service = report_service
+        self.client = client
+
+    def generate(self, users: List[Dict[str, Any]],
+                 on_message: Optional[Callable[[str], None]] = None) -> Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Run the batch completions for users; returns the per-user publish step for the scheduler pool"""
+        client = self.client or create_batch_client()
+        notify = on_message or (lambda message: None)
+        jobs = self._prepare(users)
+
+        report_requests = {job["id"]: job["request"] for job in jobs.values() if job.get("request") and job.get("report") is None}
+        notify(f"Waiting for OpenAI batch of {len(report_requests)} report(s)")
+        try:
+            responses = client.run(report_requests, "Scheduler reports", self._status_listener(notify, "report"))
+        except Exception as e:
+            # Every user then falls back to realtime generation while publishing
+            print(f"[Batch Reports] Report batch failed, falling back to realtime: {e}")
+            responses = {}
+        for job in jobs.values():
+            response = responses.get(job["id"])
+            if response is None:
+                continue
+            try:
+                result = self.report_service.ai_service.batch_report_result(job, response)
+            except Exception as e:
+                print(f"[Batch Reports] Unusable batch response for {job['user']['email']}: {e}")
+                result = None
+            if result:
+                job["report"], job["summary"], job["token_count"] = result
+
+        summary_requests = {
+            job["id"]: self.report_service.ai_service.batch_summary_request(
+                (job["existing_context"] or {}).get("summary", ""), job["report"], job["topic"], job["user"]["learning_plan"]
+            )
+            for job in jobs.values() if job.get("report") is not None and job.get("summary") is None
+        } if self.report_service.context_service.uses_llm_summary else {}
+        if summary_requests:
+            notify(f"Waiting for OpenAI batch of {len(summary_requests)} context summary(ies)")
+            try:
+                responses = client.run(summary_requests, "Scheduler context summaries", self._status_listener(notify, "summary"))
+            except Exception as e:
+                # Summaries are then generated in realtime while publishing
+                print(f"[Batch Reports] Summary batch failed: {e}")
+                responses = {}
+            jobs_by_id = {job["id"]: job for job in jobs.values()}
+            for custom_id, response in responses.items():
+                summary_job = jobs_by_id.get(custom_id)
+                if summary_job is None or custom_id not in summary_requests:
+                    print(f"[Batch Reports] Ignoring summary response for unknown request {custom_id}")
+                    continue
+                try:
+                    summary_job["summary"], summary_job["summary_tokens"] = self.report_service.ai_service.batch_summary_result(
+                        response, summary_requests[custom_id]
+                    )
+                except Exception as e:
+                    # summary stays None, so publishing summarizes this report in realtime
+                    print(f"[Batch Reports] Unusable summary response for {summary_job['user']['email']}: {e}")
+
+        notify("Publishing reports")
+        return lambda user: self._publish(user, jobs)
+
+    def _prepare(self, users: List[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """Build the report request of every user who is due one"""
+        jobs: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for user in users:
+            try:
+                topic = self.report_service.next_report_topic(user)
+                if topic is None:
+                    continue
+                existing_context = self.report_service.context_service.load_context(user["email"], user["main_topic"])
+                context = self.report_service.context_service.prompt_context(
+                    user["email"], user["main_topic"], topic, existing_context
+                )
+                job = self.report_service.ai_service.batch_report_job(
+                    topic, context, user["learning_plan"], user=user["email"],
+                    single_call=self.report_service.single_call_summary
+                )
+                job.update({
+                    "id": f"report-{len(jobs)}",
+                    "user": user,
+                    "topic": topic,
+                    "existing_context": existing_context,
+                    "report": job.pop("content", None),
+                    "summary": None,
+                    "token_count": None
+                })
+                jobs[_job_key(user)] = job
+            except Exception as e:
+                # Left out of the batch; handled in realtime when publishing
+                print(f"[Batch Reports] Could not prepare a batch request for {user.get('email')}: {e}")
+        return jobs
+
+    def _status_listener(self, notify: Callable[[str], None], label: str) -> Callable[[Dict[str, Any]], None]:
+        def listener(batch: Dict[str, Any]) -> None:
+            counts = batch.get("request_counts") or {}
+            notify(
+                f"OpenAI {label} batch {batch.get('id')}: {batch.get('status')} "
+                f"({counts.get('completed', 0)}/{counts.get('total', '?')} done)"
+            )
+        return listener
+
+    def _publish(self, user: Dict[str, Any], jobs: Dict[Tuple[str, str], Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        job = jobs.get(_job_key(user))
+        if job is None or job.get("report") is None:
+            # Not due (generate_next_report skips it again) or the batch request failed
+            return self.report_service.generate_next_report(user)
+
+        context_service = self.report_service.context_service
+        topic = job["topic"]
+        try:
+            if job.get("summary") is not None:
+                context_update = (
+                    context_service.fold_summary(job["existing_context"], job["report"], topic, user["learning_plan"], job["summary"]),
+                    job.get("summary_tokens")
+                )
+            else:
+                context_update = context_service.summarize_new_report(
+                    job["existing_context"], job["report"], topic, user["learning_plan"]
+                )
+            return self.report_service.publish_next_report(user, topic, job["report"], job["token_count"], context_update)
+        except Exception as e:
+            print(f"[Batch Reports] Error for {user['email']} on topic {topic}: {e}")
+            traceback.print_exc()
+            return user
@@ -1,6 +1,9 @@
 from typing import Dict, Any, Optional, Tuple
 from data.context_repository import ContextRepository
-from services.ai_service import AIService
+from data import response_repository
+from services.ai_service import AIService, AsyncAIService
+from services import structured_context
+from services.report_index import report_index_store
 from config import settings
 
 class ContextService:
@@ -9,18 +12,79 @@ class ContextService:
     def __init__(self):
         self.context_repo = ContextRepository()
         self.ai_service = AIService()
+        self.async_ai_service = AsyncAIService()
     
-    def get_user_context(self, user_email: str, main_topic: str) -> Optional[str]:
-        """Retrieve context summary for user/topic."""
+    @property
+    def uses_llm_summary(self) -> bool:
+        """Whether context updates need a summary completion (CONTEXT_MODE "summary")"""
+        return settings.CONTEXT_MODE == "summary"
+    
+    def load_context(self, user_email: str, main_topic: str) -> Optional[Dict[str, Any]]:
+        """Retrieve the stored context document for user/topic."""
         try:
-            context_data = self.context_repo.load_context_summary(user_email, main_topic)
-            if context_data:
-                return context_data.get("summary", "")
-            return None
+            return self.context_repo.load_context_summary(user_email, main_topic)
         except Exception as e:
             print(f"[Context Service] Error retrieving user context: {e}")
             return None
     
+    def get_user_context(self, user_email: str, main_topic: str) -> Optional[str]:
+        """Retrieve context summary for user/topic."""
+        context_data = self.load_context(user_email, main_topic)
+        if context_data:
+            return context_data.get("summary", "")
+        return None
+    
+    def prompt_context(self, user_email: str, main_topic: str, topic: str,
+                       existing_context: Optional[Dict[str, Any]]) -> Optional[str]:
+        """
+        Context text for the next report's prompt: the stored summary, plus in
+        CONTEXT_MODE "retrieval" the past report passages most relevant to topic.
+        """
+        if not existing_context:
+            return None
+        summary = existing_context.get("summary", "")
+        if settings.CONTEXT_MODE != "retrieval":
+            return summary
+        try:
+            index = report_index_store.get(
+                user_email, main_topic, existing_context.get("topics_covered", []),
+                lambda covered_topic: (response_repository.load_response(
+                    user_email, main_topic, "report", covered_topic
+                ) or {}).get("raw_response"),
+                lambda: self.context_repo.load_report_index(user_email, main_topic)
+            )
+            results = report_index_store.search(index, topic)
+        except Exception as e:
+            print(f"[Context Service] Retrieval failed, using the summary only: {e}")
+            return summary
+        if not results:
+            return summary
+        passages = "\n\n".join(f'[From "{passage_topic}"] {passage}' for _, passage_topic, passage in results)
+        return f"{summary}\n\nRelevant passages from earlier reports:\n{passages}".strip()
+    
+    def index_report(self, user_email: str, main_topic: str, topic: str, report_content: str) -> None:
+        """Add a saved report to the user's retrieval index (CONTEXT_MODE "retrieval") and store the index."""
+        if settings.CONTEXT_MODE != "retrieval":
+            return
+        index_data = report_index_store.add_report(user_email, main_topic, topic, report_content)
+        if index_data is None:
+            return
+        try:
+            # Staged into the report's commit batch when called inside one
+            self.context_repo.save_report_index(user_email, main_topic, index_data)
+        except Exception as e:
+            print(f"[Context Service] Error saving report index: {e}")
+    
+    def save_context(self, user_email: str, main_topic: str, summary_data: Dict[str, Any],
+                     token_count: Optional[int] = None) -> None:
+        """Store a context summary built by summarize_new_report / build_initial_context."""
+        try:
+            self.context_repo.save_context_summary(user_email, main_topic, summary_data, token_count)
+            print(f"[Context Service] Updated context for {user_email} on {main_topic}")
+        except Exception as e:
+            print(f"[Context Service] Error saving context: {e}")
+            # Don't block report generation if the context cannot be saved
+    
     def update_context_with_new_report(self, user_email: str, main_topic: str, 
                                      new_report_content: str, new_topic: str, 
                                      learning_plan: list) -> None:
@@ -34,76 +98,162 @@ class ContextService:
             print(f"[Context Service] Error updating context: {e}")
             # Don't block report generation if context update fails
     
+    def _update_data(self, existing_context: Optional[Dict[str, Any]], new_report_content: str,
+                     new_topic: str, learning_plan: list) -> Dict[str, Any]:
+        return {
+            "existing_summary": existing_context.get("summary", "") if existing_context else "",
+            "new_report_content": new_report_content,
+            "new_topic": new_topic,
+            "learning_plan": learning_plan,
+            "current_topics_covered": existing_context.get("topics_covered", []) if existing_context else [],
+            "current_report_count": existing_context.get("report_count", 0) if existing_context else 0,
+            "existing_structured": existing_context.get("structured") if existing_context else None
+        }
+    
+    def summarize_new_report(self, existing_context: Optional[Dict[str, Any]], new_report_content: str,
+                             new_topic: str, learning_plan: list) -> Tuple[Dict[str, Any], int]:
+        """Fold a new report into an already loaded context; the result is stored with save_context."""
+        return self.generate_context_summary(
+            self._update_data(existing_context, new_report_content, new_topic, learning_plan)
+        )
+    
+    async def summarize_new_report_async(self, existing_context: Optional[Dict[str, Any]], new_report_content: str,
+                                         new_topic: str, learning_plan: list) -> Tuple[Dict[str, Any], int]:
+        """Async twin of summarize_new_report."""
+        return await self.generate_context_summary_async(
+            self._update_data(existing_context, new_report_content, new_topic, learning_plan)
+        )
+    
+    def fold_summary(self, existing_context: Optional[Dict[str, Any]], new_report_content: str,
+                     new_topic: str, learning_plan: list, new_summary: str) -> Dict[str, Any]:
+        """Context data for a summary the model already produced alongside the report (single-call mode)."""
+        return self._summary_data(
+            self._update_data(existing_context, new_report_content, new_topic, learning_plan), new_summary
+        )
+    
     def generate_context_summary(self, update_data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
         """Generate context summary using AI."""
+        if not self.uses_llm_summary:
+            return self._structured_summary(update_data), 0
         try:
-            existing_summary = update_data.get("existing_summary", "")
-            new_report_content = update_data.get("new_report_content", "")
-            new_topic = update_data.get("new_topic", "")
-            learning_plan = update_data.get("learning_plan", [])
-            current_topics_covered = update_data.get("current_topics_covered", [])
-            current_report_count = update_data.get("current_report_count", 0)
-            
             # Generate new summary using AI
             new_summary, token_count = self.ai_service.summarize_content_for_context(
-                existing_summary, new_report_content, new_topic, learning_plan
+                update_data.get("existing_summary", ""), update_data.get("new_report_content", ""),
+                update_data.get("new_topic", ""), update_data.get("learning_plan", [])
             )
-            
-            # Update topics covered
-            updated_topics_covered = current_topics_covered.copy()
-            if new_topic not in updated_topics_covered:
-                updated_topics_covered.append(new_topic)
-            
-            # Prepare summary data
-            summary_data = {
-                "summary": new_summary,
-                "topics_covered": updated_topics_covered,
-                "report_count": current_report_count + 1,
-                "metadata": {
-                    "last_topic_added": new_topic,
-                    "total_topics_in_plan": len(learning_plan),
-                    "topics_remaining": len(learning_plan) - len(updated_topics_covered)
-                }
-            }
-            
-            return summary_data, token_count
-            
+            return self._summary_data(update_data, new_summary), token_count
+        except Exception as e:
+            return self._fallback_summary(update_data, e), 0
+    
+    async def generate_context_summary_async(self, update_data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        """Async twin of generate_context_summary."""
+        if not self.uses_llm_summary:
+            return self._structured_summary(update_data), 0
+        try:
+            new_summary, token_count = await self.async_ai_service.summarize_content_for_context(
+                update_data.get("existing_summary", ""), update_data.get("new_report_content", ""),
+                update_data.get("new_topic", ""), update_data.get("learning_plan", [])
+            )
+            return self._summary_data(update_data, new_summary), token_count
         except Exception as e:
-            print(f"[Context Service] Error generating context summary: {e}")
-            # Return minimal summary data if generation fails
-            return {
-                "summary": existing_summary,
-                "topics_covered": current_topics_covered,
-                "report_count": current_report_count,
-                "metadata": {"error": str(e)}
-            }, 0
+            return self._fallback_summary(update_data, e), 0
+    
+    def _summary_data(self, update_data: Dict[str, Any], new_summary: str) -> Dict[str, Any]:
+        new_topic = update_data.get("new_topic", "")
+        learning_plan = update_data.get("learning_plan", [])
+        
+        # Update topics covered
+        updated_topics_covered = update_data.get("current_topics_covered", []).copy()
+        if new_topic not in updated_topics_covered:
+            updated_topics_covered.append(new_topic)
+        
+        return {
+            "summary": new_summary,
+            "topics_covered": updated_topics_covered,
+            "report_count": update_data.get("current_report_count", 0) + 1,
+            "metadata": {
+                "last_topic_added": new_topic,
+                "total_topics_in_plan": len(learning_plan),
+                "topics_remaining": len(learning_plan) - len(updated_topics_covered)
+            }
+        }
+    
+    def _structured_summary(self, update_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Context data updated incrementally from the report itself, without a completion"""
+        # A context last written in "summary" mode carries its free-text summary over
+        structured = structured_context.add_report(
+            update_data.get("existing_structured"), update_data.get("new_topic", ""),
+            update_data.get("new_report_content", ""), update_data.get("current_topics_covered", []),
+            legacy_summary=update_data.get("existing_summary", "")
+        )
+        summary_data = self._summary_data(update_data, structured_context.render(structured))
+        summary_data["structured"] = structured
+        summary_data["metadata"]["context_mode"] = settings.CONTEXT_MODE
+        return summary_data
+    
+    def _fallback_summary(self, update_data: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        print(f"[Context Service] Error generating context summary: {error}")
+        # Return minimal summary data if generation fails
+        return {
+            "summary": update_data.get("existing_summary", ""),
+            "topics_covered": update_data.get("current_topics_covered", []),
+            "report_count": update_data.get("current_report_count", 0),
+            "metadata": {"error": str(error)}
+        }
     
     def create_initial_context(self, user_email: str, main_topic: str, 
                              learning_plan: list, first_report_content: str, 
                              first_topic: str) -> None:
         """Create initial context summary for new user."""
+        initial_context = self.build_initial_context(main_topic, learning_plan, first_report_content, first_topic)
+        if initial_context:
+            self.save_context(user_email, main_topic, *initial_context)
+    
+    def build_initial_context(self, main_topic: str, learning_plan: list, first_report_content: str,
+                              first_topic: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Generate the initial context for a new user; None if generation fails."""
+        if not self.uses_llm_summary:
+            return self._initial_structured_context(learning_plan, first_report_content, first_topic), 0
         try:
-            # Generate initial summary
             initial_summary, token_count = self.ai_service.generate_initial_context_summary(
                 main_topic, learning_plan, first_report_content, first_topic
             )
-            
-            # Prepare initial context data
-            context_data = {
-                "summary": initial_summary,
-                "topics_covered": [first_topic],
-                "report_count": 1,
-                "metadata": {
-                    "initial_topic": first_topic,
-                    "total_topics_in_plan": len(learning_plan),
-                    "topics_remaining": len(learning_plan) - 1
-                }
-            }
-            
-            # Save initial context
-            self.context_repo.save_context_summary(user_email, main_topic, context_data, token_count)
-            print(f"[Context Service] Created initial context for {user_email} on {main_topic}")
-            
+            return self._initial_context_data(learning_plan, first_topic, initial_summary), token_count
         except Exception as e:
             print(f"[Context Service] Error creating initial context: {e}")
-            # Don't block user creation if context creation fails 
\ No newline at end of file
+            # Don't block user creation if context creation fails
+            return None
+    
+    async def build_initial_context_async(self, main_topic: str, learning_plan: list, first_report_content: str,
+                                          first_topic: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Async twin of build_initial_context."""
+        if not self.uses_llm_summary:
+            return self._initial_structured_context(learning_plan, first_report_content, first_topic), 0
+        try:
+            initial_summary, token_count = await self.async_ai_service.generate_initial_context_summary(
+                main_topic, learning_plan, first_report_content, first_topic
+            )
+            return self._initial_context_data(learning_plan, first_topic, initial_summary), token_count
+        except Exception as e:
+            print(f"[Context Service] Error creating initial context: {e}")
+            return None
+    
+    def _initial_context_data(self, learning_plan: list, first_topic: str, initial_summary: str) -> Dict[str, Any]:
+        return {
+            "summary": initial_summary,
+            "topics_covered": [first_topic],
+            "report_count": 1,
+            "metadata": {
+                "initial_topic": first_topic,
+                "total_topics_in_plan": len(learning_plan),
+                "topics_remaining": len(learning_plan) - 1
+            }
+        }
+    
+    def _initial_structured_context(self, learning_plan: list, first_report_content: str,
+                                    first_topic: str) -> Dict[str, Any]:
+        structured = structured_context.add_report(None, first_topic, first_report_content)
+        context_data = self._initial_context_data(learning_plan, first_topic, structured_context.render(structured))
+        context_data["structured"] = structured
+        context_data["metadata"]["context_mode"] = settings.CONTEXT_MODE
+        return context_data
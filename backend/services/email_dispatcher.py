@@ -0,0 +1,125 @@
+import heapq
+import itertools
+import threading
+import time
+import traceback
+import requests
+from typing import Callable, Any, Optional, List, Tuple
+from config import settings
+
+class EmailJob:
+    """A deferred email send: not before `not_before`, and optionally not before `wait_for_url` answers 200"""
+
+    def __init__(self, description: str, send_fn: Callable[..., Any], args: Tuple[Any, ...],
+                 not_before: float, wait_for_url: Optional[str] = None, deadline: Optional[float] = None):
+        self.description = description
+        self.send_fn = send_fn
+        self.args = args
+        self.not_before = not_before
+        self.wait_for_url = wait_for_url
+        self.deadline = deadline
+
+class EmailDispatcher:
+    """Background dispatcher that sends scheduled emails from its own loop"""
+
+    def __init__(self):
+        self._queue: List[Tuple[float, int, EmailJob]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, description: str, send_fn: Callable[..., Any], *args: Any,
+                 delay_seconds: Optional[float] = None, wait_for_url: Optional[str] = None) -> None:
+        """
+        Queue an email send and return immediately.
+
+        Args:
+            description: Label used in logs
+            send_fn: Callable performing the actual send (e.g. EmailService.send_report_email)
+            *args: Arguments passed to send_fn
+            delay_seconds: Earliest send time, relative to now (defaults to REPORT_DELAY_SECONDS)
+            wait_for_url: If set, hold the email until this URL answers 200 or
+                EMAIL_URL_WAIT_TIMEOUT_SECONDS have passed
+        """
+        delay = settings.REPORT_DELAY_SECONDS if delay_seconds is None else delay_seconds
+        now = time.time()
+        deadline = now + settings.EMAIL_URL_WAIT_TIMEOUT_SECONDS if wait_for_url else None
+        job = EmailJob(description, send_fn, args, now + delay, wait_for_url, deadline)
+
+        with self._condition:
+            heapq.heappush(self._queue, (job.not_before, next(self._counter), job))
+            self._ensure_started()
+            self._condition.notify()
+        print(f"[Email Dispatcher] Scheduled {description} in {delay}s")
+
+    def pending_count(self) -> int:
+        """Number of emails queued or currently being sent"""
+        with self._condition:
+            return len(self._queue) + self._in_flight
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every queued email has been handled.
+        Used by short-lived processes (scheduler.py) before they exit.
+
+        Returns:
+            True if the queue emptied, False on timeout
+        """
+        end = time.time() + timeout if timeout is not None else None
+        with self._condition:
+            while self._queue or self._in_flight:
+                remaining = None if end is None else end - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _ensure_started(self) -> None:
+        """Start the dispatcher thread on first use (caller holds the condition)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="email-dispatcher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue or self._queue[0][0] > time.time():
+                    timeout = self._queue[0][0] - time.time() if self._queue else None
+                    self._condition.wait(timeout)
+                _, _, job = heapq.heappop(self._queue)
+                self._in_flight += 1
+
+            try:
+                if self._url_pending(job):
+                    # Not live yet: check again after the poll interval
+                    job.not_before = time.time() + settings.EMAIL_URL_POLL_SECONDS
+                    with self._condition:
+                        heapq.heappush(self._queue, (job.not_before, next(self._counter), job))
+                else:
+                    job.send_fn(*job.args)
+                    print(f"[Email Dispatcher] Dispatched {job.description}")
+            except Exception as e:
+                print(f"[Email Dispatcher] Error dispatching {job.description}: {e}")
+                traceback.print_exc()
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+                    self._condition.notify_all()
+
+    def _url_pending(self, job: EmailJob) -> bool:
+        """Whether the job should keep waiting for its URL to go live"""
+        if not job.wait_for_url:
+            return False
+        if job.deadline is not None and time.time() >= job.deadline:
+            print(f"[Email Dispatcher] {job.wait_for_url} not live after waiting, sending {job.description} anyway")
+            return False
+        try:
+            response = requests.head(job.wait_for_url, allow_redirects=True, timeout=10)
+            return response.status_code != 200
+        except Exception as e:
+            print(f"[Email Dispatcher] Error checking {job.wait_for_url}: {e}")
+            return True
+
+# Global dispatcher instance
+email_dispatcher = EmailDispatcher()
@@ -1,26 +1,43 @@
-import requests
 import base64
 import json
-from typing import Dict, Any, Optional
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, Iterator, List, Tuple
 from datetime import datetime
 from config import settings
+from data.github_client import FileContent, github_client
+from data.git_batch import GitCommitBatch, get_active_batch, set_active_batch, reset_active_batch
+from data.sha_index import GitHubShaIndex, get_sha_index, git_blob_sha
 
 class GitHubSyncService:
     """Service for syncing files to the main GitHub repository"""
     
+    MAX_CONFLICT_RETRIES = 3
+    
     def __init__(self):
-        self.github_api_url = "https://api.github.com"
+        self.github_api_url = settings.GITHUB_API_URL
         self.repo_owner = settings.GITHUB_REPO_OWNER
         self.repo_name = settings.GITHUB_REPO_NAME
         self.branch = settings.GITHUB_BRANCH
         self.token = settings.REPORTS_GITHUB_TOKEN
+        self.client = github_client
+        # Write counters for this instance (commits made vs. skipped because content was unchanged)
+        self.write_stats: Dict[str, int] = {"written": 0, "skipped_unchanged": 0}
+        self._stats_lock = threading.Lock()
+    
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.write_stats[key] += 1
     
-    def _get_headers(self) -> Dict[str, str]:
-        """Get headers for GitHub API requests"""
-        return {
-            "Authorization": f"token {self.token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
+    def _sha_index(self) -> GitHubShaIndex:
+        return get_sha_index(self.repo_owner, self.repo_name, self.branch, self.token, self.github_api_url)
+    
+    def active_batch(self) -> Optional[GitCommitBatch]:
+        """The commit batch active in this context, if it writes to this repository"""
+        batch = get_active_batch()
+        if batch is not None and batch.targets(self.repo_owner, self.repo_name, self.branch):
+            return batch
+        return None
     
     def _get_file_sha(self, file_path: str) -> Optional[str]:
         """Get the SHA of an existing file in the repository"""
@@ -28,7 +45,7 @@ class GitHubSyncService:
             url = f"{self.github_api_url}/repos/{self.repo_owner}/{self.repo_name}/contents/{file_path}"
             params = {"ref": self.branch}
             
-            response = requests.get(url, headers=self._get_headers(), params=params)
+            response = self.client.get(url, params=params)
             
             if response.status_code == 200:
                 return response.json()["sha"]
@@ -59,27 +76,49 @@ class GitHubSyncService:
                 print("[GitHub Sync] MAIN_GITHUB_TOKEN not configured, skipping sync")
                 return False
             
-            # Get current file SHA if it exists
-            sha = self._get_file_sha(file_path)
+            # Inside a batch, stage the file for the batch's single commit
+            batch = self.active_batch()
+            if batch is not None:
+                batch.stage(file_path, content)
+                return True
+            
+            # Skip the write entirely when GitHub already has this exact content
+            sha_index = self._sha_index()
+            known, remote_sha = sha_index.lookup(file_path)
+            if known and remote_sha == git_blob_sha(content):
+                print(f"[GitHub Sync] {file_path} unchanged, skipping commit")
+                self._count("skipped_unchanged")
+                return True
             
             # Prepare commit payload
             content_b64 = base64.b64encode(content.encode("utf-8")).decode("utf-8")
-            
-            payload = {
-                "message": commit_message,
-                "content": content_b64,
-                "branch": self.branch
-            }
-            
-            # Add SHA if file exists (for updates)
-            if sha:
-                payload["sha"] = sha
-            
-            # Make the API request
             url = f"{self.github_api_url}/repos/{self.repo_owner}/{self.repo_name}/contents/{file_path}"
-            response = requests.put(url, headers=self._get_headers(), json=payload)
+            
+            for attempt in range(self.MAX_CONFLICT_RETRIES + 1):
+                # Get current file SHA if it exists, from the index when possible
+                sha = sha_index.get_sha(file_path, self._get_file_sha)
+                
+                payload = {
+                    "message": commit_message,
+                    "content": content_b64,
+                    "branch": self.branch
+                }
+                
+                # Add SHA if file exists (for updates)
+                if sha:
+                    payload["sha"] = sha
+                
+                # Make the API request
+                response = self.client.put(url, json=payload)
+                if response.status_code not in (409, 422):
+                    break
+                # Stale SHA: forget it and look it up again
+                sha_index.invalidate(file_path)
+                print(f"[GitHub Sync] Conflict committing {file_path}, retrying ({attempt + 1}/{self.MAX_CONFLICT_RETRIES})")
             
             if response.status_code in [200, 201]:
+                sha_index.set(file_path, response.json().get("content", {}).get("sha"))
+                self._count("written")
                 print(f"[GitHub Sync] Successfully committed {file_path} to GitHub")
                 return True
             else:
@@ -90,6 +129,73 @@ class GitHubSyncService:
             print(f"[GitHub Sync] Exception committing file: {e}")
             return False
     
+    def delete_file(self, file_path: str, commit_message: str) -> bool:
+        """
+        Delete a file from the GitHub repository (staged in the active batch if there is one)
+        
+        Returns:
+            bool: True if the file is gone (or already was), False otherwise
+        """
+        try:
+            if not self.token:
+                print("[GitHub Sync] MAIN_GITHUB_TOKEN not configured, skipping sync")
+                return False
+            
+            batch = self.active_batch()
+            if batch is not None:
+                batch.stage_delete(file_path)
+                return True
+            
+            sha_index = self._sha_index()
+            sha = sha_index.get_sha(file_path, self._get_file_sha)
+            if not sha:
+                return True
+            
+            url = f"{self.github_api_url}/repos/{self.repo_owner}/{self.repo_name}/contents/{file_path}"
+            payload = {"message": commit_message, "sha": sha, "branch": self.branch}
+            response = self.client.request("DELETE", url, json=payload)
+            
+            if response.status_code in (200, 404):
+                sha_index.set(file_path, None)
+                print(f"[GitHub Sync] Deleted {file_path} from GitHub")
+                return True
+            sha_index.invalidate(file_path)
+            print(f"[GitHub Sync] Error deleting file: {response.status_code} - {response.text}")
+            return False
+            
+        except Exception as e:
+            print(f"[GitHub Sync] Exception deleting file: {e}")
+            return False
+    
+    @contextmanager
+    def batch(self, message: str) -> Iterator[Optional[GitCommitBatch]]:
+        """
+        Stage every commit_file/delete_file inside the block and write them as one
+        commit on exit. Joins the active batch if it already targets this repository.
+        """
+        active = get_active_batch()
+        if active is not None or not settings.GITHUB_BATCH_COMMITS or not self.token:
+            yield active
+            return
+        
+        batch = GitCommitBatch(message, self.repo_owner, self.repo_name, self.branch,
+                               self.token, self.github_api_url)
+        token = set_active_batch(batch)
+        try:
+            yield batch
+        except BaseException:
+            reset_active_batch(token)
+            # Commit what was staged even if the block failed part-way, matching the
+            # per-file behaviour where earlier uploads stuck; a commit error is only
+            # logged so the block's own exception is the one raised
+            try:
+                batch.finish()
+            except Exception as commit_error:
+                print(f"[GitHub Sync] Commit after a failed batch block also failed: {commit_error}")
+            raise
+        reset_active_batch(token)
+        batch.finish()
+    
     def sync_users_json(self, users_data: list) -> bool:
         """
         Sync users.json to GitHub repository
@@ -102,7 +208,7 @@ class GitHubSyncService:
         """
         try:
             # Convert users data to JSON string
-            content = json.dumps(users_data, indent=2, ensure_ascii=False)
+            content = self._serialize_users(users_data)
             
             # Create commit message with timestamp
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S UTC")
@@ -115,23 +221,58 @@ class GitHubSyncService:
             print(f"[GitHub Sync] Exception syncing users.json: {e}")
             return False
     
+    def stage_users_json(self, batch: GitCommitBatch, users_provider: Callable[[], List[Dict[str, Any]]]) -> None:
+        """
+        Stage users.json in a commit batch. The content is rendered from
+        users_provider when the batch commits, so concurrent batches always
+        write the latest user list rather than the one seen at staging time.
+        """
+        batch.stage("users.json", lambda: self._serialize_users(users_provider()))
+    
+    def _serialize_users(self, users_data: list) -> str:
+        return json.dumps(users_data, indent=2, ensure_ascii=False)
+    
     def get_file_content(self, file_path: str) -> Optional[str]:
         """Get file content from GitHub repository"""
+        file = self.get_file(file_path)
+        return file.text if file is not None else None
+    
+    def get_file(self, file_path: str) -> Optional[FileContent]:
+        """Get a file (content, SHA and ETag) from GitHub, revalidating the cached copy"""
+        status, file = self.fetch_file(file_path)
+        if file is None and status:
+            print(f"[GitHub Sync] Error getting file: {status}")
+        return file
+    
+    def fetch_file(self, file_path: str) -> Tuple[int, Optional[FileContent]]:
+        """Like get_file, but also returns the HTTP status (0 if the request failed)"""
         try:
             url = f"{self.github_api_url}/repos/{self.repo_owner}/{self.repo_name}/contents/{file_path}"
             params = {"ref": self.branch}
-            
-            response = requests.get(url, headers=self._get_headers(), params=params)
-            
-            if response.status_code == 200:
-                content_b64 = response.json()["content"]
-                return base64.b64decode(content_b64).decode("utf-8")
-            else:
-                print(f"[GitHub Sync] Error getting file: {response.status_code}")
-                return None
-                
+            return self.client.get_file(url, params=params)
         except Exception as e:
             print(f"[GitHub Sync] Exception getting file: {e}")
+            return 0, None
+    
+    def list_tree(self, directory: str) -> Optional[Dict[str, str]]:
+        """
+        {path: blob SHA} of every file under directory, from one recursive tree
+        request. Returns {} if the directory does not exist, None if the listing failed.
+        """
+        try:
+            url = f"{self.github_api_url}/repos/{self.repo_owner}/{self.repo_name}/git/trees/{self.branch}:{directory}"
+            response = self.client.get(url, params={"recursive": "1"})
+            if response.status_code == 404:
+                return {}
+            if response.status_code != 200:
+                print(f"[GitHub Sync] Error listing {directory}: {response.status_code}")
+                return None
+            return {
+                f"{directory}/{entry['path']}": entry["sha"]
+                for entry in response.json().get("tree", []) if entry.get("type") == "blob"
+            }
+        except Exception as e:
+            print(f"[GitHub Sync] Exception listing {directory}: {e}")
             return None
     
     def is_configured(self) -> bool:
@@ -0,0 +1,138 @@
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional
+import json
+import time
+import requests
+from config import settings
+
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+
+def as_response(body: Any) -> Any:
+    """Turn a chat completion body from a batch output file into an object shaped like the SDK's response"""
+    if isinstance(body, dict):
+        return SimpleNamespace(**{key: as_response(value) for key, value in body.items()})
+    if isinstance(body, list):
+        return [as_response(item) for item in body]
+    return body
+
+class OpenAIBatchClient:
+    """
+    Minimal OpenAI Batch API client: upload a JSONL of chat completion requests,
+    create a batch, poll it and read the output file. base_url can point at a
+    local fake server (see utils/fake_openai_batch.py) to exercise the flow
+    without OpenAI.
+    """
+
+    TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+    def __init__(self, api_key: str, base_url: str, poll_seconds: float, timeout_seconds: float,
+                 completion_window: str = "24h"):
+        self.base_url = base_url.rstrip("/")
+        self.poll_seconds = poll_seconds
+        self.timeout_seconds = timeout_seconds
+        self.completion_window = completion_window
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {api_key}"})
+
+    def _url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+    def upload(self, requests_by_id: Dict[str, Dict[str, Any]]) -> str:
+        """Upload the requests as a batch input file; returns the file id"""
+        lines = [
+            json.dumps({"custom_id": custom_id, "method": "POST", "url": CHAT_COMPLETIONS_URL, "body": body},
+                       ensure_ascii=False)
+            for custom_id, body in requests_by_id.items()
+        ]
+        payload = ("\n".join(lines) + "\n").encode("utf-8")
+        response = self.session.post(
+            self._url("/files"),
+            data={"purpose": "batch"},
+            files={"file": ("batch_input.jsonl", payload, "application/jsonl")},
+            timeout=120
+        )
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def create(self, input_file_id: str, metadata: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        body: Dict[str, Any] = {
+            "input_file_id": input_file_id,
+            "endpoint": CHAT_COMPLETIONS_URL,
+            "completion_window": self.completion_window
+        }
+        if metadata:
+            body["metadata"] = metadata
+        response = self.session.post(self._url("/batches"), json=body, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def get(self, batch_id: str) -> Dict[str, Any]:
+        response = self.session.get(self._url(f"/batches/{batch_id}"), timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def cancel(self, batch_id: str) -> None:
+        try:
+            self.session.post(self._url(f"/batches/{batch_id}/cancel"), timeout=30)
+        except requests.RequestException as e:
+            print(f"[OpenAI Batch] Failed to cancel batch {batch_id}: {e}")
+
+    def file_content(self, file_id: str) -> str:
+        response = self.session.get(self._url(f"/files/{file_id}/content"), timeout=300)
+        response.raise_for_status()
+        return response.text
+
+    def wait(self, batch_id: str, on_status: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Poll until the batch reaches a terminal status; cancels it and raises on timeout"""
+        deadline = time.monotonic() + self.timeout_seconds
+        while True:
+            batch = self.get(batch_id)
+            if on_status:
+                on_status(batch)
+            if batch.get("status") in self.TERMINAL_STATUSES:
+                return batch
+            if time.monotonic() >= deadline:
+                self.cancel(batch_id)
+                raise TimeoutError(f"OpenAI batch {batch_id} still {batch.get('status')} after {self.timeout_seconds}s")
+            time.sleep(self.poll_seconds)
+
+    def run(self, requests_by_id: Dict[str, Dict[str, Any]], description: str = "",
+            on_status: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Submit chat completion request bodies keyed by custom_id and wait for them.
+
+        Returns:
+            {custom_id: response} for every request that succeeded, with responses
+            shaped like SDK objects (see as_response). Failed requests are left out.
+        """
+        if not requests_by_id:
+            return {}
+        file_id = self.upload(requests_by_id)
+        batch = self.create(file_id, {"description": description} if description else None)
+        print(f"[OpenAI Batch] Submitted batch {batch['id']} with {len(requests_by_id)} request(s)")
+        batch = self.wait(batch["id"], on_status)
+        if batch.get("status") != "completed":
+            raise Exception(f"OpenAI batch {batch['id']} ended as {batch.get('status')}: {batch.get('errors')}")
+
+        results: Dict[str, Any] = {}
+        if batch.get("output_file_id"):
+            for line in self.file_content(batch["output_file_id"]).splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if response.get("status_code") == 200 and response.get("body"):
+                    results[record["custom_id"]] = as_response(response["body"])
+        # Requests that errored are in error_file_id; callers fall back to realtime for them
+        failed = len(requests_by_id) - len(results)
+        print(f"[OpenAI Batch] Batch {batch['id']} completed: {len(results)} succeeded, {failed} failed")
+        return results
+
+def create_batch_client() -> OpenAIBatchClient:
+    return OpenAIBatchClient(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BATCH_BASE_URL,
+        poll_seconds=settings.OPENAI_BATCH_POLL_SECONDS,
+        timeout_seconds=settings.OPENAI_BATCH_TIMEOUT_SECONDS,
+        completion_window=settings.OPENAI_BATCH_COMPLETION_WINDOW
+    )
@@ -0,0 +1,227 @@
+"""
+Chat messages for every AIService completion.
+
+The large, unchanging AI_PROMPTS instruction blocks are assembled once at
+import and sent as the system message; only the per-request parts (topic,
+user context, learning plan, report text) go in the user message. Identical
+leading tokens across requests are what OpenAI's prompt cache matches on, so
+this layout lets every report request reuse the cached instruction prefix.
+"""
+import re
+import threading
+from typing import Any, Dict, List, Optional
+from config import settings
+from config.constants import AI_PROMPTS
+
+# Instruction strings plus the SYSTEM_MESSAGES dict; typed loosely so both index cleanly
+_PROMPTS: Dict[str, Any] = AI_PROMPTS
+
+_QUIZ = f"""{_PROMPTS['QUIZ_GENERATION']}
+{_PROMPTS['QUIZ_CONTENT_GUIDELINES']}
+{_PROMPTS['QUIZ_INTEGRATION']}"""
+
+_EXAMPLE_FORMAT = """Example format:
+## Introduction:
+This is the introduction paragraph...
+
+## Key Concepts:
+### Basic Definition:
+**Term:** Definition here...
+
+- Point 1
+- Point 2
+
+## Real-World Applications:
+Examples of how this is used...
+
+## Advanced Applications and Research Frontiers:
+Cutting-edge developments and future implications...
+
+## Think About This:
+[Thought-provoking questions for key concepts]"""
+
+def _without_quiz(instructions: str) -> str:
+    """Report instructions minus the lines asking for a markdown quiz (QUIZ_MODE "structured")"""
+    return re.sub(r"^.*\(see QUIZ_GENERATION instructions\)\n?", "", instructions, flags=re.MULTILINE)
+
+def _report_instructions(quiz: bool) -> str:
+    instructions = "\n\n".join([
+        _PROMPTS['CONTENT_EXPANSION'],
+        _PROMPTS['REPORT_STRUCTURE'],
+        _PROMPTS['ADVANCED_CONTENT'],
+        _PROMPTS['CONTENT_GUIDELINES'],
+        _PROMPTS['ENHANCED_CONCEPTS'],
+        _PROMPTS['ANALOGIES_METAPHORS'],
+        _PROMPTS['CONCEPT_CONNECTIONS'],
+        _PROMPTS['INTERACTIVE_ELEMENTS'],
+        *([_QUIZ] if quiz else []),
+        _PROMPTS['FORMATTING_INSTRUCTIONS'],
+        _EXAMPLE_FORMAT,
+        _PROMPTS['TONE_STYLE'],
+        _PROMPTS['LINK_FORMATTING'],
+        _PROMPTS['MATH_FORMATTING']
+    ])
+    return instructions if quiz else _without_quiz(instructions)
+
+def _context_report_instructions(quiz: bool) -> str:
+    instructions = "\n\n".join([
+        _PROMPTS['CONTENT_EXPANSION'],
+        _PROMPTS['CONTEXT_HANDLING'],
+        _PROMPTS['LEARNING_JOURNEY_INTEGRATION'],
+        _PROMPTS['REPORT_STRUCTURE'].replace('introduction to the topic', 'introduction that connects to previous learning'),
+        _PROMPTS['ADVANCED_CONTENT'],
+        _PROMPTS['CONTENT_GUIDELINES'],
+        _PROMPTS['ENHANCED_CONCEPTS'],
+        _PROMPTS['ANALOGIES_METAPHORS'],
+        _PROMPTS['CONCEPT_CONNECTIONS'],
+        _PROMPTS['INTERACTIVE_ELEMENTS'],
+        *([_QUIZ] if quiz else []),
+        _PROMPTS['FORMATTING_INSTRUCTIONS'],
+        _PROMPTS['CONTEXT_TONE_STYLE'],
+        _PROMPTS['LINK_FORMATTING'],
+        _PROMPTS['MATH_FORMATTING']
+    ])
+    return instructions if quiz else _without_quiz(instructions)
+
+_SUMMARY_INSTRUCTIONS = "\n\n".join([
+    _PROMPTS['SUMMARY_TASK'],
+    _PROMPTS['SUMMARY_FOCUS'],
+    _PROMPTS['SUMMARY_TONE']
+])
+
+_INITIAL_SUMMARY_INSTRUCTIONS = "\n\n".join([
+    _PROMPTS['INITIAL_SUMMARY_TASK'],
+    _PROMPTS['INITIAL_SUMMARY_REQUIREMENTS'],
+    _PROMPTS['INITIAL_SUMMARY_TONE']
+])
+
+def _system_prefixes(quiz: bool) -> Dict[str, str]:
+    """
+    Static system prefixes, one per request kind. The single-call prefix extends
+    the context-aware one, so both share the report instructions in the cache.
+    """
+    prefixes = {
+        "report": f"{_PROMPTS['SYSTEM_MESSAGES']['REPORT_GENERATOR']}\n\n{_report_instructions(quiz)}",
+        "context_report": f"{_PROMPTS['SYSTEM_MESSAGES']['CONTEXT_AWARE_GENERATOR']}\n\n{_context_report_instructions(quiz)}",
+        "summary": f"{_PROMPTS['SYSTEM_MESSAGES']['SUMMARY_GENERATOR']}\n\n{_SUMMARY_INSTRUCTIONS}",
+        "initial_summary": f"{_PROMPTS['SYSTEM_MESSAGES']['INITIAL_SUMMARY_GENERATOR']}\n\n{_INITIAL_SUMMARY_INSTRUCTIONS}",
+        "quiz": "\n\n".join([
+            _PROMPTS['SYSTEM_MESSAGES']['QUIZ_GENERATOR'],
+            _PROMPTS['STRUCTURED_QUIZ'],
+            _PROMPTS['QUIZ_CONTENT_GUIDELINES']
+        ])
+    }
+    prefixes["report_with_summary"] = "\n\n".join([
+        prefixes["context_report"],
+        _PROMPTS['REPORT_WITH_SUMMARY_OUTPUT'],
+        _SUMMARY_INSTRUCTIONS
+    ])
+    return prefixes
+
+# Report prompts ask for the markdown quiz unless QUIZ_MODE is "structured",
+# where the quiz comes from its own JSON schema completion (quiz_messages)
+SYSTEM_PREFIXES: Dict[str, str] = _system_prefixes(quiz=True)
+SYSTEM_PREFIXES_STRUCTURED_QUIZ: Dict[str, str] = _system_prefixes(quiz=False)
+
+def _plan_list(learning_plan: list) -> str:
+    return "\n".join(f"- {topic}" for topic in learning_plan)
+
+def _messages(kind: str, user_content: str) -> List[Dict[str, str]]:
+    prefixes = SYSTEM_PREFIXES_STRUCTURED_QUIZ if settings.QUIZ_MODE == "structured" else SYSTEM_PREFIXES
+    return [
+        {"role": "system", "content": prefixes[kind]},
+        {"role": "user", "content": user_content}
+    ]
+
+def report_messages(topic: str) -> List[Dict[str, str]]:
+    return _messages("report", f'Write a comprehensive educational report on the topic: "{topic}".')
+
+def _context_report_content(topic: str, context: str, learning_plan: list) -> str:
+    return f"""Write a comprehensive, beginner-friendly educational report on the topic: "{topic}".
+
+IMPORTANT CONTEXT - Previous Learning Summary:
+{context}
+
+Learning Plan Structure:
+{_plan_list(learning_plan)}"""
+
+def context_report_messages(topic: str, context: str, learning_plan: list) -> List[Dict[str, str]]:
+    return _messages("context_report", _context_report_content(topic, context, learning_plan))
+
+def report_with_summary_messages(topic: str, context: str, learning_plan: list) -> List[Dict[str, str]]:
+    """Context-aware report plus the updated summary, returned as one JSON object"""
+    return _messages("report_with_summary", _context_report_content(topic, context, learning_plan))
+
+def summary_messages(existing_summary: str, new_report_content: str,
+                     new_topic: str, learning_plan: list) -> List[Dict[str, str]]:
+    return _messages("summary", f"""Create a concise, coherent summary that combines the existing learning context with new content.
+
+EXISTING LEARNING SUMMARY:
+{existing_summary if existing_summary else "No previous learning context available."}
+
+NEW REPORT CONTENT (Topic: {new_topic}):
+{new_report_content}
+
+COMPLETE LEARNING PLAN:
+{_plan_list(learning_plan)}""")
+
+def initial_summary_messages(main_topic: str, learning_plan: list,
+                             first_report_content: str, first_topic: str) -> List[Dict[str, str]]:
+    return _messages("initial_summary", f"""Create an initial learning context summary for a new user starting their learning journey.
+
+MAIN TOPIC: {main_topic}
+FIRST TOPIC COVERED: {first_topic}
+COMPLETE LEARNING PLAN:
+{_plan_list(learning_plan)}
+
+FIRST REPORT CONTENT:
+{first_report_content}""")
+
+def quiz_messages(topic: str, report_content: str) -> List[Dict[str, str]]:
+    """Quiz for a finished report, answered as JSON matching services/quiz_models.Quiz"""
+    return _messages("quiz", f"""Create the quiz for this report on the topic: "{topic}".
+
+REPORT:
+{report_content}""")
+
+def cached_tokens(usage: Any) -> int:
+    """usage.prompt_tokens_details.cached_tokens, whether the SDK parsed it as an object or left a dict"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    if details is None and isinstance(usage, dict):
+        details = usage.get("prompt_tokens_details")
+    if details is None:
+        return 0
+    value = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+    return value or 0
+
+class PromptCacheStats:
+    """Prompt and cached-prompt token totals per request kind, to verify the prefix cache hit rate"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kinds: Dict[str, Dict[str, int]] = {}
+
+    def record(self, kind: str, usage: Any) -> Optional[int]:
+        """Record one response's usage; returns its cached token count (None without usage)"""
+        if usage is None:
+            return None
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        if prompt_tokens is None and isinstance(usage, dict):
+            prompt_tokens = usage.get("prompt_tokens")
+        cached = cached_tokens(usage)
+        with self._lock:
+            stats = self._kinds.setdefault(kind, {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0})
+            stats["requests"] += 1
+            stats["prompt_tokens"] += prompt_tokens or 0
+            stats["cached_tokens"] += cached
+        return cached
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                kind: dict(stats, cached_ratio=round(stats["cached_tokens"] / stats["prompt_tokens"], 3) if stats["prompt_tokens"] else 0.0)
+                for kind, stats in self._kinds.items()
+            }
+
+# Global instance shared by AIService and AsyncAIService
+prompt_cache_stats = PromptCacheStats()
@@ -0,0 +1,51 @@
+"""
+Quiz payload of a report (QUIZ_MODE "structured").
+
+The same models give the JSON schema sent as the quiz completion's
+response_format and validate its answer. Quiz.model_dump() has the shape
+generate_topic_report_html(quiz=...) renders.
+"""
+from typing import Any, Dict, List, Literal
+from pydantic import BaseModel, ConfigDict, field_validator, model_validator
+
+OptionId = Literal["A", "B", "C", "D"]
+
+class QuizOption(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    id: OptionId
+    text: str
+    explanation: str
+
+class QuizQuestion(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    question: str
+    options: List[QuizOption]
+    correct_answer: OptionId
+
+    @field_validator("options")
+    @classmethod
+    def one_option_per_letter(cls, options: List[QuizOption]) -> List[QuizOption]:
+        if sorted(option.id for option in options) != ["A", "B", "C", "D"]:
+            raise ValueError("expected exactly one option for each of A, B, C and D")
+        return sorted(options, key=lambda option: option.id)
+
+class Quiz(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    questions: List[QuizQuestion]
+    why_it_matters: str
+
+    @model_validator(mode="after")
+    def has_questions(self) -> "Quiz":
+        if not self.questions:
+            raise ValueError("quiz has no questions")
+        return self
+
+def quiz_response_format() -> Dict[str, Any]:
+    """response_format asking the model for a Quiz (strict JSON schema)"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "report_quiz", "strict": True, "schema": Quiz.model_json_schema()}
+    }
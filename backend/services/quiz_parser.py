@@ -0,0 +1,128 @@
+"""
+Single-pass parser for the markdown quiz section of a report (QUIZ_MODE "markdown").
+
+The "## Interactive Quiz: Test Your Understanding" heading is located once;
+the lines after it are walked once by a small state machine that collects each
+question's text, options A-D, explanations and correct answer, plus "Why This
+Matters". The content before the heading is returned from the same pass, so
+the report does not have to be scanned again to strip the quiz.
+
+Output matches what generate_topic_report_html(quiz=...) renders. As before,
+questions missing any part (text, answer, 4 options, 4 explanations) are left
+out, and a quiz without complete questions is None.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_HEADING = re.compile(r"##\s*Interactive Quiz:\s*Test Your Understanding", re.IGNORECASE)
+# Bold markers that may appear anywhere on a line; the value follows on the same or the next line
+_MARKER = re.compile(
+    r"\*\*(?:Question\s+(?P<question>\d+)|(?P<answer>Correct Answer)|(?P<why>Why This Matters)):\*\*"
+    r"|-\s*\*\*Option\s+(?P<explanation>[A-D]):\*\*",
+    re.IGNORECASE
+)
+_OPTION = re.compile(r"(?P<id>[A-D])\)\s+(?P<text>.+)$", re.IGNORECASE)
+_ANSWER = re.compile(r"([A-D])\b", re.IGNORECASE)
+_OPTION_IDS = ("A", "B", "C", "D")
+
+def _complete(question: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    options = question["options"]
+    explanations = question["explanations"]
+    if not question["text"] or not question["answer"] or len(options) != 4 or len(explanations) != 4:
+        return None
+    return {
+        "question": question["text"],
+        "options": [{"id": key, "text": options[key], "explanation": explanations[key]} for key in _OPTION_IDS],
+        "correct_answer": question["answer"]
+    }
+
+def _find_heading(content: str) -> Optional["re.Match[str]"]:
+    heading = _HEADING.search(content)
+    # A heading with nothing after it is not a quiz section
+    return heading if heading is not None and heading.end() < len(content) else None
+
+def _before(content: str, start: int) -> str:
+    """Content up to the quiz heading, without the newline that precedes it"""
+    return content[:start - 1] if start and content[start - 1] == "\n" else content[:start]
+
+def split_quiz(content: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """(quiz or None, content with the quiz section removed) in one pass over the quiz lines"""
+    heading = _find_heading(content)
+    if heading is None:
+        return None, content
+
+    questions: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+    why_it_matters = ""
+    # Field waiting for its value on the next non-empty line: "text", "answer", "why" or an option id
+    pending: Optional[str] = None
+
+    def set_value(field: str, value: str) -> bool:
+        """Store value for field (first occurrence wins); False if it is not a valid value"""
+        nonlocal why_it_matters
+        if field == "why":
+            if not why_it_matters:
+                why_it_matters = value
+            return True
+        if current is None:
+            return True
+        if field == "text":
+            current["text"] = current["text"] or value
+        elif field == "answer":
+            match = _ANSWER.match(value)
+            if not match:
+                return False
+            current["answer"] = current["answer"] or match.group(1).upper()
+        else:
+            current["explanations"].setdefault(field, value)
+        return True
+
+    for raw_line in content[heading.end():].splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        if pending is not None:
+            field, pending = pending, None
+            if set_value(field, line):
+                continue
+
+        marker = _MARKER.search(line)
+        if marker is None:
+            option = _OPTION.match(raw_line)
+            if option and current is not None:
+                current["options"].setdefault(option.group("id").upper(), option.group("text").strip())
+            continue
+
+        value = line[marker.end():].strip()
+        if marker.group("question"):
+            if current is not None:
+                questions.append(current)
+            current = {"text": None, "answer": None, "options": {}, "explanations": {}}
+            field = "text"
+        elif marker.group("why"):
+            # Ends the current question, as in the quiz format
+            if current is not None:
+                questions.append(current)
+                current = None
+            field = "why"
+        elif marker.group("answer"):
+            field = "answer"
+        else:
+            field = marker.group("explanation").upper()
+
+        if value:
+            set_value(field, value)
+        else:
+            pending = field
+
+    if current is not None:
+        questions.append(current)
+    complete = [question for question in map(_complete, questions) if question]
+    if not complete:
+        return None, content
+    return {"questions": complete, "why_it_matters": why_it_matters}, _before(content, heading.start())
+
+def strip_quiz(content: str) -> str:
+    """content without its quiz section (heading lookup only, nothing parsed)"""
+    heading = _find_heading(content)
+    return _before(content, heading.start()) if heading is not None else content
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import threading
+import time
+from config import settings
+
+class ReportContentCache:
+    """
+    Bounded LRU of generated report markdown, shared across users.
+
+    Only context-free reports are cached: their prompt depends on nothing but
+    the topic, so the key is a hash of the full request (model, temperature,
+    messages). With variants > 1 each prompt gets that many independent
+    generations and a user is pinned to one of them by email.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, variants: int = 1):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.variants = max(1, variants)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def key_for(self, request: Dict[str, Any], user: Optional[str] = None) -> str:
+        """Cache key for a chat completion request, plus the user's variant slot"""
+        variant = 0
+        if self.variants > 1 and user:
+            variant = int(hashlib.sha256(user.lower().encode("utf-8")).hexdigest(), 16) % self.variants
+        material = json.dumps(
+            [request["model"], request["temperature"], request["messages"], variant],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key: str, content: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), content)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, size=len(self._entries))
+
+# Global instance shared by AIService and AsyncAIService
+report_cache = ReportContentCache(
+    max_size=settings.REPORT_CACHE_SIZE if settings.REPORT_CACHE_ENABLED else 0,
+    ttl_seconds=settings.REPORT_CACHE_TTL_SECONDS,
+    variants=settings.REPORT_CACHE_VARIANTS
+)
@@ -0,0 +1,242 @@
+"""
+Lexical retrieval over a user's past reports (CONTEXT_MODE "retrieval").
+
+Each report is split into passages and added to a per user/topic BM25 index
+as it is saved. The next report's prompt then gets the top-k passages for its
+topic instead of a model-written summary. Scoring is vectorized with NumPy,
+a CPU operation of a few milliseconds for a 30-report plan.
+
+Indexes are kept in memory and persisted as report_index.json next to the
+user's context_summary.json, written in the same commit as each report. After
+a restart an index is restored from that one file; only reports it does not
+cover yet are loaded, concurrently, from the *_response.json files.
+"""
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from config import settings
+
+_QUIZ_SECTION = re.compile(r"\n?##\s*Interactive Quiz[\s\S]*$", re.IGNORECASE)
+_HEADING = re.compile(r"^#{1,6}\s+(.+?)\s*$")
+_WORD = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can for from has have how in into is it its of on or that the their this "
+    "to was we what when which while with you your".split()
+)
+
+# BM25 parameters (standard defaults)
+_K1 = 1.5
+_B = 0.75
+
+def _fold_plural(word: str) -> str:
+    """Crude plural folding ("gradients" -> "gradient"), enough for topic vocabulary"""
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def tokenize(text: str) -> List[str]:
+    return [_fold_plural(word) for word in _WORD.findall(text.casefold()) if len(word) > 1 and word not in _STOPWORDS]
+
+def split_passages(report_md: str, max_words: Optional[int] = None) -> List[str]:
+    """Passages of about max_words words, split on paragraphs and prefixed with their section heading"""
+    max_words = settings.RETRIEVAL_PASSAGE_WORDS if max_words is None else max_words
+    body = _QUIZ_SECTION.sub("", report_md or "")
+    passages: List[str] = []
+    heading = ""
+    current: List[str] = []
+    words = 0
+
+    def flush():
+        nonlocal current, words
+        if current:
+            text = " ".join(current)
+            passages.append(f"{heading}: {text}" if heading else text)
+        current, words = [], 0
+
+    for paragraph in re.split(r"\n\s*\n", body):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        lines = paragraph.splitlines()
+        # Leading heading lines start a new section; the innermost one labels its passages
+        while lines and (match := _HEADING.match(lines[0])):
+            flush()
+            heading = match.group(1).strip("#*: ")
+            lines = lines[1:]
+        paragraph = "\n".join(lines).strip()
+        if not paragraph:
+            continue
+        paragraph_words = len(paragraph.split())
+        if words and words + paragraph_words > max_words:
+            flush()
+        current.append(" ".join(paragraph.split()))
+        words += paragraph_words
+    flush()
+    return passages
+
+class BM25Index:
+    """Append-only BM25 index over (topic, passage) pairs"""
+
+    def __init__(self):
+        self.passages: List[Tuple[str, str]] = []
+        self.doc_lengths: List[int] = []
+        # term -> (passage ids, term frequencies)
+        self.postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self.topics: set = set()
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BM25Index":
+        """Index rebuilt from to_dict() output, without re-splitting the reports"""
+        index = cls()
+        by_topic: Dict[str, List[str]] = {}
+        for topic, passage in data.get("passages", []):
+            by_topic.setdefault(topic, []).append(passage)
+        for topic in data.get("topics", []):
+            index.add_passages(topic, by_topic.get(topic, []))
+        return index
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Indexed topics and passages, the stored form of report_index.json"""
+        return {"topics": sorted(self.topics), "passages": [list(entry) for entry in self.passages]}
+
+    def add_report(self, topic: str, report_md: str) -> int:
+        """Index a report's passages; a topic already indexed is skipped. Returns passages added."""
+        return self.add_passages(topic, split_passages(report_md))
+
+    def add_passages(self, topic: str, passages: Iterable[str]) -> int:
+        if topic in self.topics:
+            return 0
+        self.topics.add(topic)
+        added = 0
+        for passage in passages:
+            terms = Counter(tokenize(passage))
+            if not terms:
+                continue
+            doc_id = len(self.passages)
+            self.passages.append((topic, passage))
+            length = sum(terms.values())
+            self.doc_lengths.append(length)
+            self._total_length += length
+            for term, frequency in terms.items():
+                ids, frequencies = self.postings.setdefault(term, ([], []))
+                ids.append(doc_id)
+                frequencies.append(frequency)
+            added += 1
+        return added
+
+    def search(self, query: str, k: int) -> List[Tuple[float, str, str]]:
+        """Top-k (score, topic, passage), best first"""
+        count = len(self.passages)
+        if not count or k <= 0:
+            return []
+        average_length = self._total_length / count
+        query_terms = [term for term in set(tokenize(query)) if term in self.postings]
+        if not query_terms:
+            return []
+
+        scores = np.zeros(count)
+        lengths = np.asarray(self.doc_lengths, dtype=float)
+        norms = _K1 * (1 - _B + _B * lengths / average_length)
+        for term in query_terms:
+            ids, frequencies = self.postings[term]
+            ids_array = np.asarray(ids)
+            tf = np.asarray(frequencies, dtype=float)
+            scores[ids_array] += self._idf(len(ids), count) * tf * (_K1 + 1) / (tf + norms[ids_array])
+        top = np.argsort(-scores)[:k]
+        ranked = [(float(scores[i]), int(i)) for i in top if scores[i] > 0]
+        return [(score, *self.passages[doc_id]) for score, doc_id in ranked]
+
+    @staticmethod
+    def _idf(document_frequency: int, count: int) -> float:
+        return math.log(1 + (count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+class ReportIndexStore:
+    """In-memory BM25 indexes per (email, main topic), least recently used evicted first"""
+
+    def __init__(self, max_indexes: Optional[int] = None):
+        self.max_indexes = settings.RETRIEVAL_INDEX_CACHE_SIZE if max_indexes is None else max_indexes
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[Tuple[str, str], BM25Index]" = OrderedDict()
+        self.stats: Dict[str, int] = {"builds": 0, "restored": 0, "reports_loaded": 0, "reports_added": 0, "searches": 0}
+
+    def _key(self, email: str, main_topic: str) -> Tuple[str, str]:
+        return (email.lower(), main_topic)
+
+    def get(self, email: str, main_topic: str, topics: Iterable[str],
+            load_report: Callable[[str], Optional[str]],
+            load_saved: Optional[Callable[[], Optional[Dict[str, Any]]]] = None) -> BM25Index:
+        """
+        Index for a user/topic covering every topic in topics. One not in memory is
+        restored from load_saved() (the stored to_dict() output) if given; topics it
+        still lacks are loaded concurrently with load_report(topic).
+        """
+        key = self._key(email, main_topic)
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is not None:
+                self._indexes.move_to_end(key)
+        built = cached is None
+        if cached is not None:
+            index = cached
+        else:
+            # GitHub reads happen outside the lock
+            saved = load_saved() if load_saved is not None else None
+            index = BM25Index.from_dict(saved) if saved else BM25Index()
+            with self._lock:
+                # Another caller may have built it meanwhile
+                if key in self._indexes:
+                    index, built = self._indexes[key], False
+                else:
+                    self._indexes[key] = index
+                    self.stats["restored" if saved else "builds"] += 1
+                    while len(self._indexes) > self.max_indexes:
+                        self._indexes.popitem(last=False)
+                self._indexes.move_to_end(key)
+        with self._lock:
+            missing = [topic for topic in topics if topic not in index.topics]
+        if missing:
+            workers = max(1, min(len(missing), settings.GITHUB_POOL_SIZE))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report-index") as executor:
+                reports = list(zip(missing, executor.map(load_report, missing)))
+            with self._lock:
+                for topic, report_md in reports:
+                    if report_md:
+                        self.stats["reports_loaded"] += 1
+                        index.add_report(topic, report_md)
+        if built:
+            print(f"[Report Index] Loaded index for {email} on {main_topic}: {len(index)} passage(s), "
+                  f"{len(missing)} report(s) fetched")
+        return index
+
+    def add_report(self, email: str, main_topic: str, topic: str, report_md: str) -> Optional[Dict[str, Any]]:
+        """
+        Add a saved report to its user's index, if that index is in memory (otherwise
+        the next get loads it). Returns the updated index's to_dict() to persist, or None.
+        """
+        with self._lock:
+            index = self._indexes.get(self._key(email, main_topic))
+            if index is None:
+                return None
+            self.stats["reports_added"] += 1
+            index.add_report(topic, report_md)
+            return index.to_dict()
+
+    def search(self, index: BM25Index, query: str, k: Optional[int] = None) -> List[Tuple[float, str, str]]:
+        with self._lock:
+            self.stats["searches"] += 1
+            return index.search(query, settings.RETRIEVAL_TOP_K if k is None else k)
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            return dict(self.stats, indexes=len(self._indexes))
+
+# Global instance shared by the report paths
+report_index_store = ReportIndexStore()
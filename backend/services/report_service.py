@@ -1,41 +1,154 @@
+import asyncio
 import datetime
-import time
 import traceback
 import markdown  # type: ignore
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from config import settings
-from services.ai_service import AIService
+from services.ai_service import AIService, AsyncAIService
 from services.user_service import UserService
 from services.email_service import EmailService
 from services.context_service import ContextService
+from services.email_dispatcher import email_dispatcher
 from html_generation import generate_learning_plan_html, update_learning_plan_html, generate_topic_report_html
-from data import report_repository, response_repository
+from data import report_repository, response_repository, plan_cache_repository
+from data.git_batch import get_active_batch
 
 class ReportService:
     def __init__(self):
         self.ai_service = AIService()
+        self.async_ai_service = AsyncAIService()
         self.user_service = UserService()
         self.email_service = EmailService()
         self.context_service = ContextService()
+        self.email_dispatcher = email_dispatcher
     
     def generate_initial_learning_plan(self, email: str, topic: str, paid: bool = False) -> Dict[str, Any]:
         """Generate initial learning plan for new user"""
         try:
             print(f"[Report Service] Generating learning plan for topic: {topic}")
             
-            # Generate AI learning plan
-            learning_plan = self.ai_service.generate_learning_plan(topic)
-            print(f"[Report Service] Learning plan generated.")
+            cached_plan = self._cached_plan(topic)
+            if cached_plan:
+                learning_plan, topic_titles = cached_plan
+            else:
+                # Generate AI learning plan
+                learning_plan = self.ai_service.generate_learning_plan(topic)
+                print(f"[Report Service] Learning plan generated.")
+                
+                if learning_plan == "ERROR":
+                    return self._unsuitable_topic(email, topic)
+                
+                # Extract topic titles
+                topic_titles = self.ai_service.extract_topics_from_plan(learning_plan)
+                plan_cache_repository.save(topic, learning_plan, topic_titles)
             
-            if learning_plan == "ERROR":
-                print(f"[Report Service] OpenAI returned ERROR for topic: {topic}")
-                return {
-                    "success": False,
-                    "message": "Sorry, this topic is not suitable for learning or may be inappropriate. Please try a different topic.",
-                    "email": email,
-                    "topic": topic
-                }
+            # Generate first topic report and the initial context summary
+            first_topic = topic_titles[0] if topic_titles else None
+            report_content = None
+            initial_context = None
+            if first_topic:
+                print(f"[Report Service] Generating report for first topic: {first_topic}")
+                try:
+                    report_content = self.ai_service.generate_report_content(first_topic, user=email)
+                    initial_context = self.context_service.build_initial_context(
+                        topic, topic_titles, report_content, first_topic
+                    )
+                except Exception as e:
+                    print(f"[Report Service] Error generating first topic report: {e}")
             
+            return self._publish_learning_plan(
+                email, topic, paid, learning_plan, topic_titles, report_content, initial_context
+            )
+                
+        except Exception as e:
+            return self._learning_plan_error(email, topic, e)
+    
+    async def generate_initial_learning_plan_async(self, email: str, topic: str, paid: bool = False) -> Dict[str, Any]:
+        """
+        Async twin of generate_initial_learning_plan for the API handlers: completions
+        are awaited and the GitHub uploads run in a worker thread, so the event loop
+        keeps serving other users meanwhile
+        """
+        try:
+            print(f"[Report Service] Generating learning plan for topic: {topic}")
+            
+            # The plan cache is a file on disk, read and written off the event loop
+            cached_plan = await asyncio.to_thread(self._cached_plan, topic)
+            if cached_plan:
+                learning_plan, topic_titles = cached_plan
+            else:
+                learning_plan = await self.async_ai_service.generate_learning_plan(topic)
+                print(f"[Report Service] Learning plan generated.")
+                
+                if learning_plan == "ERROR":
+                    return self._unsuitable_topic(email, topic)
+                
+                topic_titles = self.async_ai_service.extract_topics_from_plan(learning_plan)
+                await asyncio.to_thread(plan_cache_repository.save, topic, learning_plan, topic_titles)
+            
+            first_topic = topic_titles[0] if topic_titles else None
+            report_content = None
+            initial_context = None
+            quiz = None
+            if first_topic:
+                print(f"[Report Service] Generating report for first topic: {first_topic}")
+                try:
+                    report_content = await self.async_ai_service.generate_report_content(first_topic, user=email)
+                    # The structured quiz and the initial context both only need the report
+                    initial_context, quiz = await asyncio.gather(
+                        self.context_service.build_initial_context_async(topic, topic_titles, report_content, first_topic),
+                        self._structured_quiz_async(first_topic, report_content)
+                    )
+                except Exception as e:
+                    print(f"[Report Service] Error generating first topic report: {e}")
+            
+            # to_thread copies the context, so the commit batch works as in the sync path
+            return await asyncio.to_thread(
+                self._publish_learning_plan,
+                email, topic, paid, learning_plan, topic_titles, report_content, initial_context, quiz
+            )
+        
+        except Exception as e:
+            return self._learning_plan_error(email, topic, e)
+    
+    def _cached_plan(self, topic: str) -> Optional[Tuple[str, List[str]]]:
+        """(raw plan, topic titles) from the plan cache, if this topic was planned before"""
+        try:
+            cached = plan_cache_repository.find(topic)
+        except Exception as e:
+            print(f"[Report Service] Warning: Plan cache lookup failed: {e}")
+            return None
+        if not cached:
+            return None
+        print(f"[Report Service] Using cached learning plan for topic: {topic}")
+        return cached["raw_plan"], cached["topics"]
+    
+    def _unsuitable_topic(self, email: str, topic: str) -> Dict[str, Any]:
+        print(f"[Report Service] OpenAI returned ERROR for topic: {topic}")
+        return {
+            "success": False,
+            "message": "Sorry, this topic is not suitable for learning or may be inappropriate. Please try a different topic.",
+            "email": email,
+            "topic": topic
+        }
+    
+    def _learning_plan_error(self, email: str, topic: str, e: Exception) -> Dict[str, Any]:
+        print(f"[Report Service] Error generating initial learning plan: {e}")
+        traceback.print_exc()
+        return {
+            "success": False,
+            "message": f"Error generating learning plan: {str(e)}",
+            "email": email,
+            "topic": topic
+        }
+    
+    def _publish_learning_plan(self, email: str, topic: str, paid: bool, learning_plan: str,
+                               topic_titles: List[str], report_content: Optional[str],
+                               initial_context: Optional[Tuple[Dict[str, Any], int]],
+                               quiz: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Store and upload everything generated for a new user, then add the user entry"""
+        # Stage every file for this user and write them as a single commit
+        with report_repository.batch(f"Add learning plan for {email} - {topic}"):
             # Save learning plan response for future context
             try:
                 response_repository.save_response(
@@ -46,49 +159,30 @@ class ReportService:
                 )
             except Exception as e:
                 print(f"[Report Service] Warning: Failed to save learning plan response: {e}")
-            
-            # Extract topic titles
-            topic_titles = self.ai_service.extract_topics_from_plan(learning_plan)
-            
+        
             # Generate initial learning plan HTML
             html_content = generate_learning_plan_html(
                 topic=topic,
                 user_email=email,
                 topics=topic_titles
             )
-            
+        
             # Upload HTML report to GitHub
             public_url = report_repository.upload_report(email, topic, html_content)
-            
-            # Generate first topic report
+        
             first_topic = topic_titles[0] if topic_titles else None
             report_links = {}
             last_report_time = None
-            
-            if first_topic:
-                print(f"[Report Service] Generating report for first topic: {first_topic}")
+        
+            if first_topic and report_content is not None:
                 try:
-                    report_content = self.ai_service.generate_report_content(first_topic)
-                    # Extract quiz and strip from content for separate rendering
-                    try:
-                        quiz_obj = self.ai_service.extract_quiz_from_report(report_content)
-                        content_without_quiz = self.ai_service.strip_quiz_section(report_content) if quiz_obj else report_content
-                    except Exception:
-                        quiz_obj = None
-                        content_without_quiz = report_content
-                    
-                    # Create initial context summary
-                    try:
-                        self.context_service.create_initial_context(
-                            user_email=email,
-                            main_topic=topic,
-                            learning_plan=topic_titles,
-                            first_report_content=report_content,
-                            first_topic=first_topic
-                        )
-                    except Exception as e:
-                        print(f"[Report Service] Warning: Failed to create initial context: {e}")
-                    
+                    # Quiz rendered separately from the report content
+                    quiz_obj, content_without_quiz = self._report_quiz(first_topic, report_content, quiz)
+                
+                    # Store initial context summary
+                    if initial_context:
+                        self.context_service.save_context(email, topic, *initial_context)
+                
                     # Save report response for future context
                     try:
                         response_repository.save_response(
@@ -100,7 +194,7 @@ class ReportService:
                         )
                     except Exception as e:
                         print(f"[Report Service] Warning: Failed to save report response: {e}")
-                    
+                
                     # Convert markdown to HTML
                     report_content_html = markdown.markdown(content_without_quiz)
                     report_html = generate_topic_report_html(
@@ -109,16 +203,16 @@ class ReportService:
                         report_content=report_content_html,
                         quiz=quiz_obj
                     )
-                    
+                
                     # Upload the report HTML
                     report_url = report_repository.upload_report(email, topic, report_html, filename=first_topic)
                     report_links[0] = report_url
                     last_report_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
                     print(f"[Report Service] First topic report uploaded: {report_url}")
-                    
+                
                 except Exception as e:
                     print(f"[Report Service] Error generating/uploading first topic report: {e}")
-            
+        
             # Update the learning plan HTML to link the first topic
             updated_html_content = update_learning_plan_html(
                 topic=topic,
@@ -126,10 +220,10 @@ class ReportService:
                 topics=topic_titles,
                 report_links=report_links
             )
-            
+        
             # Upload the updated learning plan HTML
             updated_public_url = report_repository.upload_report(email, topic, updated_html_content)
-            
+        
             # Add new user entry
             user_entry = self.user_service.add_user(
                 email=email,
@@ -140,87 +234,197 @@ class ReportService:
                 last_report_time=last_report_time,
                 paid=paid
             )
-            
+        
             print(f"[Report Service] User entry added to users.json.")
-            
-            self._wait_before_email()
-            
-            # Send welcome email
-            email_sent = self.email_service.send_welcome_email(email, topic, updated_public_url)
-            
-            if email_sent:
-                return {
-                    "success": True,
-                    "message": "Welcome email with learning plan link sent successfully!",
-                    "email": email,
-                    "topic": topic,
-                    "plan_url": updated_public_url
-                }
-            else:
-                return {
-                    "success": True,
-                    "message": "Submission received and learning plan generated! (Email service not configured)",
-                    "email": email,
-                    "topic": topic,
-                    "plan_url": updated_public_url
-                }
-                
-        except Exception as e:
-            print(f"[Report Service] Error generating initial learning plan: {e}")
-            traceback.print_exc()
+        
+            # Queue welcome email; it goes out once the plan page is live
+            if self.email_service.is_email_configured():
+                self._queue_email(
+                    f"welcome email for {email}",
+                    self.email_service.send_welcome_email, email, topic, updated_public_url,
+                    wait_for_url=updated_public_url
+                )
+        
+        if self.email_service.is_email_configured():
             return {
-                "success": False,
-                "message": f"Error generating learning plan: {str(e)}",
+                "success": True,
+                "message": "Learning plan generated! Welcome email with learning plan link is on its way.",
                 "email": email,
-                "topic": topic
+                "topic": topic,
+                "plan_url": updated_public_url
+            }
+        else:
+            return {
+                "success": True,
+                "message": "Submission received and learning plan generated! (Email service not configured)",
+                "email": email,
+                "topic": topic,
+                "plan_url": updated_public_url
             }
     
     def generate_next_report(self, user: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Generate next report for existing user"""
+        topic = None
         try:
             print(f"[Report Service] Generating next report for {user['email']}")
             
-            # Check if user should receive a report based on PAID status and current_index
-            if not self.user_service.should_generate_report(user):
-                current_index = user.get("current_index", 0)
-                paid = user.get("paid", False)
-                print(f"[Report Service] Skipping report for {user['email']} - payment required (index: {current_index}, paid: {paid})")
-                return user
-            
-            # Get next topic
-            idx, topic = self.user_service.get_next_topic(user)
+            topic = self.next_report_topic(user)
             if topic is None:
-                print(f"[Report Service] No more topics for {user['email']}")
                 return user
             
-            print(f"[Report Service] Generating report for {user['email']} on topic: {topic}")
-            
             # Get user context for context-aware report generation
-            user_context = self.context_service.get_user_context(user["email"], user["main_topic"])
+            existing_context = self.context_service.load_context(user["email"], user["main_topic"])
+            user_context = self.context_service.prompt_context(user["email"], user["main_topic"], topic, existing_context)
             
             # Generate report content with context
+            context_update = None
             if user_context:
                 print(f"[Report Service] Using context for {user['email']} on topic: {topic}")
-                report_content_md, token_count = self.ai_service.generate_report_content_with_context(
-                    topic, user_context, user["learning_plan"]
+                combined = None
+                if self.single_call_summary:
+                    # Report and updated summary from one completion
+                    combined = self.ai_service.generate_report_and_summary(topic, user_context, user["learning_plan"])
+                if combined:
+                    report_content_md, new_summary, token_count = combined
+                    context_update = self._single_call_context(existing_context, report_content_md, topic, user, new_summary)
+                else:
+                    report_content_md, token_count = self.ai_service.generate_report_content_with_context(
+                        topic, user_context, user["learning_plan"]
+                    )
+            else:
+                print(f"[Report Service] No context available for {user['email']}, generating without context")
+                report_content_md = self.ai_service.generate_report_content(topic, user=user["email"])
+                token_count = None
+            
+            # Fold the new report into the context summary
+            if context_update is None:
+                context_update = self.context_service.summarize_new_report(
+                    existing_context, report_content_md, topic, user["learning_plan"]
                 )
+            
+            return self.publish_next_report(user, topic, report_content_md, token_count, context_update)
+            
+        except Exception as e:
+            print(f"[Report Service] Error for {user['email']} on topic {topic}: {e}")
+            traceback.print_exc()
+            return user
+    
+    async def generate_next_report_async(self, user: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Async twin of generate_next_report; GitHub reads and writes run in worker threads"""
+        topic = None
+        try:
+            print(f"[Report Service] Generating next report for {user['email']}")
+            
+            topic = self.next_report_topic(user)
+            if topic is None:
+                return user
+            
+            existing_context = await asyncio.to_thread(
+                self.context_service.load_context, user["email"], user["main_topic"]
+            )
+            # Retrieval mode may rebuild the user's index from GitHub
+            user_context = await asyncio.to_thread(
+                self.context_service.prompt_context, user["email"], user["main_topic"], topic, existing_context
+            )
+            
+            context_update = None
+            if user_context:
+                print(f"[Report Service] Using context for {user['email']} on topic: {topic}")
+                combined = None
+                if self.single_call_summary:
+                    combined = await self.async_ai_service.generate_report_and_summary(topic, user_context, user["learning_plan"])
+                if combined:
+                    report_content_md, new_summary, token_count = combined
+                    context_update = self._single_call_context(existing_context, report_content_md, topic, user, new_summary)
+                else:
+                    report_content_md, token_count = await self.async_ai_service.generate_report_content_with_context(
+                        topic, user_context, user["learning_plan"]
+                    )
             else:
                 print(f"[Report Service] No context available for {user['email']}, generating without context")
-                report_content_md = self.ai_service.generate_report_content(topic)
+                report_content_md = await self.async_ai_service.generate_report_content(topic, user=user["email"])
                 token_count = None
             
-            # Update context summary with new report content
-            try:
-                self.context_service.update_context_with_new_report(
-                    user_email=user["email"],
-                    main_topic=user["main_topic"],
-                    new_report_content=report_content_md,
-                    new_topic=topic,
-                    learning_plan=user["learning_plan"]
+            if context_update is None:
+                context_update, quiz = await asyncio.gather(
+                    self.context_service.summarize_new_report_async(
+                        existing_context, report_content_md, topic, user["learning_plan"]
+                    ),
+                    self._structured_quiz_async(topic, report_content_md)
                 )
-            except Exception as e:
-                print(f"[Report Service] Warning: Failed to update context: {e}")
+            else:
+                quiz = await self._structured_quiz_async(topic, report_content_md)
+            
+            return await asyncio.to_thread(
+                self.publish_next_report, user, topic, report_content_md, token_count, context_update, quiz
+            )
             
+        except Exception as e:
+            print(f"[Report Service] Error for {user['email']} on topic {topic}: {e}")
+            traceback.print_exc()
+            return user
+    
+    def _report_quiz(self, topic: str, report_content_md: str,
+                     quiz: Optional[Dict[str, Any]] = None) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        (quiz, report markdown without the quiz). In QUIZ_MODE "structured" the
+        report has no quiz section and the quiz comes from its own completion,
+        unless one was already generated; otherwise it is parsed from the markdown.
+        """
+        if settings.QUIZ_MODE == "structured":
+            return (quiz if quiz is not None else self.ai_service.generate_quiz(topic, report_content_md)), report_content_md
+        try:
+            return self.ai_service.split_quiz_from_report(report_content_md)
+        except Exception:
+            return None, report_content_md
+    
+    async def _structured_quiz_async(self, topic: str, report_content_md: str) -> Optional[Dict[str, Any]]:
+        """Quiz completion awaited alongside the context step (QUIZ_MODE "structured" only)"""
+        if settings.QUIZ_MODE != "structured":
+            return None
+        return await self.async_ai_service.generate_quiz(topic, report_content_md)
+    
+    @property
+    def single_call_summary(self) -> bool:
+        """Whether the context summary is requested in the report completion itself (only for LLM summaries)"""
+        return settings.SINGLE_CALL_REPORT_SUMMARY and self.context_service.uses_llm_summary
+    
+    def _single_call_context(self, existing_context: Optional[Dict[str, Any]], report_content_md: str,
+                             topic: str, user: Dict[str, Any], new_summary: str) -> Tuple[Dict[str, Any], Optional[int]]:
+        """Context update for a summary that came with the report; its tokens are counted on the report"""
+        print(f"[Report Service] Report and context summary generated in one call for {user['email']}")
+        summary_data = self.context_service.fold_summary(
+            existing_context, report_content_md, topic, user["learning_plan"], new_summary
+        )
+        return summary_data, None
+    
+    def next_report_topic(self, user: Dict[str, Any]) -> Optional[str]:
+        """Topic of the user's next report, or None if no report is due"""
+        # Check if user should receive a report based on PAID status and current_index
+        if not self.user_service.should_generate_report(user):
+            current_index = user.get("current_index", 0)
+            paid = user.get("paid", False)
+            print(f"[Report Service] Skipping report for {user['email']} - payment required (index: {current_index}, paid: {paid})")
+            return None
+        
+        # Get next topic
+        idx, topic = self.user_service.get_next_topic(user)
+        if topic is None:
+            print(f"[Report Service] No more topics for {user['email']}")
+            return None
+        
+        print(f"[Report Service] Generating report for {user['email']} on topic: {topic}")
+        return topic
+    
+    def publish_next_report(self, user: Dict[str, Any], topic: str, report_content_md: str,
+                             token_count: Optional[int], context_update: Tuple[Dict[str, Any], Optional[int]],
+                             quiz: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Store and upload a generated report and advance the user's progress"""
+        # Stage every file for this user and write them as a single commit
+        with report_repository.batch(f"Add report for {user['email']} - {user['main_topic']}: {topic}"):
+            # Update context summary with new report content
+            self.context_service.save_context(user["email"], user["main_topic"], *context_update)
+        
             # Save report response for future context
             try:
                 response_repository.save_response(
@@ -231,32 +435,28 @@ class ReportService:
                     report_topic=topic,
                     token_count=token_count
                 )
+                self.context_service.index_report(user["email"], user["main_topic"], topic, report_content_md)
             except Exception as e:
                 print(f"[Report Service] Warning: Failed to save report response: {e}")
-            
+        
             # Convert to HTML and generate report
-            try:
-                quiz_obj = self.ai_service.extract_quiz_from_report(report_content_md)
-                content_without_quiz = self.ai_service.strip_quiz_section(report_content_md) if quiz_obj else report_content_md
-            except Exception:
-                quiz_obj = None
-                content_without_quiz = report_content_md
+            quiz_obj, content_without_quiz = self._report_quiz(topic, report_content_md, quiz)
 
             report_content_html = markdown.markdown(content_without_quiz)
             report_html = generate_topic_report_html(topic, user["email"], report_content_html, quiz=quiz_obj)
-            
+        
             # Upload report
             plan_topic = user["main_topic"]
             report_url = report_repository.upload_report(user["email"], plan_topic, report_html, filename=topic)
-            
+        
             # Update user progress
             current_index = user.get("current_index", 0)
             last_report_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
-            
+        
             updated_user = self.user_service.update_user_progress(
                 user, report_url, topic, current_index, last_report_time
             )
-            
+        
             # Update learning plan HTML
             updated_plan_html = update_learning_plan_html(
                 topic=plan_topic,
@@ -264,24 +464,32 @@ class ReportService:
                 topics=user["learning_plan"],
                 report_links=updated_user["report_links"]
             )
-            
+        
             plan_url = report_repository.upload_report(user["email"], plan_topic, updated_plan_html)
             updated_user["plan_url"] = plan_url
-            
-            self._wait_before_email()
-            
-            # Send email
-            self.email_service.send_report_email(updated_user, topic, plan_url, report_url)
-            
-            print(f"[Report Service] Report and email sent for {user['email']} on topic: {topic}")
-            return updated_user
-            
-        except Exception as e:
-            print(f"[Report Service] Error for {user['email']} on topic {topic}: {e}")
-            traceback.print_exc()
-            return user 
+        
+            # Queue report email; it goes out once the report page is live
+            self._queue_email(
+                f"report email for {user['email']} on {topic}",
+                self.email_service.send_report_email, updated_user, topic, plan_url, report_url,
+                wait_for_url=report_url
+            )
+        
+        print(f"[Report Service] Report generated and email queued for {user['email']} on topic: {topic}")
+        return updated_user
 
-    def _wait_before_email(self):
-        """Wait for the configured delay before sending an email, with logging."""
-        print(f"[Report Service] Waiting {settings.REPORT_DELAY_SECONDS} seconds before sending email...")
-        time.sleep(settings.REPORT_DELAY_SECONDS) 
\ No newline at end of file
+    def _queue_email(self, description: str, send_fn, *args, wait_for_url: Optional[str] = None) -> None:
+        """
+        Hand an email to the dispatcher. Inside a commit batch the email is only
+        queued once the batch has landed on GitHub, so its links can resolve.
+        """
+        batch = get_active_batch()
+        if batch is not None:
+            batch.add_commit_callback(
+                lambda: self.email_dispatcher.schedule(description, send_fn, *args, wait_for_url=wait_for_url)
+            )
+            batch.add_failure_callback(
+                lambda: print(f"[Report Service] Dropped {description}: its commit batch failed")
+            )
+        else:
+            self.email_dispatcher.schedule(description, send_fn, *args, wait_for_url=wait_for_url)
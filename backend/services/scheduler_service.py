@@ -0,0 +1,379 @@
+import contextvars
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+from config import settings
+from services.report_service import ReportService
+from services.user_service import UserService
+from services.batch_report_service import BatchReportService
+from data import report_repository
+from data.git_batch import GitCommitBatch
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class SchedulerRun:
+    """In-process record of one scheduler run and the progress of each user in it"""
+
+    def __init__(self, email: Optional[str] = None, topic: Optional[str] = None,
+                 max_workers: Optional[int] = None, commit_mode: Optional[str] = None,
+                 execution_mode: Optional[str] = None):
+        self.run_id = uuid.uuid4().hex
+        self.email = email
+        self.topic = topic
+        self.max_workers = max_workers
+        self.commit_mode = commit_mode or settings.SCHEDULER_COMMIT_MODE
+        self.execution_mode = execution_mode or settings.SCHEDULER_EXECUTION_MODE
+        self.commit_stats: Optional[Dict[str, float]] = None
+        self.status = "queued"
+        self.message = "Scheduler run queued"
+        self.created_at = _utc_now()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.duration_seconds: Optional[float] = None
+        self.users_total = 0
+        self.success_count = 0
+        self.errors: List[str] = []
+        self.users: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._started_monotonic: Optional[float] = None
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+
+    @property
+    def is_single_user(self) -> bool:
+        return bool(self.email and self.topic)
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def covers(self, email: Optional[str], topic: Optional[str]) -> bool:
+        """Whether this run already processes the users a trigger for (email, topic) would"""
+        if not self.is_single_user:
+            return True
+        return self.email == email and self.topic == topic
+
+    def _user_key(self, user: Dict[str, Any]) -> str:
+        return f"{user.get('email', 'Unknown')}::{user.get('main_topic', '')}"
+
+    def mark_started(self) -> None:
+        with self._lock:
+            self.status = "running"
+            self.message = "Processing users"
+            self.started_at = _utc_now()
+            self._started_monotonic = time.monotonic()
+
+    def set_message(self, message: str) -> None:
+        with self._lock:
+            self.message = message
+
+    def add_user(self, user: Dict[str, Any]) -> None:
+        """Register a user pulled from the stream as pending"""
+        with self._lock:
+            self.users[self._user_key(user)] = {
+                "email": user.get("email"),
+                "main_topic": user.get("main_topic"),
+                "status": "pending",
+                "started_at": None,
+                "finished_at": None,
+                "duration_seconds": None,
+                "error": None
+            }
+            self.users_total = len(self.users)
+
+    def mark_user_started(self, user: Dict[str, Any]) -> float:
+        with self._lock:
+            entry = self.users.get(self._user_key(user))
+            if entry is not None:
+                entry["status"] = "running"
+                entry["started_at"] = _utc_now()
+        return time.monotonic()
+
+    def mark_user_finished(self, user: Dict[str, Any], started: float, error: Optional[str] = None) -> None:
+        with self._lock:
+            entry = self.users.get(self._user_key(user))
+            if entry is not None:
+                entry["status"] = "failed" if error else "succeeded"
+                entry["finished_at"] = _utc_now()
+                entry["duration_seconds"] = round(time.monotonic() - started, 3)
+                entry["error"] = error
+
+    def mark_finished(self, status: str, message: str, success_count: int = 0,
+                      errors: Optional[List[str]] = None, commit_stats: Optional[Dict[str, float]] = None) -> None:
+        with self._lock:
+            self.commit_stats = commit_stats
+            self.status = status
+            self.message = message
+            self.success_count = success_count
+            self.errors = errors or []
+            self.finished_at = _utc_now()
+            if self._started_monotonic is not None:
+                self.duration_seconds = round(time.monotonic() - self._started_monotonic, 3)
+        self._finished.set()
+
+    def wait_finished(self) -> None:
+        """Block until the run has completed or failed"""
+        self._finished.wait()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            users = [dict(entry) for entry in self.users.values()]
+            completed = sum(1 for entry in users if entry["status"] in ("succeeded", "failed"))
+            return {
+                "run_id": self.run_id,
+                "status": self.status,
+                "message": self.message,
+                "email": self.email,
+                "topic": self.topic,
+                "max_workers": self.max_workers,
+                "commit_mode": self.commit_mode,
+                "execution_mode": self.execution_mode,
+                "commit_stats": self.commit_stats,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "duration_seconds": self.duration_seconds,
+                "users_total": self.users_total,
+                "users_completed": completed,
+                "success_count": self.success_count,
+                "errors": list(self.errors),
+                "users": users
+            }
+
+class SchedulerService:
+    """Runs report generation for many users through a bounded worker pool"""
+
+    def __init__(self, report_service: Optional[ReportService] = None):
+        self.report_service = report_service or ReportService()
+        self.user_service = UserService()
+        self.batch_reports = BatchReportService(self.report_service)
+        self._runs: "OrderedDict[str, SchedulerRun]" = OrderedDict()
+        self._runs_lock = threading.Lock()
+
+    def _resolve_max_workers(self, max_workers: Optional[int]) -> int:
+        """Pick the pool size from the call, falling back to settings, never above SCHEDULER_MAX_WORKERS_CAP"""
+        workers = max_workers if max_workers else settings.SCHEDULER_MAX_WORKERS
+        if workers > settings.SCHEDULER_MAX_WORKERS_CAP:
+            print(f"[Scheduler] Requested {workers} workers, capped at {settings.SCHEDULER_MAX_WORKERS_CAP}")
+            workers = settings.SCHEDULER_MAX_WORKERS_CAP
+        return max(1, workers)
+
+    def process_user(self, user: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Process a single user for report generation"""
+        return self.report_service.generate_next_report(user)
+
+    def _process_tracked(self, user: Dict[str, Any], run: Optional[SchedulerRun],
+                         process: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None) -> Optional[Dict[str, Any]]:
+        """Process a user, recording per-user progress on the run if one is given"""
+        process = process or self.process_user
+        if run is None:
+            return process(user)
+        started = run.mark_user_started(user)
+        try:
+            updated_user = process(user)
+        except Exception as e:
+            run.mark_user_finished(user, started, error=str(e))
+            raise
+        run.mark_user_finished(user, started)
+        return updated_user
+
+    def run(self, users: Iterable[Dict[str, Any]], max_workers: Optional[int] = None,
+            scheduler_run: Optional[SchedulerRun] = None, commit_mode: Optional[str] = None,
+            flush_every: Optional[int] = None, execution_mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generate the next report for every user, running up to max_workers users at once.
+
+        Args:
+            users: Users to process; may be a stream (e.g. UserService.iter_users()),
+                which is consumed only as fast as workers free up
+            max_workers: Pool size for this run (defaults to SCHEDULER_MAX_WORKERS)
+            scheduler_run: Optional run record to report per-user progress into
+            commit_mode: "per_user" (one commit per user) or "run" (one shared commit
+                batch for the whole run); defaults to SCHEDULER_COMMIT_MODE
+            flush_every: In "run" mode, also flush the batch every K users
+                (defaults to SCHEDULER_FLUSH_EVERY, 0 = only at the end)
+            execution_mode: "realtime" (one completion per user, in the pool) or
+                "batch" (all completions through the OpenAI Batch API first, then
+                only publishing in the pool); defaults to SCHEDULER_EXECUTION_MODE
+
+        Returns:
+            Dict with processed, success_count, errors and commit_stats
+        """
+        process = None
+        if (execution_mode or settings.SCHEDULER_EXECUTION_MODE) == "batch":
+            # A batch covers the whole day's users, so the stream is materialized here
+            users = list(users)
+            on_message = scheduler_run.set_message if scheduler_run is not None else None
+            process = self.batch_reports.generate(users, on_message)
+
+        mode = commit_mode or settings.SCHEDULER_COMMIT_MODE
+        if mode != "run":
+            return self._run_pool(users, max_workers, scheduler_run, process=process)
+
+        every = settings.SCHEDULER_FLUSH_EVERY if flush_every is None else flush_every
+        # Every worker stages into this batch; it is flushed as one commit at the end of the run
+        with report_repository.batch("Scheduler run: daily reports") as batch:
+            result = self._run_pool(users, max_workers, scheduler_run, batch, every, process)
+        if batch is not None:
+            result["commit_stats"] = batch.get_stats()
+            print(f"[Scheduler] Run batch stats: {result['commit_stats']}")
+        return result
+
+    def _run_pool(self, users: Iterable[Dict[str, Any]], max_workers: Optional[int],
+                  scheduler_run: Optional[SchedulerRun], batch: Optional[GitCommitBatch] = None,
+                  flush_every: int = 0,
+                  process: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None) -> Dict[str, Any]:
+        processed = 0
+        success_count = 0
+        errors: List[str] = []
+
+        workers = self._resolve_max_workers(max_workers)
+        print(f"[Scheduler] Processing users with {workers} worker(s)")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scheduler") as executor:
+            in_flight: Dict[Future, Dict[str, Any]] = {}
+            user_stream = iter(users)
+            exhausted = False
+            while True:
+                # Pull from the stream only while there is room, so at most
+                # 2 x workers users are held in memory at any time
+                while not exhausted and len(in_flight) < workers * 2:
+                    user = next(user_stream, None)
+                    if user is None:
+                        exhausted = True
+                        break
+                    if scheduler_run is not None:
+                        scheduler_run.add_user(user)
+                    # Each worker runs in a copy of this context so it sees the run-wide batch (if any)
+                    future = executor.submit(contextvars.copy_context().run, self._process_tracked, user, scheduler_run, process)
+                    in_flight[future] = user
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    user = in_flight.pop(future)
+                    try:
+                        if future.result():
+                            success_count += 1
+                    except Exception as e:
+                        error_msg = f"User {user.get('email', 'Unknown')}: {str(e)}"
+                        errors.append(error_msg)
+                        print(f"[Scheduler] Error processing user: {error_msg}")
+
+                    processed += 1
+                    if batch is not None and flush_every and processed % flush_every == 0:
+                        self._flush(batch, errors)
+
+        return {"processed": processed, "success_count": success_count, "errors": errors}
+
+    def _flush(self, batch: GitCommitBatch, errors: List[str]) -> None:
+        """Intermediate flush of the run-wide batch; a failure is kept for the final flush to retry"""
+        try:
+            batch.commit()
+        except Exception as e:
+            errors.append(f"Intermediate commit failed: {str(e)}")
+            print(f"[Scheduler] Intermediate commit failed: {e}")
+
+    def start_run(self, email: Optional[str] = None, topic: Optional[str] = None,
+                  max_workers: Optional[int] = None, commit_mode: Optional[str] = None,
+                  execution_mode: Optional[str] = None) -> Tuple[SchedulerRun, bool]:
+        """
+        Start a scheduler run in a background thread, or attach to the in-flight one.
+
+        A full run requested while single-user runs are active stays queued until
+        they finish, so the same report is never generated twice at once.
+
+        Returns:
+            Tuple of (run, created). created is False when an active run already
+            covers the requested users; that run is returned instead.
+        """
+        with self._runs_lock:
+            active = [existing for existing in self._runs.values() if existing.is_active]
+            for existing in active:
+                if existing.covers(email, topic):
+                    return existing, False
+
+            run = SchedulerRun(email=email, topic=topic, max_workers=max_workers, commit_mode=commit_mode,
+                               execution_mode=execution_mode)
+            # Only a full run can overlap the active (single-user) runs here
+            blockers = [] if run.is_single_user else active
+            self._runs[run.run_id] = run
+            self._prune_runs()
+
+        thread = threading.Thread(
+            target=self._execute_run, args=(run, blockers), name=f"scheduler-run-{run.run_id[:8]}", daemon=True
+        )
+        thread.start()
+        print(f"[Scheduler] Started run {run.run_id}")
+        return run, True
+
+    def get_run(self, run_id: str) -> Optional[SchedulerRun]:
+        with self._runs_lock:
+            return self._runs.get(run_id)
+
+    def _prune_runs(self) -> None:
+        """Keep only the most recent finished runs (caller holds _runs_lock)"""
+        finished = [run_id for run_id, run in self._runs.items() if not run.is_active]
+        excess = len(self._runs) - settings.SCHEDULER_RUN_HISTORY
+        for run_id in finished[:max(0, excess)]:
+            del self._runs[run_id]
+
+    def _execute_run(self, run: SchedulerRun, blockers: Optional[List[SchedulerRun]] = None) -> None:
+        """Body of a background scheduler run, started once the runs in blockers have finished"""
+        for blocker in blockers or []:
+            run.set_message(f"Queued behind scheduler run {blocker.run_id}")
+            blocker.wait_finished()
+        try:
+            if run.is_single_user:
+                assert run.email is not None and run.topic is not None
+                user = self.user_service.find_user_by_email_and_topic(run.email, run.topic)
+                if user is None:
+                    run.mark_finished("failed", f"No user found with email={run.email} and topic={run.topic}")
+                    return
+                # Full runs stream UserRecords, which stand in for user dicts
+                users: Iterable[Any] = [user]
+            else:
+                # Streamed, so memory does not grow with the number of users
+                users = self.user_service.iter_users()
+
+            run.mark_started()
+            result = self.run(users, run.max_workers, scheduler_run=run, commit_mode=run.commit_mode,
+                              execution_mode=run.execution_mode)
+            success_count = result["success_count"]
+            errors = result["errors"]
+
+            # Send daily report notification (only if processing all users)
+            if not run.is_single_user:
+                try:
+                    from services.notification_service import NotificationService
+                    notification_service = NotificationService()
+                    notification_service.send_daily_report(result["processed"], success_count, errors)
+                except Exception as notification_error:
+                    print(f"[Scheduler] Failed to send daily report: {notification_error}")
+
+            run.mark_finished(
+                "completed",
+                f"Scheduler run complete. Processed {result['processed']} user(s).",
+                success_count,
+                errors,
+                result.get("commit_stats")
+            )
+        except Exception as e:
+            # Send error alert notification (only if processing all users)
+            if not run.is_single_user:
+                try:
+                    from services.notification_service import NotificationService
+                    notification_service = NotificationService()
+                    notification_service.send_error_alert("Scheduler Failure", str(e))
+                except Exception as notification_error:
+                    print(f"[Scheduler] Failed to send error alert: {notification_error}")
+
+            print(f"Error in scheduler: {e}")
+            traceback.print_exc()
+            run.mark_finished("failed", str(e), errors=[str(e)])
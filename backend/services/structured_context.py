@@ -0,0 +1,118 @@
+"""
+Structured learning context, updated without a completion.
+
+Instead of asking the model to merge a free-text summary with every new report,
+the context keeps an ordered list of covered topics with a few key concepts
+each, taken from the report's bold terms and subheadings. The rendering fed to
+the report prompt is hard-capped at CONTEXT_MAX_TOKENS: when a new topic pushes
+it over, the oldest topics lose their concepts first and are finally folded
+into an "earlier topics" count, so the context costs the same on day 30 as on
+day 2.
+
+A user switched over from CONTEXT_MODE "summary" keeps their free-text
+summary as "legacy_summary" (trimmed to half the cap), so the history it
+describes is not lost on the first structured update.
+
+Stored shape (the "structured" field of context_summary.json):
+    {"topics": [{"topic": str, "concepts": [str, ...]}, ...], "earlier_topics": int,
+     "legacy_summary": str (optional)}
+"""
+import re
+from typing import Any, Dict, List, Optional
+from config import settings
+from services.token_budget import count_tokens, truncate
+
+_QUIZ_SECTION = re.compile(r"\n?##\s*Interactive Quiz[\s\S]*$", re.IGNORECASE)
+_BOLD_TERM = re.compile(r"\*\*([^*\n]{2,80}?)\s*:?\*\*\s*:?")
+_SUBHEADING = re.compile(r"^###\s+(.+?)\s*$", re.MULTILINE)
+# Subheadings from the report template that name a section rather than a concept
+_GENERIC_HEADINGS = {"basic definition", "key concepts", "introduction", "think about this", "examples"}
+
+def extract_concepts(report_md: str, limit: Optional[int] = None) -> List[str]:
+    """Key concepts of a report: its bold terms, then its ### subheadings, deduplicated"""
+    limit = settings.CONTEXT_CONCEPTS_PER_TOPIC if limit is None else limit
+    body = _QUIZ_SECTION.sub("", report_md or "")
+    candidates = [match.group(1) for match in _BOLD_TERM.finditer(body)]
+    candidates += [match.group(1) for match in _SUBHEADING.finditer(body)]
+
+    concepts: List[str] = []
+    seen = set()
+    for candidate in candidates:
+        concept = re.sub(r"[*_`#]", "", candidate).strip().rstrip(":").strip()
+        key = concept.casefold()
+        if not concept or key in seen or key in _GENERIC_HEADINGS:
+            continue
+        seen.add(key)
+        concepts.append(concept)
+        if len(concepts) >= limit:
+            break
+    return concepts
+
+def empty_context(topics_covered: Optional[List[str]] = None, legacy_summary: str = "") -> Dict[str, Any]:
+    """Structured context, seeded with the topic names and summary text of a legacy free-text context if given"""
+    structured: Dict[str, Any] = {
+        "topics": [{"topic": topic, "concepts": []} for topic in topics_covered or []],
+        "earlier_topics": 0
+    }
+    if legacy_summary and legacy_summary.strip():
+        structured["legacy_summary"] = truncate(legacy_summary.strip(), settings.CONTEXT_MAX_TOKENS // 2)
+    return structured
+
+def add_report(structured: Optional[Dict[str, Any]], topic: str, report_md: str,
+               topics_covered: Optional[List[str]] = None, legacy_summary: str = "") -> Dict[str, Any]:
+    """
+    New structured context with the report's topic appended (or refreshed), compacted
+    to the size cap. Without a structured context yet, it is seeded from topics_covered
+    and legacy_summary (the free-text context of CONTEXT_MODE "summary").
+    """
+    if structured:
+        updated = {
+            "topics": [dict(entry, concepts=list(entry["concepts"])) for entry in structured.get("topics", [])],
+            "earlier_topics": structured.get("earlier_topics", 0)
+        }
+        if structured.get("legacy_summary"):
+            updated["legacy_summary"] = structured["legacy_summary"]
+    else:
+        updated = empty_context(topics_covered, legacy_summary)
+    updated["topics"] = [entry for entry in updated["topics"] if entry["topic"] != topic]
+    updated["topics"].append({"topic": topic, "concepts": extract_concepts(report_md)})
+    return compact(updated)
+
+def compact(structured: Dict[str, Any], max_tokens: Optional[int] = None) -> Dict[str, Any]:
+    """Shrink the context in place until its rendering fits max_tokens; the newest topic is kept whole"""
+    max_tokens = settings.CONTEXT_MAX_TOKENS if max_tokens is None else max_tokens
+    if count_tokens(render(structured)) <= max_tokens:
+        return structured
+    topics = structured["topics"]
+    # Oldest topics first lose concepts, down to one and then none
+    for keep in (1, 0):
+        for entry in topics[:-1]:
+            if len(entry["concepts"]) > keep:
+                entry["concepts"] = entry["concepts"][:keep]
+                if count_tokens(render(structured)) <= max_tokens:
+                    return structured
+    # Then fold the oldest topics into a count
+    while len(topics) > 1 and count_tokens(render(structured)) > max_tokens:
+        topics.pop(0)
+        structured["earlier_topics"] += 1
+    # Last resort: the carried-over summary goes
+    if structured.get("legacy_summary") and count_tokens(render(structured)) > max_tokens:
+        del structured["legacy_summary"]
+    return structured
+
+def render(structured: Dict[str, Any]) -> str:
+    """Compact text of the context, as inserted into the report prompt"""
+    topics = structured.get("topics", [])
+    total = len(topics) + structured.get("earlier_topics", 0)
+    lines = []
+    if structured.get("legacy_summary"):
+        lines.append(f"Summary of earlier learning: {structured['legacy_summary']}")
+    lines.append(f"Topics covered so far ({total}, oldest first), with their key concepts:")
+    if structured.get("earlier_topics"):
+        lines.append(f"- ...{structured['earlier_topics']} earlier topic(s)")
+    for entry in topics:
+        concepts = "; ".join(entry["concepts"])
+        lines.append(f"- {entry['topic']}: {concepts}" if concepts else f"- {entry['topic']}")
+    if topics:
+        lines.append(f"Most recent topic: {topics[-1]['topic']}")
+    return "\n".join(lines)
@@ -0,0 +1,171 @@
+"""
+Token accounting for chat completion requests.
+
+Prompts are counted locally before they are sent (with tiktoken, or a ~4
+characters per token estimate if its encoding cannot be loaded). The context
+summary and learning plan are trimmed to their configured budgets, max_tokens
+is capped by what is left of the model's context window (a prompt that leaves
+nothing is refused), and the predicted prompt size is recorded next to the
+usage OpenAI reports back.
+"""
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import tiktoken
+from config import settings
+
+# Fixed per-message overhead of the chat format (role and separators), and the reply primer
+_TOKENS_PER_MESSAGE = 3
+_TOKENS_PER_REPLY = 3
+_CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+
+class PromptTooLongError(ValueError):
+    """The prompt leaves no room for a completion in the model's context window"""
+
+def _get_encoding():
+    """tiktoken encoding for the configured model, or None when it fails to load"""
+    global _encoding, _encoding_failed
+    if _encoding_failed:
+        return None
+    with _encoding_lock:
+        if _encoding is None and not _encoding_failed:
+            try:
+                try:
+                    _encoding = tiktoken.encoding_for_model(settings.OPENAI_MODEL)
+                except KeyError:
+                    _encoding = tiktoken.get_encoding(settings.TOKEN_BUDGET_ENCODING)
+            except Exception as e:
+                # e.g. the BPE file could not be downloaded; estimate rather than fail every request
+                print(f"[Token Budget] Could not load tiktoken encoding, using the chars/4 estimate: {e}")
+                _encoding_failed = True
+        return _encoding
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+def count_messages(messages: List[Dict[str, str]]) -> int:
+    """Prompt tokens of a chat completion request's messages"""
+    return sum(_TOKENS_PER_MESSAGE + count_tokens(message.get("content") or "") for message in messages) + _TOKENS_PER_REPLY
+
+def truncate(text: str, max_tokens: int) -> str:
+    """text cut to at most max_tokens, backing off to the last sentence end when one is close"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is None:
+        cut = text[:max_tokens * _CHARS_PER_TOKEN]
+    else:
+        cut = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    sentence_end = max(cut.rfind(". "), cut.rfind(".\n"), cut.rfind("\n\n"))
+    if sentence_end >= len(cut) * 0.8:
+        cut = cut[:sentence_end + 1]
+    return cut.rstrip() + " [...]"
+
+def fit_context(context: str) -> str:
+    """Context summary trimmed to TOKEN_BUDGET_CONTEXT"""
+    if not settings.TOKEN_BUDGET_ENABLED or not context:
+        return context
+    trimmed = truncate(context, settings.TOKEN_BUDGET_CONTEXT)
+    if trimmed != context:
+        print(f"[Token Budget] Trimmed context summary from {count_tokens(context)} to {count_tokens(trimmed)} tokens")
+    return trimmed
+
+def fit_learning_plan(learning_plan: list, topic: Optional[str] = None) -> list:
+    """
+    Learning plan within TOKEN_BUDGET_PLAN. When the whole plan does not fit,
+    keep the topics nearest to the current one and summarize the rest.
+    """
+    if not settings.TOKEN_BUDGET_ENABLED or not learning_plan:
+        return learning_plan
+    costs = [count_tokens(f"- {item}") + 1 for item in learning_plan]
+    budget = settings.TOKEN_BUDGET_PLAN
+    if sum(costs) <= budget:
+        return learning_plan
+
+    center = learning_plan.index(topic) if topic in learning_plan else 0
+    start, end = center, center + 1
+    # Room for the two "... N topics" lines
+    used = costs[center] + 20
+    while True:
+        grew = False
+        if end < len(learning_plan) and used + costs[end] <= budget:
+            used += costs[end]
+            end += 1
+            grew = True
+        if start > 0 and used + costs[start - 1] <= budget:
+            start -= 1
+            used += costs[start]
+            grew = True
+        if not grew:
+            break
+
+    fitted = list(learning_plan[start:end])
+    if start > 0:
+        fitted.insert(0, f"... {start} earlier topic(s)")
+    if end < len(learning_plan):
+        fitted.append(f"... {len(learning_plan) - end} later topic(s)")
+    print(f"[Token Budget] Compressed learning plan from {len(learning_plan)} to {end - start} topic(s)")
+    return fitted
+
+def fit_max_tokens(messages: List[Dict[str, str]], max_tokens: int) -> Tuple[int, int]:
+    """
+    (prompt tokens, max_tokens capped by the room left in the model's context window).
+    Raises PromptTooLongError when no room is left, so the request is not sent.
+    """
+    prompt_tokens = count_messages(messages)
+    if not settings.TOKEN_BUDGET_ENABLED:
+        return prompt_tokens, max_tokens
+    available = settings.MODEL_CONTEXT_WINDOW - prompt_tokens - settings.TOKEN_BUDGET_SAFETY_MARGIN
+    if available <= 0:
+        raise PromptTooLongError(
+            f"Prompt of {prompt_tokens} tokens leaves no room for a completion in a {settings.MODEL_CONTEXT_WINDOW} token window"
+        )
+    if available < max_tokens:
+        print(f"[Token Budget] Prompt of {prompt_tokens} tokens leaves {available} for the completion (asked {max_tokens})")
+    return prompt_tokens, min(max_tokens, available)
+
+class TokenUsageStats:
+    """Predicted prompt tokens next to the usage OpenAI reported, per request kind"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kinds: Dict[str, Dict[str, int]] = {}
+
+    def record(self, kind: str, request: Dict[str, Any], usage: Any) -> None:
+        if usage is None:
+            return
+        predicted = count_messages(request.get("messages", []))
+        actual_prompt = getattr(usage, "prompt_tokens", None) or 0
+        actual_total = getattr(usage, "total_tokens", None) or 0
+        with self._lock:
+            stats = self._kinds.setdefault(kind, {
+                "requests": 0, "predicted_prompt_tokens": 0, "prompt_tokens": 0,
+                "budgeted_total_tokens": 0, "total_tokens": 0, "max_total_tokens": 0, "max_prompt_error": 0
+            })
+            stats["requests"] += 1
+            stats["predicted_prompt_tokens"] += predicted
+            stats["prompt_tokens"] += actual_prompt
+            # Upper bound the request allowed: predicted prompt plus its max_tokens
+            stats["budgeted_total_tokens"] += predicted + (request.get("max_tokens") or 0)
+            stats["total_tokens"] += actual_total
+            stats["max_total_tokens"] = max(stats["max_total_tokens"], actual_total)
+            stats["max_prompt_error"] = max(stats["max_prompt_error"], abs(actual_prompt - predicted))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds = {
+                kind: dict(stats, prediction_ratio=round(stats["prompt_tokens"] / stats["predicted_prompt_tokens"], 3) if stats["predicted_prompt_tokens"] else 0.0)
+                for kind, stats in self._kinds.items()
+            }
+        return {"tokenizer": "tiktoken" if _get_encoding() is not None else "chars/4", "kinds": kinds}
+
+# Global instance shared by AIService and AsyncAIService
+token_usage_stats = TokenUsageStats()
@@ -1,15 +1,20 @@
 import json
 import os
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 from config import settings
 from data import user_repository
+from data.user_record import UserRecord
 
 class UserService:
     def load_users(self) -> List[Dict[str, Any]]:
         """Load users using repository"""
         return user_repository.find_all()
     
+    def iter_users(self) -> Iterator[UserRecord]:
+        """Stream users from the repository one at a time"""
+        return user_repository.iter_all()
+    
     def save_users(self, users: List[Dict[str, Any]]) -> None:
         """Save users using repository"""
         user_repository.save_all(users)
@@ -36,35 +41,31 @@ class UserService:
     
     def add_user(self, email: str, topic: str, learning_plan: List[str], plan_url: str, 
                  report_links: Optional[Dict[int, str]] = None, last_report_time: Optional[str] = None, 
-                 paid: bool = False) -> Dict[str, Any]:
+                 paid: bool = False) -> UserRecord:
         """Add new user to the system"""
-        user_entry = {
-            "email": email,
-            "main_topic": topic,
-            "paid": paid,
-            "learning_plan": learning_plan,
-            "current_index": 1 if report_links else 0,
-            "plan_url": plan_url,
-            "report_links": report_links or {},
-            "last_report_time": last_report_time
-        }
+        user_entry = UserRecord(
+            email=email,
+            main_topic=topic,
+            paid=paid,
+            learning_plan=learning_plan,
+            current_index=1 if report_links else 0,
+            last_report_time=last_report_time
+        )
+        # Only URLs that differ from the derived ones are stored
+        user_entry.plan_url = plan_url
+        user_entry.report_links = report_links or {}
         
         return user_repository.save(user_entry)
     
     def update_user_progress(self, user: Dict[str, Any], report_url: str, topic: str, 
-                           current_index: int, last_report_time: str) -> Optional[Dict[str, Any]]:
+                           current_index: int, last_report_time: str) -> Optional[UserRecord]:
         """Update user's learning progress"""
-        # Update report_links
-        report_links = user.get("report_links", {})
-        report_links[current_index] = report_url
+        updated_user = UserRecord.coerce(user).copy()
         
-        # Update user data
-        updated_user = {
-            **user,
-            "current_index": current_index + 1,
-            "last_report_time": last_report_time,
-            "report_links": report_links
-        }
+        # Record the new report and advance
+        updated_user.mark_reported(current_index, report_url)
+        updated_user.current_index = current_index + 1
+        updated_user.last_report_time = last_report_time
         
         return user_repository.update(user["email"], user["main_topic"], updated_user)
     
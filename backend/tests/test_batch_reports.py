@@ -0,0 +1,137 @@
+"""
+Batch execution mode against the fake OpenAI Batch API (utils/fake_openai_batch.py).
+
+    cd backend
+    python -m unittest tests.test_batch_reports
+"""
+import os
+import threading
+import unittest
+from typing import Any, Dict, List
+from unittest import mock
+
+# Settings require a key; nothing here talks to OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from services.ai_service import BaseAIService
+from services.batch_report_service import BatchReportService
+from services.openai_batch import OpenAIBatchClient
+from utils import fake_openai_batch
+
+class StubContextService:
+    uses_llm_summary = True
+
+    def __init__(self):
+        self.folded = []
+        self.summarized = []
+
+    def load_context(self, email, main_topic):
+        return {"summary": f"Earlier summary for {email}."}
+
+    def prompt_context(self, email, main_topic, topic, existing_context):
+        return existing_context["summary"]
+
+    def fold_summary(self, existing_context, report, topic, learning_plan, summary):
+        self.folded.append((topic, summary))
+        return {"summary": summary}
+
+    def summarize_new_report(self, existing_context, report, topic, learning_plan):
+        self.summarized.append(topic)
+        return {"summary": "Realtime summary."}, 0
+
+class StubReportService:
+    """The parts of ReportService that BatchReportService uses; publishing is recorded"""
+
+    def __init__(self, single_call_summary: bool):
+        self.ai_service = BaseAIService()
+        self.context_service = StubContextService()
+        self.single_call_summary = single_call_summary
+        self.published: List[Dict[str, Any]] = []
+        self.realtime: List[str] = []
+
+    def next_report_topic(self, user):
+        return user["learning_plan"][1]
+
+    def publish_next_report(self, user, topic, report, token_count, context_update, quiz=None):
+        self.published.append({"email": user["email"], "topic": topic, "report": report, "context_update": context_update})
+        return user
+
+    def generate_next_report(self, user):
+        self.realtime.append(user["email"])
+        return user
+
+def _users(count: int):
+    return [
+        {"email": f"user{i}@example.com", "main_topic": "Statistics",
+         "learning_plan": ["Mean", "Variance", "Regression"]}
+        for i in range(count)
+    ]
+
+class BatchReportTest(unittest.TestCase):
+    def setUp(self):
+        self.server = fake_openai_batch.serve(0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = OpenAIBatchClient("test-key", f"http://127.0.0.1:{self.server.server_port}/v1",
+                                        poll_seconds=0.01, timeout_seconds=5)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _run(self, report_service: StubReportService, users):
+        process = BatchReportService(report_service, self.client).generate(users)
+        for user in users:
+            process(user)
+
+    def test_client_returns_a_response_per_request(self):
+        body = {"model": "fake-model", "messages": [{"role": "user", "content": "Hi"}]}
+
+        responses = self.client.run({"a": body, "b": body}, "test")
+
+        self.assertEqual(set(responses), {"a", "b"})
+        self.assertEqual(responses["a"].choices[0].message.content, fake_openai_batch.FAKE_REPORT)
+        self.assertEqual(responses["a"].usage.total_tokens, 150)
+
+    def test_single_call_reports_are_published_without_realtime_calls(self):
+        service = StubReportService(single_call_summary=True)
+        users = _users(3)
+
+        self._run(service, users)
+
+        self.assertEqual(service.realtime, [])
+        self.assertEqual(len(service.published), 3)
+        self.assertTrue(all(item["report"] == fake_openai_batch.FAKE_REPORT for item in service.published))
+        self.assertEqual(service.context_service.folded, [("Variance", "Fake learning context summary.")] * 3)
+        self.assertEqual(service.context_service.summarized, [])
+
+    def test_two_call_mode_takes_summaries_from_a_second_batch(self):
+        service = StubReportService(single_call_summary=False)
+
+        self._run(service, _users(2))
+
+        self.assertEqual(service.realtime, [])
+        self.assertEqual(service.context_service.folded, [("Variance", fake_openai_batch.FAKE_REPORT)] * 2)
+        self.assertEqual(service.context_service.summarized, [])
+
+    def test_malformed_summary_response_falls_back_for_that_user_only(self):
+        service = StubReportService(single_call_summary=False)
+        completion = fake_openai_batch.fake_completion
+
+        def malformed_summaries(body):
+            response = completion(body)
+            # user0's summary request (its existing summary names the user) gets an empty completion
+            prompt = body["messages"][-1]["content"]
+            if "EXISTING LEARNING SUMMARY" in prompt and "Earlier summary for user0@" in prompt:
+                response["choices"] = []
+            return response
+
+        with mock.patch.object(fake_openai_batch, "fake_completion", malformed_summaries):
+            self._run(service, _users(2))
+
+        self.assertEqual(service.realtime, [])
+        self.assertEqual(len(service.published), 2)
+        self.assertEqual(service.context_service.summarized, ["Variance"])
+        self.assertEqual(service.context_service.folded, [("Variance", fake_openai_batch.FAKE_REPORT)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+GitCommitBatch flushes against the fake GitHub API (utils/fake_github_api.py).
+
+    cd backend
+    python -m unittest tests.test_git_batch
+"""
+import os
+import threading
+import unittest
+from unittest import mock
+
+# Settings require a key; nothing here talks to OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from data import sha_index
+from data.git_batch import GitCommitBatch
+from data.github_client import GitHubClient
+from utils.fake_github_api import FakeGitRepo, serve
+
+class GitCommitBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.repo = FakeGitRepo()
+        self.server = serve(0, self.repo)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.api_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.client = GitHubClient(token=None, github_api_url=self.api_url, pool_size=2,
+                                   timeout=5, max_retries=0, backoff_seconds=0)
+        # The SHA index reads the tree through the shared client; each test gets its own index
+        patches = [
+            mock.patch.object(sha_index, "github_client", self.client),
+            mock.patch.object(sha_index, "_indexes", {})
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _batch(self, inline_blob_limit: int = 1024) -> GitCommitBatch:
+        return GitCommitBatch("Test batch", "owner", "reports", "main", None, self.api_url,
+                              client=self.client, inline_blob_limit=inline_blob_limit)
+
+    def test_flush_writes_all_staged_files_in_one_commit(self):
+        batch = self._batch()
+        committed = []
+        batch.stage("reports/a/plan.html", "<html>plan</html>")
+        batch.stage("reports/a/report.json", '{"report": 1}')
+        batch.add_commit_callback(lambda: committed.append(True))
+
+        commit_sha = batch.commit()
+
+        self.assertEqual(self.repo.refs["main"], commit_sha)
+        self.assertEqual(self.repo.files(), {"reports/a/plan.html": "<html>plan</html>",
+                                             "reports/a/report.json": '{"report": 1}'})
+        self.assertEqual(committed, [True])
+        self.assertTrue(batch.is_empty())
+
+    def test_large_files_are_uploaded_as_blobs(self):
+        # Trees requests over 8 KB are rejected, so 30 x 4 KB files only fit as separate blobs
+        self.repo.max_body_bytes = 8 * 1024
+        batch = self._batch()
+        files = {f"reports/user{i}/report.html": f"<p>{i}</p>" + "x" * 4096 for i in range(30)}
+        for path, content in files.items():
+            batch.stage(path, content)
+
+        batch.commit()
+
+        self.assertEqual(self.repo.files(), files)
+        self.assertEqual(batch.get_stats()["blobs_uploaded"], 30)
+        tree_requests = [size for method, endpoint, size in self.repo.requests if endpoint == "git/trees" and method == "POST"]
+        self.assertEqual(len(tree_requests), 1)
+
+    def test_unchanged_files_are_not_committed_again(self):
+        batch = self._batch()
+        batch.stage("users.json", "[]")
+        first = batch.commit()
+        batch.stage("users.json", "[]")
+
+        self.assertIsNone(batch.commit())
+        self.assertEqual(self.repo.refs["main"], first)
+        self.assertEqual(batch.get_stats()["files_skipped"], 1)
+
+    def test_commit_retries_when_the_branch_moves(self):
+        self.repo.race_next_ref_update = True
+        batch = self._batch()
+        batch.stage("reports/a/report.html", "<p>report</p>")
+
+        batch.commit()
+
+        files = self.repo.files()
+        self.assertEqual(files["reports/a/report.html"], "<p>report</p>")
+        self.assertEqual(files["race.txt"], "written by another client")
+
+    def test_intermediate_commit_failure_keeps_files_for_the_next_flush(self):
+        batch = self._batch()
+        committed = []
+        batch.stage("reports/a/report.html", "<p>report</p>")
+        batch.add_commit_callback(lambda: committed.append(True))
+        self.repo.fail_next.add("git/trees")
+
+        with self.assertRaises(Exception):
+            batch.commit()
+        self.assertEqual(batch.staged_paths(), ["reports/a/report.html"])
+
+        batch.commit()
+        self.assertEqual(self.repo.files()["reports/a/report.html"], "<p>report</p>")
+        self.assertEqual(committed, [True])
+
+    def test_failed_final_commit_runs_failure_callbacks(self):
+        batch = self._batch()
+        events = []
+        batch.stage("reports/a/report.html", "<p>report</p>")
+        batch.add_commit_callback(lambda: events.append("committed"))
+        batch.add_failure_callback(lambda: events.append("failed"))
+        self.repo.fail_next.add("git/commits")
+
+        with self.assertRaises(Exception):
+            batch.finish()
+
+        self.assertEqual(events, ["failed"])
+        self.assertTrue(batch.is_empty())
+        self.assertNotIn("reports/a/report.html", self.repo.files())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Structured quiz models (services/quiz_models.py) and the quiz completion sent through the OpenAI SDK.
+
+    cd backend
+    python -m unittest tests.test_quiz_models
+"""
+import copy
+import json
+import os
+import unittest
+import httpx
+import openai
+from pydantic import ValidationError
+
+# Settings require a key; requests here go to a mock transport
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from services.ai_service import AIService
+from services.quiz_models import Quiz, quiz_response_format
+
+def _question(number: int):
+    return {
+        "question": f"Question {number}?",
+        # Out of order on purpose: the model sorts them by letter
+        "options": [{"id": letter, "text": f"Option {letter}", "explanation": f"Why {letter}"} for letter in "DCBA"],
+        "correct_answer": "B"
+    }
+
+QUIZ = {"questions": [_question(1), _question(2)], "why_it_matters": "It comes up daily."}
+
+def _with(change):
+    payload = copy.deepcopy(QUIZ)
+    change(payload)
+    return payload
+
+class QuizModelTest(unittest.TestCase):
+    def test_accepts_a_complete_quiz(self):
+        quiz = Quiz.model_validate(QUIZ).model_dump()
+
+        self.assertEqual(len(quiz["questions"]), 2)
+        self.assertEqual([option["id"] for option in quiz["questions"][0]["options"]], ["A", "B", "C", "D"])
+        self.assertEqual(quiz["questions"][0]["correct_answer"], "B")
+
+    def test_rejects_unknown_fields(self):
+        payloads = [
+            _with(lambda quiz: quiz.update(difficulty="easy")),
+            _with(lambda quiz: quiz["questions"][0].update(hint="think")),
+            _with(lambda quiz: quiz["questions"][0]["options"][0].update(score=1))
+        ]
+        for payload in payloads:
+            with self.assertRaises(ValidationError):
+                Quiz.model_validate(payload)
+
+    def test_rejects_malformed_questions(self):
+        payloads = [
+            _with(lambda quiz: quiz["questions"][0]["options"].pop()),
+            _with(lambda quiz: quiz["questions"][0]["options"][0].update(id="A")),
+            _with(lambda quiz: quiz["questions"][0]["options"][0].update(id="d")),
+            _with(lambda quiz: quiz["questions"][0].update(correct_answer="E")),
+            _with(lambda quiz: quiz["questions"][0].pop("correct_answer")),
+            _with(lambda quiz: quiz.update(questions=[]))
+        ]
+        for payload in payloads:
+            with self.assertRaises(ValidationError):
+                Quiz.model_validate(payload)
+
+    def test_schema_meets_strict_mode_rules(self):
+        schema = quiz_response_format()["json_schema"]["schema"]
+        objects = [schema, *schema.get("$defs", {}).values()]
+
+        for definition in objects:
+            self.assertIs(definition.get("additionalProperties"), False, definition.get("title"))
+            self.assertEqual(sorted(definition["required"]), sorted(definition["properties"]))
+
+class QuizCompletionTest(unittest.TestCase):
+    """generate_quiz through the pinned SDK, with the HTTP layer replaced by a mock transport"""
+
+    def setUp(self):
+        self.requests = []
+        self.finish_reason = "stop"
+        self.service = AIService()
+        self.service.client = openai.OpenAI(api_key="test-key", base_url="http://openai.test/v1",
+                                            http_client=httpx.Client(transport=httpx.MockTransport(self._handle)))
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(json.loads(request.content))
+        return httpx.Response(200, json={
+            "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+            "choices": [{"index": 0, "finish_reason": self.finish_reason,
+                         "message": {"role": "assistant", "content": json.dumps(QUIZ)}}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150}
+        })
+
+    def test_sends_the_json_schema_and_validates_the_answer(self):
+        quiz = self.service.generate_quiz("Statistics", "# Statistics\n\nMean and variance.")
+
+        self.assertEqual(quiz, Quiz.model_validate(QUIZ).model_dump())
+        response_format = self.requests[0]["response_format"]
+        self.assertEqual(response_format["type"], "json_schema")
+        self.assertTrue(response_format["json_schema"]["strict"])
+        self.assertEqual(response_format["json_schema"]["schema"], Quiz.model_json_schema())
+
+    def test_truncated_answer_gives_no_quiz(self):
+        self.finish_reason = "length"
+
+        self.assertIsNone(self.service.generate_quiz("Statistics", "# Statistics"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+"""
+Single-pass quiz parser (services/quiz_parser.py) against the regex parser it replaced.
+
+    cd backend
+    python -m unittest tests.test_quiz_parser
+"""
+import unittest
+from benchmarks.quiz_parser_benchmark import legacy_split_quiz, normalized, split_quiz, synthetic_reports
+
+class QuizParserTest(unittest.TestCase):
+    def test_agrees_with_the_legacy_parser_on_format_variations(self):
+        for name, report in synthetic_reports(sections=3, questions=5).items():
+            with self.subTest(variation=name):
+                self.assertEqual(normalized(split_quiz(report)), normalized(legacy_split_quiz(report)))
+
+    def test_parses_every_question_and_strips_the_section(self):
+        reports = synthetic_reports(sections=3, questions=5)
+        for name in ("plain", "crlf", "h3_heading", "answer_on_next_line", "lowercase_answers", "lowercase_options"):
+            with self.subTest(variation=name):
+                quiz, content = split_quiz(reports[name])
+                self.assertEqual(len(quiz["questions"]), 5)
+                self.assertEqual([option["id"] for option in quiz["questions"][0]["options"]], ["A", "B", "C", "D"])
+                self.assertIn(quiz["questions"][0]["correct_answer"], "ABCD")
+                self.assertNotIn("Interactive Quiz", content)
+
+    def test_bold_answer_letters_are_not_guessed(self):
+        # Neither parser reads "**B**" as an answer, so no question is complete
+        self.assertEqual(split_quiz(synthetic_reports()["bold_answers"])[0], None)
+
+    def test_report_without_a_quiz_is_unchanged(self):
+        report = "# Statistics\n\nMean and variance."
+
+        self.assertEqual(split_quiz(report), (None, report))
+
+if __name__ == "__main__":
+    unittest.main()
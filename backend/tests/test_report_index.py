@@ -0,0 +1,107 @@
+"""
+BM25 retrieval over past reports (services/report_index.py).
+
+    cd backend
+    python -m unittest tests.test_report_index
+"""
+import json
+import os
+import threading
+import unittest
+
+# Settings require a key; nothing here talks to OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from services.report_index import BM25Index, ReportIndexStore, split_passages
+
+REPORTS = {
+    "Mean": "# Mean\n\n## Definition\n\nThe mean is the sum of values divided by their count.",
+    "Variance": ("# Variance\n\n## Definition\n\nVariance measures spread: the average squared deviation "
+                 "from the mean.\n\n## Standard deviation\n\nThe standard deviation is the square root of variance."),
+    "Regression": "# Regression\n\n## Least squares\n\nLinear regression fits a line by minimising squared residuals."
+}
+
+class BM25IndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = BM25Index()
+        for topic, report in REPORTS.items():
+            self.index.add_report(topic, report)
+
+    def test_passages_carry_their_section_heading(self):
+        passages = split_passages(REPORTS["Variance"] + "\n\n## Interactive Quiz: Test Your Understanding\n\nQ1")
+
+        self.assertEqual(len(passages), 2)
+        self.assertTrue(passages[1].startswith("Standard deviation: The standard deviation"))
+
+    def test_ranks_the_most_specific_passage_first(self):
+        results = self.index.search("standard deviation square root", k=2)
+
+        self.assertEqual(results[0][1:], ("Variance", "Standard deviation: The standard deviation is the square root of variance."))
+        self.assertTrue(all(earlier[0] >= later[0] for earlier, later in zip(results, results[1:])))
+
+    def test_unknown_terms_and_empty_k_match_nothing(self):
+        self.assertEqual(self.index.search("photosynthesis", k=3), [])
+        self.assertEqual(self.index.search("mean", k=0), [])
+
+    def test_a_topic_is_indexed_once(self):
+        passages = len(self.index)
+
+        self.assertEqual(self.index.add_report("Mean", REPORTS["Mean"]), 0)
+        self.assertEqual(len(self.index), passages)
+
+    def test_round_trips_through_its_stored_form(self):
+        restored = BM25Index.from_dict(json.loads(json.dumps(self.index.to_dict())))
+
+        self.assertEqual(restored.topics, self.index.topics)
+        self.assertEqual(restored.search("squared residuals", k=3), self.index.search("squared residuals", k=3))
+
+class ReportIndexStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = ReportIndexStore(max_indexes=2)
+        self.loaded = []
+        self._lock = threading.Lock()
+
+    def _load_report(self, topic):
+        with self._lock:
+            self.loaded.append(topic)
+        return REPORTS.get(topic)
+
+    def test_missing_reports_are_loaded_once(self):
+        index = self.store.get("Jane@example.com", "Statistics", list(REPORTS), self._load_report)
+        again = self.store.get("jane@example.com", "Statistics", list(REPORTS), self._load_report)
+
+        self.assertIs(again, index)
+        self.assertEqual(sorted(self.loaded), sorted(REPORTS))
+        self.assertEqual(index.topics, set(REPORTS))
+        self.assertEqual(self.store.get_stats()["builds"], 1)
+
+    def test_restores_a_saved_index_and_loads_only_new_topics(self):
+        saved = BM25Index()
+        saved.add_report("Mean", REPORTS["Mean"])
+        saved.add_report("Variance", REPORTS["Variance"])
+
+        index = self.store.get("jane@example.com", "Statistics", list(REPORTS), self._load_report,
+                               load_saved=lambda: json.loads(json.dumps(saved.to_dict())))
+
+        self.assertEqual(self.loaded, ["Regression"])
+        self.assertEqual(index.topics, set(REPORTS))
+        stats = self.store.get_stats()
+        self.assertEqual((stats["restored"], stats["builds"], stats["reports_loaded"]), (1, 0, 1))
+
+    def test_add_report_updates_only_indexes_in_memory(self):
+        self.assertIsNone(self.store.add_report("jane@example.com", "Statistics", "Mean", REPORTS["Mean"]))
+
+        self.store.get("jane@example.com", "Statistics", ["Mean"], self._load_report)
+        stored = self.store.add_report("jane@example.com", "Statistics", "Variance", REPORTS["Variance"])
+
+        self.assertEqual(stored["topics"], ["Mean", "Variance"])
+
+    def test_least_recently_used_index_is_evicted(self):
+        for email in ("a@example.com", "b@example.com", "c@example.com"):
+            self.store.get(email, "Statistics", ["Mean"], self._load_report)
+
+        self.assertEqual(self.store.get_stats()["indexes"], 2)
+        self.assertIsNone(self.store.add_report("a@example.com", "Statistics", "Variance", REPORTS["Variance"]))
+
+if __name__ == "__main__":
+    unittest.main()
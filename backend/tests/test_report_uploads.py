@@ -0,0 +1,89 @@
+"""
+Report uploads through the Contents API (data/report_repository.py) against the fake GitHub API.
+
+    cd backend
+    python -m unittest tests.test_report_uploads
+"""
+import os
+import threading
+import unittest
+from unittest import mock
+
+# Settings require a key; nothing here talks to OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from data import sha_index
+from data.github_client import GitHubClient
+from data.report_repository import ReportRepository
+from data.sha_index import git_blob_sha
+from utils.fake_github_api import FakeGitRepo, serve
+
+class GitBlobShaTest(unittest.TestCase):
+    def test_matches_git_hash_object(self):
+        # printf ... | git hash-object --stdin
+        self.assertEqual(git_blob_sha(""), "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391")
+        self.assertEqual(git_blob_sha("hello\n"), "ce013625030ba8dba906f756967f9e9ca394464a")
+        # Hashed as UTF-8 bytes, not characters
+        self.assertEqual(git_blob_sha("Ünïcödé – ✓"), "b4adf3ecd98d092f1a5a63732f9d4a2034203208")
+
+class UploadFileTest(unittest.TestCase):
+    def setUp(self):
+        self.repo = FakeGitRepo()
+        self.server = serve(0, self.repo)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        api_url = f"http://127.0.0.1:{self.server.server_port}"
+        client = GitHubClient(token=None, github_api_url=api_url, pool_size=2,
+                              timeout=5, max_retries=0, backoff_seconds=0)
+        patches = [
+            mock.patch.object(sha_index, "github_client", client),
+            mock.patch.object(sha_index, "_indexes", {})
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.reports = ReportRepository()
+        self.reports.github_api_url = api_url
+        self.reports.repo_owner, self.reports.repo_name, self.reports.branch = "owner", "reports", "main"
+        self.reports.client = client
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _puts(self):
+        return [request for request in self.repo.requests if request[0] == "PUT"]
+
+    def test_unchanged_content_is_not_uploaded_again(self):
+        first = self.reports.upload_file("jane@example.com", "Statistics", "<p>Mean</p>", filename="Mean")
+        self.repo.requests.clear()
+
+        again = self.reports.upload_file("jane@example.com", "Statistics", "<p>Mean</p>", filename="Mean")
+
+        self.assertTrue(first.written)
+        self.assertFalse(again.written)
+        self.assertEqual(again.url, first.url)
+        self.assertEqual(self.repo.requests, [])
+        self.assertEqual(self.reports.write_stats, {"written": 1, "skipped_unchanged": 1, "staged": 0})
+
+    def test_changed_content_is_uploaded(self):
+        self.reports.upload_file("jane@example.com", "Statistics", "<p>Mean</p>", filename="Mean")
+        self.repo.requests.clear()
+
+        result = self.reports.upload_file("jane@example.com", "Statistics", "<p>Median</p>", filename="Mean")
+
+        self.assertTrue(result.written)
+        self.assertEqual(len(self._puts()), 1)
+        self.assertEqual(self.repo.files()[result.path], "<p>Median</p>")
+
+    def test_file_already_on_the_branch_is_skipped(self):
+        path = "reports/jane/Statistics/Mean.html"
+        self.repo.commit_files({path: "<p>Mean</p>"})
+
+        result = self.reports.upload_file("jane@example.com", "Statistics", "<p>Mean</p>", filename="Mean")
+
+        self.assertEqual(result.path, path)
+        self.assertFalse(result.written)
+        self.assertEqual(self._puts(), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Background scheduler runs started through SchedulerService.start_run.
+
+    cd backend
+    python -m unittest tests.test_scheduler_runs
+"""
+import os
+import threading
+import unittest
+from unittest import mock
+
+# Settings require a key; nothing here talks to OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from config import settings
+from services.scheduler_service import SchedulerService
+
+USERS = [{"email": f"user{i}@example.com", "main_topic": "Statistics"} for i in range(3)]
+
+class StubReportService:
+    """Records processed users; the first user blocks until release is set"""
+
+    def __init__(self):
+        self.processed = []
+        self.release = threading.Event()
+        self.blocking = threading.Event()
+
+    def generate_next_report(self, user):
+        if user is USERS[0] and not self.release.is_set():
+            self.blocking.set()
+            self.release.wait(5)
+        self.processed.append(user["email"])
+        return user
+
+class StubUserService:
+    def find_user_by_email_and_topic(self, email, topic):
+        return next((user for user in USERS if user["email"] == email and user["main_topic"] == topic), None)
+
+    def iter_users(self):
+        return iter(USERS)
+
+class SchedulerRunTest(unittest.TestCase):
+    def setUp(self):
+        self.report_service = StubReportService()
+        self.scheduler = SchedulerService(self.report_service)
+        self.scheduler.user_service = StubUserService()
+
+    def _start(self, email=None, topic=None):
+        return self.scheduler.start_run(email, topic, max_workers=1, commit_mode="per_user", execution_mode="realtime")
+
+    def test_full_run_is_queued_behind_a_single_user_run(self):
+        single, created = self._start(USERS[0]["email"], "Statistics")
+        self.assertTrue(created)
+        self.assertTrue(self.report_service.blocking.wait(5))
+
+        full, created = self._start()
+
+        self.assertTrue(created)
+        self.assertIsNot(full, single)
+        self.assertEqual(full.status, "queued")
+        self.report_service.release.set()
+        full.wait_finished()
+        self.assertEqual(single.status, "completed")
+        self.assertEqual(full.status, "completed")
+        self.assertEqual(full.users_total, len(USERS))
+        # The single-user report finished before the full run started
+        self.assertEqual(self.report_service.processed[0], USERS[0]["email"])
+
+    def test_triggers_covered_by_an_active_run_attach_to_it(self):
+        full, created = self._start()
+        self.assertTrue(created)
+        self.assertTrue(self.report_service.blocking.wait(5))
+
+        again, created_again = self._start()
+        single, created_single = self._start(USERS[1]["email"], "Statistics")
+
+        self.assertIs(again, full)
+        self.assertIs(single, full)
+        self.assertFalse(created_again or created_single)
+        self.report_service.release.set()
+        full.wait_finished()
+        self.assertEqual(sorted(self.report_service.processed), sorted(user["email"] for user in USERS))
+
+    def test_requested_workers_are_capped(self):
+        with mock.patch.object(settings, "SCHEDULER_MAX_WORKERS_CAP", 8):
+            self.assertEqual(self.scheduler._resolve_max_workers(10_000), 8)
+            self.assertEqual(self.scheduler._resolve_max_workers(3), 3)
+            self.assertEqual(self.scheduler._resolve_max_workers(None), settings.SCHEDULER_MAX_WORKERS)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Structured learning context (services/structured_context.py): concept extraction,
+add_report, compaction to the token cap and rendering.
+
+    cd backend
+    python -m unittest tests.test_structured_context
+"""
+import os
+import unittest
+from unittest import mock
+
+# Settings require a key; nothing here talks to OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from config import settings
+from services import structured_context
+from services.token_budget import count_tokens
+
+def _report(topic: str, concepts: int = 6) -> str:
+    terms = "\n".join(f"- **{topic} idea {i}:** what it means and an example." for i in range(concepts))
+    return (f"# {topic}\n\n### Key Concepts\n\n{terms}\n\n### {topic} in practice\n\nWorked example.\n\n"
+            "## Interactive Quiz: Test Your Understanding\n\n**Question 1:** **Not a concept**")
+
+class ExtractConceptsTest(unittest.TestCase):
+    def test_bold_terms_then_subheadings_without_quiz_or_generic_headings(self):
+        concepts = structured_context.extract_concepts(_report("Variance", concepts=2), limit=10)
+
+        self.assertEqual(concepts, ["Variance idea 0", "Variance idea 1", "Variance in practice"])
+
+    def test_duplicates_and_limit(self):
+        report = "**Mean:** one\n**mean** again\n**Median:** two\n**Mode:** three"
+
+        self.assertEqual(structured_context.extract_concepts(report, limit=2), ["Mean", "Median"])
+
+class StructuredContextTest(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.object(settings, "CONTEXT_CONCEPTS_PER_TOPIC", 4),
+            mock.patch.object(settings, "CONTEXT_MAX_TOKENS", 300)
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_add_report_appends_and_refreshes_topics(self):
+        context = structured_context.add_report(None, "Mean", _report("Mean"), topics_covered=["Intro"])
+        context = structured_context.add_report(context, "Median", _report("Median"))
+        before = [dict(entry) for entry in context["topics"]]
+
+        refreshed = structured_context.add_report(context, "Mean", _report("Mean", concepts=1))
+
+        self.assertEqual([entry["topic"] for entry in refreshed["topics"]], ["Intro", "Median", "Mean"])
+        self.assertEqual(refreshed["topics"][-1]["concepts"], ["Mean idea 0", "Mean in practice"])
+        # The stored context passed in is not modified
+        self.assertEqual(context["topics"], before)
+
+    def test_context_stays_under_the_cap_for_a_whole_plan(self):
+        context = None
+        with mock.patch.object(settings, "CONTEXT_MAX_TOKENS", 100):
+            for day in range(30):
+                context = structured_context.add_report(context, f"Topic {day}", _report(f"Topic {day}"))
+                self.assertLessEqual(count_tokens(structured_context.render(context)), 100)
+
+        topics = context["topics"]
+        self.assertEqual(len(topics) + context["earlier_topics"], 30)
+        self.assertGreater(context["earlier_topics"], 0)
+        # The newest topic keeps all of its concepts; older ones were trimmed first
+        self.assertEqual(len(topics[-1]["concepts"]), 4)
+        self.assertLessEqual(len(topics[0]["concepts"]), 1)
+
+        rendered = structured_context.render(context)
+        self.assertIn("Topics covered so far (30, oldest first)", rendered)
+        self.assertIn(f"...{context['earlier_topics']} earlier topic(s)", rendered)
+        self.assertTrue(rendered.endswith("Most recent topic: Topic 29"))
+
+    def test_legacy_summary_is_carried_over_and_dropped_last(self):
+        summary = "The learner has covered sampling and bias in depth. " * 40
+        context = structured_context.add_report(None, "Mean", _report("Mean"), topics_covered=["Sampling"],
+                                                legacy_summary=summary)
+
+        self.assertLessEqual(count_tokens(context["legacy_summary"]), settings.CONTEXT_MAX_TOKENS // 2)
+        self.assertTrue(structured_context.render(context).startswith("Summary of earlier learning: The learner"))
+        context = structured_context.add_report(context, "Median", _report("Median"))
+        self.assertIn("legacy_summary", context)
+
+        with mock.patch.object(settings, "CONTEXT_MAX_TOKENS", 60):
+            squeezed = structured_context.compact(context)
+
+        self.assertNotIn("legacy_summary", squeezed)
+        self.assertEqual(squeezed["topics"][-1]["topic"], "Median")
+
+if __name__ == "__main__":
+    unittest.main()
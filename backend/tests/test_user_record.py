@@ -0,0 +1,95 @@
+"""
+Compact user records (data/user_record.py): legacy dicts in, stored shape and legacy dict out.
+
+    cd backend
+    python -m unittest tests.test_user_record
+"""
+import json
+import os
+import unittest
+from unittest import mock
+
+# Settings require a key; nothing here talks to OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from data import user_record
+from data.report_repository import ReportRepository
+from data.user_record import UserRecord
+
+EMAIL = "jane.doe@example.com"
+PLAN = ["Intro to Statistics", "Mean & Median", "Variance"]
+
+class UserRecordTest(unittest.TestCase):
+    def setUp(self):
+        self.reports = ReportRepository()
+        self.legacy = {
+            "email": EMAIL,
+            "main_topic": "Statistics",
+            "paid": True,
+            "learning_plan": list(PLAN),
+            "current_index": 2,
+            "plan_url": self.reports.public_url_for(EMAIL, "Statistics"),
+            "report_links": {
+                "0": self.reports.public_url_for(EMAIL, "Statistics", PLAN[0]),
+                "1": self.reports.public_url_for(EMAIL, "Statistics", PLAN[1])
+            },
+            "last_report_time": "2026-10-01T08:00:00+00:00",
+            "timezone": "Asia/Karachi"
+        }
+
+    def test_legacy_dict_round_trips_through_the_stored_shape(self):
+        stored = UserRecord.from_dict(self.legacy).to_storage()
+
+        self.assertNotIn("report_links", stored)
+        self.assertNotIn("plan_url", stored)
+        self.assertEqual(stored["report_slugs"], {"0": "Intro_to_Statistics", "1": "Mean_Median"})
+        self.assertEqual(stored["timezone"], "Asia/Karachi")
+        # What users.json holds, read back
+        record = UserRecord.from_dict(json.loads(json.dumps(stored)))
+        self.assertEqual(record.to_dict(), self.legacy)
+        self.assertEqual(record.to_storage(), stored)
+
+    def test_stored_slugs_let_readers_rebuild_links(self):
+        stored = UserRecord.from_dict(self.legacy).to_storage()
+
+        links = {idx: f"{stored['reports_url']}/{slug}.html" for idx, slug in stored["report_slugs"].items()}
+        self.assertEqual(links, self.legacy["report_links"])
+
+    def test_plan_edits_do_not_repoint_existing_links(self):
+        record = UserRecord.from_dict(self.legacy)
+        record.learning_plan[0] = "Statistics Fundamentals"
+
+        self.assertEqual(record.report_links, self.legacy["report_links"])
+        self.assertEqual(UserRecord.from_dict(record.to_storage()).report_links, self.legacy["report_links"])
+
+    def test_base_url_changes_do_not_repoint_existing_links(self):
+        stored = UserRecord.from_dict(self.legacy).to_storage()
+        moved = ReportRepository()
+        moved.repo_owner, moved.repo_name = "new-owner", "new-reports"
+
+        with mock.patch.object(user_record, "_report_repository", moved):
+            record = UserRecord.from_dict(stored)
+            record.mark_reported(2, moved.public_url_for(EMAIL, "Statistics", PLAN[2]))
+
+            links = record.to_dict()["report_links"]
+        self.assertEqual({idx: links[idx] for idx in ("0", "1")}, self.legacy["report_links"])
+        self.assertEqual(links["2"], moved.public_url_for(EMAIL, "Statistics", PLAN[2]))
+        self.assertEqual(record.to_storage()["link_overrides"], {"2": links["2"]})
+
+    def test_links_outside_the_reports_directory_are_kept(self):
+        self.legacy["report_links"]["1"] = "https://example.org/old/mean.html"
+
+        record = UserRecord.from_dict(UserRecord.from_dict(self.legacy).to_storage())
+
+        self.assertEqual(record.report_links, self.legacy["report_links"])
+
+    def test_earlier_compact_shape_is_still_read(self):
+        earlier = {key: value for key, value in self.legacy.items() if key not in ("plan_url", "report_links")}
+        earlier["reported"] = 2
+
+        record = UserRecord.from_dict(earlier)
+
+        self.assertEqual(record.to_dict(), self.legacy)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+"""
+Sharded user store (data/user_shards.py) against the fake GitHub API (utils/fake_github_api.py).
+
+    cd backend
+    python -m unittest tests.test_user_shards
+"""
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+# Settings require a key; nothing here talks to OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from config import settings
+from data import git_batch, sha_index
+from data.github_client import GitHubClient
+from data.user_repository import UserRepository
+from data.user_shards import INDEX_PATH, SHARD_ROOT, UserShardStore, shard_name
+from services.github_sync_service import GitHubSyncService
+from utils.fake_github_api import FakeGitRepo, serve
+
+def _user(i: int, current_index: int = 0):
+    return {"email": f"user{i}@example.com", "main_topic": "Statistics", "current_index": current_index}
+
+class ShardTestCase(unittest.TestCase):
+    def setUp(self):
+        self.repo = FakeGitRepo()
+        self.server = serve(0, self.repo)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.api_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.client = GitHubClient(token="test-token", github_api_url=self.api_url, pool_size=2,
+                                   timeout=5, max_retries=0, backoff_seconds=0)
+        patches = [
+            mock.patch.object(sha_index, "github_client", self.client),
+            mock.patch.object(sha_index, "_indexes", {}),
+            mock.patch.object(git_batch, "github_client", self.client)
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _sync(self) -> GitHubSyncService:
+        sync = GitHubSyncService()
+        sync.github_api_url = self.api_url
+        sync.repo_owner, sync.repo_name, sync.branch = "owner", "main-repo", "main"
+        sync.token = "test-token"
+        sync.client = self.client
+        return sync
+
+    def _writes(self):
+        """(method, endpoint) of every request that changes the repository"""
+        return [(method, endpoint) for method, endpoint, _ in self.repo.requests if method != "GET"]
+
+class UserShardStoreTest(ShardTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = UserShardStore(self._sync())
+        self.store.initialize()
+        for i in range(3):
+            self.assertTrue(self.store.write(_user(i), "add"))
+
+    def test_updating_a_user_is_one_contents_put(self):
+        self.repo.requests.clear()
+
+        self.assertTrue(self.store.write(_user(1, current_index=4), "update"))
+
+        self.assertEqual(self._writes(), [("PUT", "contents")])
+        path = f"{SHARD_ROOT}/{shard_name('user1@example.com', 'Statistics')}"
+        self.assertEqual(json.loads(self.repo.files()[path])["current_index"], 4)
+
+    def test_listing_fetches_only_changed_shards(self):
+        self.assertEqual(len(list(self.store.iter_all())), 3)
+        # Shards written through the store are already known by blob SHA
+        self.assertEqual(self.store.stats["shard_fetches"], 0)
+
+        path = f"{SHARD_ROOT}/{shard_name('user2@example.com', 'Statistics')}"
+        self.repo.commit_files({path: json.dumps(_user(2, current_index=7))})
+        self.repo.requests.clear()
+        users = list(self.store.iter_all())
+
+        self.assertEqual([user["current_index"] for user in users], [0, 0, 7])
+        self.assertEqual(self.store.stats["shard_fetches"], 1)
+        shard_reads = [request for request in self.repo.requests if request[1] == "contents"]
+        self.assertEqual(len(shard_reads), 1)
+
+    def test_failed_index_write_rolls_back_a_new_user(self):
+        with mock.patch.object(self.store, "_commit_index", return_value=False):
+            self.assertFalse(self.store.write(_user(9), "add"))
+
+        self.assertFalse(self.store.contains("user9@example.com", "Statistics"))
+        index = json.loads(self.repo.files()[INDEX_PATH])
+        self.assertEqual(len(index["users"]), 3)
+
+    def test_failed_index_write_restores_a_deleted_user(self):
+        with mock.patch.object(self.store, "_commit_index", return_value=False):
+            self.assertFalse(self.store.delete("user1@example.com", "Statistics", "delete"))
+
+        # Still listed, in its original position, and its shard is untouched
+        self.assertEqual([key[0] for key in self.store.load_index()],
+                         ["user0@example.com", "user1@example.com", "user2@example.com"])
+        self.assertEqual(self.store.get("user1@example.com", "Statistics")["email"], "user1@example.com")
+
+    def test_delete_removes_the_index_entry_and_shard(self):
+        self.assertTrue(self.store.delete("user1@example.com", "Statistics", "delete"))
+
+        files = self.repo.files()
+        self.assertNotIn(f"{SHARD_ROOT}/{shard_name('user1@example.com', 'Statistics')}", files)
+        self.assertEqual([entry["email"] for entry in json.loads(files[INDEX_PATH])["users"]],
+                         ["user0@example.com", "user2@example.com"])
+
+class ShardedUserRepositoryTest(ShardTestCase):
+    def setUp(self):
+        super().setUp()
+        shard_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(shard_dir.cleanup)
+        patches = [
+            mock.patch.object(settings, "USERS_REMOTE_LAYOUT", "sharded"),
+            mock.patch.object(settings, "USERS_STORAGE_ENGINE", "github"),
+            mock.patch.object(settings, "USERS_SHARD_DIR", shard_dir.name)
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.users = UserRepository()
+        self.users.github_sync = self.users.shards.github_sync = self._sync()
+
+    def test_failed_remote_write_leaves_no_local_record(self):
+        with mock.patch.object(self.users.github_sync, "commit_file", return_value=False):
+            with self.assertRaises(Exception):
+                self.users.save(_user(5))
+
+        self.assertIsNone(self.users.engine.get(("user5@example.com", "Statistics")))
+        self.assertIsNone(self.users.find_by_email_and_topic("user5@example.com", "Statistics"))
+
+    def test_save_update_and_delete_keep_local_and_remote_in_step(self):
+        self.users.save(_user(5))
+        self.users.update("user5@example.com", "Statistics", _user(5, current_index=2))
+
+        self.assertEqual(self.users.engine.get(("user5@example.com", "Statistics"))["current_index"], 2)
+        self.assertEqual(self.users.find_by_email_and_topic("user5@example.com", "Statistics").current_index, 2)
+
+        self.assertTrue(self.users.delete("user5@example.com", "Statistics"))
+        self.assertIsNone(self.users.engine.get(("user5@example.com", "Statistics")))
+        self.assertIsNone(self.users.find_by_email_and_topic("user5@example.com", "Statistics"))
+
+if __name__ == "__main__":
+    unittest.main()
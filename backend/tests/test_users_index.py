@@ -0,0 +1,119 @@
+"""
+In-memory users index and the staged users.json overlay (data/user_repository.py,
+monolithic layout) against the fake GitHub API.
+
+    cd backend
+    python -m unittest tests.test_users_index
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# Settings require a key; nothing here talks to OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from config import settings
+from data.base_repository import JsonFileEngine
+from data.git_batch import GitCommitBatch, reset_active_batch, set_active_batch
+from data.user_repository import UserRepository
+from tests.test_user_shards import ShardTestCase
+
+def _user(i: int, current_index: int = 0):
+    return {"email": f"user{i}@example.com", "main_topic": "Statistics", "current_index": current_index}
+
+class UsersJsonTestCase(ShardTestCase):
+    """UserRepository on users.json in the fake repository, with its local copy in a temporary file"""
+
+    def setUp(self):
+        super().setUp()
+        local_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(local_dir.cleanup)
+        patches = [
+            mock.patch.object(settings, "USERS_REMOTE_LAYOUT", "monolithic"),
+            mock.patch.object(settings, "USERS_STORAGE_ENGINE", "github")
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.repo.commit_files({"users.json": json.dumps([_user(0), _user(1)])})
+        self.users = UserRepository()
+        self.users.engine = JsonFileEngine(os.path.join(local_dir.name, "users.json"),
+                                           self.users._record_key, self.users._get_default_data)
+        self.users.github_sync = self._sync()
+
+    def _users_json_reads(self):
+        return [request for request in self.repo.requests if request[:2] == ("GET", "contents")]
+
+    def _remote_emails(self):
+        return [user["email"] for user in json.loads(self.repo.files()["users.json"])]
+
+class UsersIndexTest(UsersJsonTestCase):
+    def test_lookups_are_answered_from_the_index(self):
+        self.assertIsNotNone(self.users.find_by_email_and_topic("user0@example.com", "Statistics"))
+        self.repo.requests.clear()
+
+        self.assertIsNotNone(self.users.find_by_email_and_topic("USER1@example.com", "Statistics"))
+        self.assertIsNone(self.users.find_by_email_and_topic("user9@example.com", "Statistics"))
+
+        self.assertEqual(self._users_json_reads(), [])
+
+    def test_writes_go_through_to_the_index(self):
+        self.users.find_by_email_and_topic("user0@example.com", "Statistics")
+        self.users.save(_user(2))
+        self.users.update("user0@example.com", "Statistics", _user(0, current_index=3))
+        self.users.delete("user1@example.com", "Statistics")
+        self.repo.requests.clear()
+
+        self.assertIsNotNone(self.users.find_by_email_and_topic("user2@example.com", "Statistics"))
+        self.assertEqual(self.users.find_by_email_and_topic("user0@example.com", "Statistics").current_index, 3)
+        self.assertIsNone(self.users.find_by_email_and_topic("user1@example.com", "Statistics"))
+        self.assertEqual(self._users_json_reads(), [])
+        self.assertEqual(self._remote_emails(), ["user0@example.com", "user2@example.com"])
+
+    def test_index_picks_up_remote_changes_after_the_ttl(self):
+        self.assertIsNone(self.users.find_by_email_and_topic("user5@example.com", "Statistics"))
+        self.repo.commit_files({"users.json": json.dumps([_user(0), _user(1), _user(5)])})
+
+        self.assertIsNone(self.users.find_by_email_and_topic("user5@example.com", "Statistics"))
+        with mock.patch.object(settings, "USERS_INDEX_TTL_SECONDS", 0):
+            self.assertIsNotNone(self.users.find_by_email_and_topic("user5@example.com", "Statistics"))
+
+class StagedUsersOverlayTest(UsersJsonTestCase):
+    def _batch(self):
+        sync = self.users.github_sync
+        batch = GitCommitBatch("Test batch", sync.repo_owner, sync.repo_name, sync.branch, sync.token,
+                               self.api_url, client=self.client)
+        token = set_active_batch(batch)
+        self.addCleanup(reset_active_batch, token)
+        return batch
+
+    def test_reads_see_staged_users_until_the_batch_commits(self):
+        batch = self._batch()
+        self.users.save(_user(2))
+        self.users.save(_user(3))
+        self.repo.requests.clear()
+
+        # Nothing has reached GitHub yet, and reads do not go there for it
+        self.assertEqual(self._remote_emails(), ["user0@example.com", "user1@example.com"])
+        self.assertEqual(len(self.users.find_all()), 4)
+        self.assertEqual(self._users_json_reads(), [])
+
+        batch.commit()
+
+        self.assertEqual(self._remote_emails(), [f"user{i}@example.com" for i in range(4)])
+        self.assertIsNone(self.users._staged_users)
+        self.assertEqual(len(self.users.find_all()), 4)
+
+    def test_abandoned_batch_drops_the_staged_users(self):
+        batch = self._batch()
+        self.users.save(_user(2))
+
+        batch.abandon(Exception("commit failed"))
+
+        self.assertIsNone(self.users._staged_users)
+        self.assertEqual([user.email for user in self.users.find_all()], ["user0@example.com", "user1@example.com"])
+
+if __name__ == "__main__":
+    unittest.main()
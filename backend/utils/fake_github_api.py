@@ -0,0 +1,267 @@
+"""
+Local stand-in for the parts of the GitHub REST API that data/git_batch.py
+and the SHA index use: the branch head, recursive tree listings, Contents
+reads, and the Git Data API blobs, trees, commits and refs endpoints. One
+in-memory repository backs every owner/name, so commit batches can be
+flushed end to end without GitHub:
+
+    python -m utils.fake_github_api --port 8090
+    GITHUB_API_URL=http://127.0.0.1:8090 SCHEDULER_COMMIT_MODE=run ...
+
+Contents API PUT and DELETE of single files are served as well.
+
+The store can be told to reject oversized requests (max_body_bytes), fail the
+next call to an endpoint (fail_next) or move the branch before the next ref
+update (race_next_ref_update), to exercise the batch's error paths.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import unquote, urlparse
+import argparse
+import base64
+import hashlib
+import json
+import threading
+
+def _sha(kind: str, data: bytes) -> str:
+    return hashlib.sha1(kind.encode("utf-8") + b" %d\0" % len(data) + data).hexdigest()
+
+class FakeGitRepo:
+    def __init__(self, branch: str = "main"):
+        self.lock = threading.Lock()
+        self.blobs: Dict[str, bytes] = {}
+        # tree sha -> {path: blob sha}
+        self.trees: Dict[str, Dict[str, str]] = {}
+        self.commits: Dict[str, Dict[str, Any]] = {}
+        self.refs: Dict[str, str] = {}
+        # (method, endpoint, request body bytes) of every call, for assertions
+        self.requests: List[Tuple[str, str, int]] = []
+        self.max_body_bytes: Optional[int] = None
+        self.fail_next: Set[str] = set()
+        self.race_next_ref_update = False
+        self.refs[branch] = self._commit(self._tree({}), [], "Initial commit")
+
+    def _tree(self, entries: Dict[str, str]) -> str:
+        sha = _sha("tree", json.dumps(sorted(entries.items())).encode("utf-8"))
+        self.trees[sha] = dict(entries)
+        return sha
+
+    def _commit(self, tree_sha: str, parents: List[str], message: str) -> str:
+        sha = _sha("commit", json.dumps([tree_sha, parents, message, len(self.commits)]).encode("utf-8"))
+        self.commits[sha] = {"tree": tree_sha, "parents": list(parents), "message": message}
+        return sha
+
+    def add_blob(self, data: bytes) -> str:
+        sha = _sha("blob", data)
+        self.blobs[sha] = data
+        return sha
+
+    def files(self, branch: str = "main") -> Dict[str, str]:
+        """{path: text} of the branch head"""
+        with self.lock:
+            tree = self.trees[self.commits[self.refs[branch]]["tree"]]
+            return {path: self.blobs[sha].decode("utf-8") for path, sha in tree.items()}
+
+    def commit_files(self, files: Dict[str, str], message: str = "External commit", branch: str = "main") -> str:
+        """Commit files directly on the branch, as another writer would"""
+        with self.lock:
+            head = self.refs[branch]
+            entries = dict(self.trees[self.commits[head]["tree"]])
+            entries.update({path: self.add_blob(text.encode("utf-8")) for path, text in files.items()})
+            self.refs[branch] = self._commit(self._tree(entries), [head], message)
+            return self.refs[branch]
+
+    def resolve_tree(self, ref: str) -> Optional[str]:
+        if ":" in ref:
+            # "<ref>:<dir>" names the subtree of a directory, listed with paths relative to it
+            base, directory = ref.split(":", 1)
+            tree_sha = self.resolve_tree(base)
+            if tree_sha is None:
+                return None
+            prefix = directory.strip("/") + "/"
+            entries = {path[len(prefix):]: sha for path, sha in self.trees[tree_sha].items() if path.startswith(prefix)}
+            return self._tree(entries) if entries else None
+        if ref in self.refs:
+            return self.commits[self.refs[ref]]["tree"]
+        if ref in self.commits:
+            return self.commits[ref]["tree"]
+        return ref if ref in self.trees else None
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    repo = FakeGitRepo()
+
+    def _send(self, status: int, body: Any = None) -> None:
+        payload = json.dumps(body if body is not None else {}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _route(self) -> Tuple[str, str, Dict[str, str]]:
+        """(endpoint, remainder, query) for /repos/{owner}/{name}/{endpoint}/{remainder}"""
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        query = dict(pair.split("=", 1) for pair in url.query.split("&") if "=" in pair)
+        if len(parts) < 4 or parts[0] != "repos":
+            return "", "", query
+        if parts[3] == "git" and len(parts) >= 5:
+            return f"git/{parts[4]}", unquote("/".join(parts[5:])), query
+        return parts[3], unquote("/".join(parts[4:])), query
+
+    def _read_body(self, endpoint: str) -> Optional[Dict[str, Any]]:
+        """JSON body of the request, or None once an error response has been sent"""
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        repo = self.repo
+        with repo.lock:
+            repo.requests.append((self.command, endpoint, len(raw)))
+            failing = endpoint in repo.fail_next
+            repo.fail_next.discard(endpoint)
+        if failing:
+            self._send(502, {"message": f"Injected failure for {endpoint}"})
+            return None
+        if repo.max_body_bytes is not None and len(raw) > repo.max_body_bytes:
+            self._send(413, {"message": "Request body too large"})
+            return None
+        return json.loads(raw or b"{}")
+
+    def do_GET(self):
+        endpoint, rest, query = self._route()
+        repo = self.repo
+        with repo.lock:
+            repo.requests.append(("GET", endpoint, 0))
+            if endpoint == "commits" and rest in repo.refs:
+                head = repo.refs[rest]
+                self._send(200, {"sha": head, "commit": {"tree": {"sha": repo.commits[head]["tree"]}}})
+            elif endpoint == "git/trees" and repo.resolve_tree(rest):
+                tree_sha = repo.resolve_tree(rest)
+                entries = [{"path": path, "mode": "100644", "type": "blob", "sha": sha}
+                           for path, sha in sorted(repo.trees[tree_sha].items())]
+                self._send(200, {"sha": tree_sha, "tree": entries, "truncated": False})
+            elif endpoint == "contents":
+                tree = repo.trees[repo.resolve_tree(query.get("ref", "main")) or ""]
+                sha = tree.get(rest)
+                if sha is None:
+                    self._send(404, {"message": "Not Found"})
+                else:
+                    content = base64.b64encode(repo.blobs[sha]).decode("ascii")
+                    self._send(200, {"path": rest, "sha": sha, "content": content, "encoding": "base64"})
+            else:
+                self._send(404, {"message": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        endpoint, _, _ = self._route()
+        body = self._read_body(endpoint)
+        if body is None:
+            return
+        repo = self.repo
+        with repo.lock:
+            if endpoint == "git/blobs":
+                data = body["content"].encode("utf-8")
+                if body.get("encoding") == "base64":
+                    data = base64.b64decode(data)
+                self._send(201, {"sha": repo.add_blob(data)})
+            elif endpoint == "git/trees":
+                base = repo.trees.get(body.get("base_tree") or "", {})
+                entries = dict(base)
+                for entry in body["tree"]:
+                    if "content" in entry:
+                        entries[entry["path"]] = repo.add_blob(entry["content"].encode("utf-8"))
+                    elif entry.get("sha") is None:
+                        entries.pop(entry["path"], None)
+                    elif entry["sha"] in repo.blobs:
+                        entries[entry["path"]] = entry["sha"]
+                    else:
+                        self._send(422, {"message": f"Blob {entry['sha']} not found"})
+                        return
+                self._send(201, {"sha": repo._tree(entries)})
+            elif endpoint == "git/commits":
+                if body["tree"] not in repo.trees or any(parent not in repo.commits for parent in body["parents"]):
+                    self._send(422, {"message": "Unknown tree or parent"})
+                    return
+                self._send(201, {"sha": repo._commit(body["tree"], body["parents"], body["message"])})
+            else:
+                self._send(404, {"message": f"Unknown path {self.path}"})
+
+    def do_PUT(self):
+        """Contents API create/update of one file, with the sha check GitHub does"""
+        endpoint, path, _ = self._route()
+        body = self._read_body(endpoint)
+        if body is None:
+            return
+        repo = self.repo
+        branch = body.get("branch", "main")
+        with repo.lock:
+            if endpoint != "contents" or branch not in repo.refs:
+                self._send(404, {"message": f"Unknown path {self.path}"})
+                return
+            current = repo.trees[repo.commits[repo.refs[branch]]["tree"]].get(path)
+            if current != body.get("sha"):
+                self._send(409 if current else 422, {"message": f"{path} does not match the given sha"})
+                return
+        repo.commit_files({path: base64.b64decode(body["content"]).decode("utf-8")}, body["message"], branch)
+        with repo.lock:
+            sha = repo.trees[repo.commits[repo.refs[branch]]["tree"]][path]
+        self._send(201 if current is None else 200, {"content": {"path": path, "sha": sha}})
+
+    def do_DELETE(self):
+        """Contents API delete of one file"""
+        endpoint, path, _ = self._route()
+        body = self._read_body(endpoint)
+        if body is None:
+            return
+        repo = self.repo
+        branch = body.get("branch", "main")
+        with repo.lock:
+            if endpoint != "contents" or branch not in repo.refs:
+                self._send(404, {"message": f"Unknown path {self.path}"})
+                return
+            head = repo.refs[branch]
+            entries = dict(repo.trees[repo.commits[head]["tree"]])
+            if entries.get(path) is None:
+                self._send(404, {"message": "Not Found"})
+                return
+            if entries[path] != body.get("sha"):
+                self._send(409, {"message": f"{path} does not match the given sha"})
+                return
+            del entries[path]
+            repo.refs[branch] = repo._commit(repo._tree(entries), [head], body["message"])
+            self._send(200, {"content": None})
+
+    def do_PATCH(self):
+        endpoint, rest, _ = self._route()
+        body = self._read_body(endpoint)
+        if body is None:
+            return
+        repo = self.repo
+        branch = rest[len("heads/"):] if rest.startswith("heads/") else rest
+        if endpoint != "git/refs" or branch not in repo.refs:
+            self._send(404, {"message": f"Unknown ref {rest}"})
+            return
+        if repo.race_next_ref_update:
+            repo.race_next_ref_update = False
+            repo.commit_files({"race.txt": "written by another client"})
+        with repo.lock:
+            commit = repo.commits.get(body["sha"])
+            if commit is None:
+                self._send(422, {"message": "Unknown commit"})
+            elif not body.get("force") and repo.refs[branch] not in commit["parents"]:
+                self._send(422, {"message": "Update is not a fast forward"})
+            else:
+                repo.refs[branch] = body["sha"]
+                self._send(200, {"ref": f"refs/heads/{branch}", "object": {"sha": body["sha"]}})
+
+    def log_message(self, format, *args):
+        print(f"[Fake GitHub] {format % args}")
+
+def serve(port: int, repo: Optional[FakeGitRepo] = None) -> ThreadingHTTPServer:
+    """Server on 127.0.0.1:port (0 picks a free port), backed by repo or a fresh one"""
+    handler = type("Handler", (FakeGitHubHandler,), {"repo": repo or FakeGitRepo()})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    print(f"[Fake GitHub] Listening on http://127.0.0.1:{server.server_port}")
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake GitHub Git Data API endpoint")
+    parser.add_argument("--port", type=int, default=8090)
+    serve(parser.parse_args().port).serve_forever()
@@ -0,0 +1,151 @@
+"""
+Local stand-in for the OpenAI Files and Batch endpoints used by
+services/openai_batch.py. Batches complete immediately and every request
+gets a canned chat completion, so the scheduler's batch mode can be run
+end to end without OpenAI:
+
+    python -m utils.fake_openai_batch --port 8089
+    OPENAI_BATCH_BASE_URL=http://127.0.0.1:8089/v1 SCHEDULER_EXECUTION_MODE=batch ...
+"""
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+import argparse
+import json
+import threading
+import time
+import uuid
+
+FAKE_REPORT = """## Introduction:
+This is a report generated by the fake batch endpoint.
+
+## Key Concepts:
+- Point 1
+- Point 2"""
+
+def fake_completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Canned chat completion for a request body; JSON-mode requests get a report + updated summary object"""
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        # Same keys AIService._report_and_summary_from_response reads
+        content = json.dumps({"report": FAKE_REPORT, "updated_summary": "Fake learning context summary."})
+    else:
+        content = FAKE_REPORT
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake-model"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150}
+    }
+
+class FakeBatchStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files: Dict[str, str] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+
+    def add_file(self, content: str) -> str:
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        with self.lock:
+            self.files[file_id] = content
+        return file_id
+
+    def create_batch(self, input_file_id: str, metadata: Optional[Dict[str, str]]) -> Dict[str, Any]:
+        with self.lock:
+            content = self.files[input_file_id]
+        lines = [json.loads(line) for line in content.splitlines() if line.strip()]
+        output = "\n".join(
+            json.dumps({
+                "id": f"batch_req_{index}",
+                "custom_id": line["custom_id"],
+                "response": {"status_code": 200, "body": fake_completion(line["body"])},
+                "error": None
+            })
+            for index, line in enumerate(lines)
+        )
+        batch: Dict[str, Any] = {
+            "id": f"batch_{uuid.uuid4().hex[:12]}",
+            "object": "batch",
+            "status": "completed",
+            "input_file_id": input_file_id,
+            "output_file_id": self.add_file(output + "\n"),
+            "error_file_id": None,
+            "errors": None,
+            "metadata": metadata,
+            "request_counts": {"total": len(lines), "completed": len(lines), "failed": 0}
+        }
+        with self.lock:
+            self.batches[batch["id"]] = batch
+        return batch
+
+class FakeBatchHandler(BaseHTTPRequestHandler):
+    store = FakeBatchStore()
+
+    def _send(self, status: int, body: Any, content_type: str = "application/json") -> None:
+        payload = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _uploaded_file(self) -> str:
+        """Content of the 'file' part of a multipart upload"""
+        raw = b"Content-Type: " + self.headers["Content-Type"].encode("utf-8") + b"\r\n\r\n" + self._body()
+        message = BytesParser(policy=default_policy).parsebytes(raw)
+        for part in message.iter_parts():
+            payload = part.get_payload(decode=True)
+            if part.get_param("name", header="content-disposition") == "file" and isinstance(payload, bytes):
+                return payload.decode("utf-8")
+        raise ValueError("multipart upload without a 'file' part")
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        try:
+            if path.endswith("/files"):
+                self._send(200, {"id": self.store.add_file(self._uploaded_file()), "object": "file", "purpose": "batch"})
+            elif path.endswith("/batches"):
+                body = json.loads(self._body() or b"{}")
+                self._send(200, self.store.create_batch(body["input_file_id"], body.get("metadata")))
+            elif path.endswith("/cancel"):
+                batch_id = path.split("/")[-2]
+                with self.store.lock:
+                    batch = self.store.batches.get(batch_id)
+                self._send(200 if batch else 404, batch or {"error": "batch not found"})
+            else:
+                self._send(404, {"error": f"unknown path {path}"})
+        except (KeyError, ValueError) as e:
+            self._send(400, {"error": str(e)})
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        parts = path.split("/")
+        with self.store.lock:
+            if len(parts) >= 2 and parts[-2] == "batches" and parts[-1] in self.store.batches:
+                self._send(200, self.store.batches[parts[-1]])
+            elif path.endswith("/content") and parts[-2] in self.store.files:
+                self._send(200, self.store.files[parts[-2]], "application/jsonl")
+            else:
+                self._send(404, {"error": f"unknown path {path}"})
+
+    def log_message(self, format, *args):
+        print(f"[Fake OpenAI Batch] {format % args}")
+
+def serve(port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeBatchHandler)
+    print(f"[Fake OpenAI Batch] Listening on http://127.0.0.1:{server.server_port}/v1")
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI Batch API endpoint")
+    parser.add_argument("--port", type=int, default=8089)
+    serve(parser.parse_args().port).serve_forever()